@@ -0,0 +1,106 @@
+"""Compares what authenticating a machine client costs per request.
+
+    login      POST /auth/login for a fresh token, a bcrypt check each time
+    api_key    GET /auth/me with an API key, its grant and principal uncached
+    cached     GET /auth/me with an API key, its grant and principal cached
+
+Reports latency percentiles and the statements each request runs. An
+uncached key must take a single indexed lookup, a cached one none:
+
+    python benchmarks/api_keys.py --requests 2000
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+# every login is for the same user from the same client
+os.environ.setdefault("AUTHENE_LOGIN_ATTEMPTS", "0")
+
+from common import asgi_request, percentiles, seed_users  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from authene.auth import service  # noqa: E402
+from authene.main import app  # noqa: E402
+from authene.models import ApiKeyCreate, hash_password  # noqa: E402
+from authene.runtime import current  # noqa: E402
+from authene_common.cache import TTLCache  # noqa: E402
+from authene_common.database import SessionLocal, engine  # noqa: E402
+from authene_common.enums import ApiKeyScope  # noqa: E402
+
+PASSWORD = "Benchmark123"
+
+statements = Counter()
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, many):
+    statements[statement.split(None, 1)[0].upper()] += 1
+
+
+def run(method: str, path: str, headers, body, requests: int) -> dict:
+    async def send():
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            status, response = await asgi_request(app, method, path, headers, body)
+            timings.append(time.perf_counter() - start)
+            assert status == 200, response
+        return timings
+
+    asyncio.run(send())  # warm up
+    statements.clear()
+    timings = asyncio.run(send())
+    return {
+        **percentiles(timings),
+        "statements": {verb: n / requests for verb, n in statements.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--login-requests", type=int, default=20)
+    args = parser.parse_args()
+
+    seed_users(10, password=hash_password(PASSWORD))
+    with SessionLocal() as db_session:
+        key, _ = service.create_api_key(
+            db_session=db_session,
+            user_id=1,
+            api_key_in=ApiKeyCreate(name="benchmark", scopes=[ApiKeyScope.users_read]),
+        )
+
+    key_headers = [(b"x-api-key", key.encode())]
+    login = {"email": "user0@example.com", "password": PASSWORD}
+
+    runtime = current()
+    key_cache, principal_cache = runtime.api_key_provider.cache, runtime.principal_cache
+    results = {
+        "login": run("POST", "/api/v1/auth/login", [], login, args.login_requests)
+    }
+
+    runtime.api_key_provider.cache, runtime.principal_cache = None, None
+    results["api_key"] = run("GET", "/api/v1/auth/me", key_headers, None, args.requests)
+
+    runtime.api_key_provider.cache = key_cache or TTLCache(maxsize=1000, ttl=60)
+    runtime.principal_cache = principal_cache or TTLCache(maxsize=1000, ttl=60)
+    results["cached"] = run("GET", "/api/v1/auth/me", key_headers, None, args.requests)
+
+    for name, result in results.items():
+        per_request = ", ".join(
+            f"{n:.2f} {verb}" for verb, n in sorted(result["statements"].items())
+        )
+        print(
+            f"{name:>8}: p50 {result['p50_ms']:7.2f}ms p99 {result['p99_ms']:7.2f}ms "
+            f"statements per request: {per_request or 'none'}"
+        )
+
+    assert results["api_key"]["statements"] == {"SELECT": 1}, results["api_key"]
+    assert not results["cached"]["statements"], results["cached"]
+
+
+if __name__ == "__main__":
+    main()
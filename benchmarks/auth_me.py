@@ -0,0 +1,88 @@
+"""Measures GET /auth/me latency with and without bcrypt on the read path.
+
+The "before" run swaps `get_current_user` for the previous implementation,
+which always built a `UserRegister` (hashing a generated password) before
+looking the user up. Run from the repository root:
+
+    python benchmarks/auth_me.py --requests 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("AUTHENE_JWT_SECRET", "benchmark")
+
+# the database url is relative, keep the benchmark database out of the tree
+os.chdir(tempfile.mkdtemp(prefix="authene-bench-"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from authene.auth import async_service, service  # noqa: E402
+from authene.main import api, app  # noqa: E402
+from authene.models import AutheneUser, UserRegister, hash_password  # noqa: E402
+from authene.runtime import current  # noqa: E402
+from authene_common.database import Base, engine, get_db  # noqa: E402
+
+
+def legacy_get_current_user(request: Request) -> AutheneUser:
+    user_email = current().auth_provider.get_current_user(request)
+    if not user_email:
+        raise service.InvalidCredentialException
+
+    # the UserRegister validator used to hash its generated password
+    user_in = UserRegister(email=user_email)
+    hash_password(user_in.password)
+    return service.get_or_create(db_session=get_db(request), user_in=user_in)
+
+
+def run(client: TestClient, headers: dict, requests: int) -> dict:
+    client.get("/api/v1/auth/me", headers=headers)  # warm up
+
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get("/api/v1/auth/me", headers=headers)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+
+    timings.sort()
+    return {
+        "p50_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+
+    user = AutheneUser(email="bench@example.com", password=b"x")
+    headers = {"Authorization": f"Bearer {user.token}"}
+    client = TestClient(app)
+
+    api.dependency_overrides[async_service.get_current_principal] = (
+        legacy_get_current_user
+    )
+    before = run(client, headers, args.requests)
+    api.dependency_overrides.clear()
+    after = run(client, headers, args.requests)
+
+    for name, result in (("before", before), ("after", after)):
+        print(
+            f"{name:>6}: p50 {result['p50_ms']:.2f}ms "
+            f"p95 {result['p95_ms']:.2f}ms mean {result['mean_ms']:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Helpers shared by the benchmarks.
+
+Importing this module puts `src` on the path, sets a JWT secret and moves
+into a throwaway directory (the default database url is relative), so it
+has to be imported before anything from authene.
+"""
+
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+from typing import List, Optional, Sequence, Tuple
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+os.environ.setdefault("AUTHENE_JWT_SECRET", "benchmark")
+
+# the database url is relative, keep the benchmark database out of the tree
+os.chdir(tempfile.mkdtemp(prefix="authene-bench-"))
+
+from sqlalchemy import func, select  # noqa: E402
+
+from authene.models import AutheneUser  # noqa: E402
+from authene_common.database import Base, engine  # noqa: E402
+
+
+def rss_mb() -> float:
+    """The current resident set size, linux only."""
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize() / 1024 / 1024
+
+
+def max_rss_mb() -> float:
+    """The peak resident set size of the process so far."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed_users(users: int, password: bytes = b"x", chunk: int = 10_000) -> int:
+    """Tops the user table up to `users` rows named user{i}@example.com.
+
+    Every user shares the same password hash. Returns the number of users
+    inserted, none when pointed at an already seeded database.
+    """
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        existing = connection.scalar(select(func.count()).select_from(AutheneUser))
+        for start in range(existing, users, chunk):
+            connection.execute(
+                AutheneUser.__table__.insert(),
+                [
+                    {
+                        "email": f"user{i}@example.com",
+                        "password": password,
+                        "role": "Member",
+                    }
+                    for i in range(start, min(start + chunk, users))
+                ],
+            )
+    return max(users - existing, 0)
+
+
+def percentiles(timings: List[float]) -> dict:
+    """Latency summary of `timings`, in seconds, as milliseconds."""
+    if not timings:
+        return {}
+
+    timings = sorted(timings)
+
+    def at(fraction: float) -> float:
+        return timings[min(len(timings) - 1, int(len(timings) * fraction))] * 1000
+
+    return {
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "max_ms": timings[-1] * 1000,
+    }
+
+
+async def asgi_request(
+    app,
+    method: str,
+    path: str,
+    headers: Sequence[Tuple[bytes, bytes]] = (),
+    body: Optional[dict] = None,
+    query_string: bytes = b"",
+) -> Tuple[int, bytes]:
+    """Sends one request straight to an ASGI app, without any client overhead."""
+    content = json.dumps(body).encode("utf-8") if body is not None else b""
+    headers = list(headers)
+    if body is not None:
+        headers += [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(content)).encode()),
+        ]
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string,
+        "headers": headers,
+        "server": ("bench", 80),
+        "client": ("bench", 1),
+    }
+    sent = False
+    response = {"status": None, "body": []}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": content, "more_body": False}
+        await asyncio.sleep(3600)  # the client never disconnects
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response["status"], b"".join(response["body"])
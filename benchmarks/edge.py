@@ -0,0 +1,120 @@
+"""Compares starting the verify-only edge app with starting the API.
+
+Each app is imported in new interpreters, the report holds the fastest
+start up time (excluding interpreter startup), the resident memory once
+started and the modules imported. Then the same tokens (active, expired, tampered,
+revoked, not a token) are checked by the API's provider and the edge's
+/verify, they must agree on every one:
+
+    python benchmarks/edge.py --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import asgi_request
+
+from authene import edge
+from authene.runtime import current
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SCENARIOS = {
+    "api": "from authene.main import app",
+    "edge": "from authene.edge import app",
+}
+
+
+def start(code: str) -> dict:
+    """Runs `code` in a new interpreter, returns its wall time, memory and modules."""
+    # the peak rss of a child carries over that of this process, read the current one
+    timed = (
+        "import resource, sys, time as _t\n"
+        "_modules = len(sys.modules)\n"
+        "_start = _t.perf_counter()\n"
+        f"{code}\n"
+        "print(_t.perf_counter() - _start, "
+        "int(open('/proc/self/statm').read().split()[1]) * resource.getpagesize(), "
+        "len(sys.modules) - _modules)\n"
+    )
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.path.join(ROOT, "src"),
+        AUTHENE_JWT_SECRET=os.environ.get("AUTHENE_JWT_SECRET", "benchmark"),
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", timed],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds, rss, modules = result.stdout.split()[-3:]
+    return {
+        "ms": float(seconds) * 1000,
+        "rss_mb": int(rss) / 1024 / 1024,
+        "modules": int(modules),
+    }
+
+
+def tokens() -> dict:
+    now = time.time()
+    keyring = current().keyring
+    active = keyring.sign({"email": "edge@example.com", "exp": now + 60})
+    revoked = keyring.sign(
+        {"email": "edge@example.com", "exp": now + 60, "jti": "revoked"}
+    )
+    for revocations in (current().revocations, edge.revocations):
+        if revocations is not None:
+            revocations.add("revoked", now + 60)
+
+    return {
+        "active": active,
+        "expired": keyring.sign({"email": "edge@example.com", "exp": now - 1}),
+        "tampered": active[:-4] + ("AAAA" if not active.endswith("AAAA") else "BBBB"),
+        "revoked": revoked,
+        "garbage": "not.a.token",
+    }
+
+
+def check(token: str) -> tuple:
+    """The status the API and the edge give `token`."""
+    _, api_status = current().auth_provider.introspect(token)
+    status, body = asyncio.run(
+        asgi_request(
+            edge.app, "GET", "/verify", [(b"authorization", f"Bearer {token}".encode())]
+        )
+    )
+    edge_status = json.loads(body)["status"]
+    assert (status == 200) == (edge_status == "active"), (status, body)
+    return api_status.value, edge_status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, code in SCENARIOS.items():
+        runs = [start(code) for _ in range(args.repeat)]
+        fastest = min(runs, key=lambda run: run["ms"])
+        print(
+            f"{name:>5}: start up {fastest['ms']:7.1f}ms, "
+            f"memory {fastest['rss_mb']:6.1f}MB, "
+            f"{fastest['modules']:4d} modules"
+        )
+
+    print()
+    for name, token in tokens().items():
+        api_status, edge_status = check(token)
+        print(f"{name:>9}: api {api_status:>8}, edge {edge_status:>8}")
+        assert api_status == edge_status, name
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Checks that GET /users/export streams in constant memory.
+
+Seeds a throwaway SQLite database, streams the whole table through the ASGI
+app in-process and fails if RSS, sampled on every body chunk, grows by more
+than the given ceiling (linux only):
+
+    python benchmarks/export.py --users 1000000 --max-rss-growth-mb 64
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from common import rss_mb, seed_users
+
+from authene.main import app
+from authene.models import AutheneUser
+
+
+async def export(format: str, headers: list) -> dict:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/users/export",
+        "raw_path": b"/api/v1/users/export",
+        "root_path": "",
+        "query_string": f"format={format}".encode(),
+        "headers": headers,
+        "server": ("bench", 80),
+        "client": ("bench", 1),
+    }
+    received = {"status": None, "bytes": 0, "lines": 0, "peak_rss": rss_mb()}
+
+    async def receive():
+        await asyncio.sleep(3600)  # the client never disconnects
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            received["bytes"] += len(body)
+            received["lines"] += body.count(b"\n")
+            received["peak_rss"] = max(received["peak_rss"], rss_mb())
+
+    await app(scope, receive, send)
+    return received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=64)
+    args = parser.parse_args()
+
+    seed_users(args.users)
+    token = AutheneUser(email="user0@example.com", password=b"x").token
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    received = asyncio.run(export(args.format, headers))
+    elapsed = time.perf_counter() - start
+    growth = received["peak_rss"] - baseline
+
+    print(
+        f"status {received['status']}, {received['lines']} lines, "
+        f"{received['bytes'] / 1024 / 1024:.1f}MB in {elapsed:.1f}s, "
+        f"RSS {baseline:.0f}MB -> {baseline + growth:.0f}MB (+{growth:.1f}MB)"
+    )
+    if received["status"] != 200 or growth > args.max_rss_growth_mb:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
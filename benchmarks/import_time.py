@@ -0,0 +1,162 @@
+"""Reports what importing and building the app costs a fresh worker.
+
+Each scenario runs in new interpreters under `python -X importtime`. The
+report holds the fastest and median wall time of the scenario, excluding
+interpreter startup, and the import time of the slowest scenario broken
+down by top level package:
+
+    python benchmarks/import_time.py --repeat 5
+    python benchmarks/import_time.py --history benchmarks/import_time.jsonl
+
+With --history the report is appended to a JSON lines file, tagged with
+the commit, and compared with the previous entry. Compare fastest times,
+medians move a lot with whatever else the machine is doing.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SCENARIOS = {
+    "factory": "import authene.factory",
+    "main": "import authene.main",
+    "api_only": (
+        "from authene.factory import AppSettings, create_app\n"
+        "create_app(AppSettings(frontend=False))"
+    ),
+}
+
+
+def run(code: str, cwd: str) -> tuple:
+    """Runs `code` in a new interpreter, returns its wall time and importtime lines."""
+    timed = (
+        "import time as _t\n"
+        "_start = _t.perf_counter()\n"
+        f"{code}\n"
+        "print(_t.perf_counter() - _start)\n"
+    )
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.path.join(ROOT, "src"),
+        AUTHENE_JWT_SECRET=os.environ.get("AUTHENE_JWT_SECRET", "benchmark"),
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", timed],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.split()[-1]), result.stderr.splitlines()
+
+
+def parse_importtime(lines: list) -> dict:
+    """Maps each imported module to its self time, in seconds."""
+    modules = {}
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(self_us) / 1e6
+    return modules
+
+
+def by_package(modules: dict, baseline: set) -> dict:
+    """Sums self times per top level package, leaving out interpreter startup."""
+    packages = defaultdict(float)
+    for name, seconds in modules.items():
+        if name not in baseline:
+            packages[name.split(".")[0]] += seconds
+    return dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--history", help="append the report to this JSON lines file")
+    args = parser.parse_args()
+
+    # the database url is relative, keep its file out of the tree
+    cwd = tempfile.mkdtemp(prefix="authene-bench-")
+    _, startup = run("pass", cwd)
+    baseline = set(parse_importtime(startup))
+
+    report = {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "scenarios": {},
+    }
+    slowest = None
+    for name, code in SCENARIOS.items():
+        timings, modules = [], {}
+        for _ in range(args.repeat):
+            seconds, lines = run(code, cwd)
+            timings.append(seconds)
+            modules = parse_importtime(lines)
+
+        wall = statistics.median(timings)
+        report["scenarios"][name] = {
+            "min_ms": min(timings) * 1000,
+            "median_ms": wall * 1000,
+            "modules": len(set(modules) - baseline),
+        }
+        if slowest is None or wall > slowest[1]:
+            slowest = (name, wall, modules)
+
+    name, _, modules = slowest
+    report["packages_ms"] = {
+        package: seconds * 1000
+        for package, seconds in list(by_package(modules, baseline).items())[: args.top]
+    }
+
+    previous = None
+    if args.history:
+        if os.path.exists(args.history):
+            with open(args.history) as history:
+                entries = [json.loads(line) for line in history if line.strip()]
+            previous = entries[-1] if entries else None
+        with open(args.history, "a") as history:
+            history.write(json.dumps(report) + "\n")
+
+    for scenario, result in report["scenarios"].items():
+        change = ""
+        if previous and scenario in previous["scenarios"]:
+            before = previous["scenarios"][scenario]["min_ms"]
+            change = f" ({result['min_ms'] - before:+.1f}ms vs {previous['commit']})"
+        print(
+            f"{scenario:>10}: {result['min_ms']:8.1f}ms "
+            f"(median {result['median_ms']:.1f}ms) "
+            f"{result['modules']:5d} modules{change}"
+        )
+
+    print(f"\nimport time by package, {name}:")
+    for package, ms in report["packages_ms"].items():
+        print(f"{package:>20}: {ms:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
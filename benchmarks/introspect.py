@@ -0,0 +1,112 @@
+"""Compares verifying a gateway's tokens one by one with one batch.
+
+    one_by_one  GET /auth/me once per token
+    batch       POST /auth/introspect with every token at once
+
+Both run with the token and principal caches off, so each token is
+verified and its user looked up. Reports the time to verify the whole
+batch and the statements it took. The batch must take the caller's
+lookup and a single query for all the users:
+
+    python benchmarks/introspect.py --tokens 100 --rounds 50
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from common import asgi_request, percentiles, seed_users
+from sqlalchemy import event
+
+from authene.main import app
+from authene.models import AutheneUser
+from authene.runtime import current
+from authene_common.database import SessionLocal, engine
+
+statements = Counter()
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, many):
+    statements[statement.split(None, 1)[0].upper()] += 1
+
+
+def run(requests, rounds: int) -> dict:
+    """Times sending `requests`, (method, path, headers, body) each, `rounds` times."""
+
+    async def send():
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for method, path, headers, body in requests:
+                status, response = await asgi_request(app, method, path, headers, body)
+                assert status == 200, response
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    asyncio.run(send())  # warm up
+    statements.clear()
+    timings = asyncio.run(send())
+    return {
+        **percentiles(timings),
+        "statements": {verb: n / rounds for verb, n in statements.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    seed_users(args.tokens + 1)
+    with SessionLocal() as db_session:
+        users = db_session.query(AutheneUser).order_by(AutheneUser.id).all()
+        caller = users[0].token
+        tokens = [user.token for user in users[1 : args.tokens + 1]]
+
+    # every token verified and every user looked up, in both cases
+    current().auth_provider.token_cache = None
+    current().principal_cache = None
+
+    results = {
+        "one_by_one": run(
+            [
+                (
+                    "GET",
+                    "/api/v1/auth/me",
+                    [(b"authorization", f"Bearer {token}".encode())],
+                    None,
+                )
+                for token in tokens
+            ],
+            args.rounds,
+        ),
+        "batch": run(
+            [
+                (
+                    "POST",
+                    "/api/v1/auth/introspect",
+                    [(b"authorization", f"Bearer {caller}".encode())],
+                    {"tokens": tokens},
+                )
+            ],
+            args.rounds,
+        ),
+    }
+
+    for name, result in results.items():
+        per_batch = ", ".join(
+            f"{n:.2f} {verb}" for verb, n in sorted(result["statements"].items())
+        )
+        print(
+            f"{name:>10}: {len(tokens)} tokens p50 {result['p50_ms']:8.2f}ms "
+            f"p99 {result['p99_ms']:8.2f}ms statements: {per_batch or 'none'}"
+        )
+
+    assert results["batch"]["statements"] == {"SELECT": 2}, results["batch"]
+
+
+if __name__ == "__main__":
+    main()
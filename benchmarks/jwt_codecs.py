@@ -0,0 +1,69 @@
+"""Compares encode/decode throughput of the JWT codecs in authene.codecs.
+
+Runs every codec against HS256 and RS256 with throwaway keys and prints
+operations per second, skipping combinations a codec does not support or
+whose library is not installed:
+
+    python benchmarks/jwt_codecs.py --seconds 2 --algorithms HS256 RS256
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from authene.codecs import CODECS  # noqa: E402
+
+
+def codec_keys(algorithm: str) -> dict:
+    if algorithm.startswith("HS"):
+        return {"secret": "benchmark-secret-" + "x" * 32}
+    if algorithm.startswith("RS"):
+        import rsa
+
+        _, private_key = rsa.newkeys(2048)
+        pem = private_key.save_pkcs1().decode("ascii")
+        return {"keys": {"bench": pem}, "signing_kid": "bench"}
+    raise ValueError(f"No benchmark key for {algorithm}.")
+
+
+def ops_per_second(fn, arg, seconds: float) -> float:
+    calls, start = 0, time.perf_counter()
+    while True:
+        for _ in range(100):
+            fn(arg)
+        calls += 100
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--algorithms", nargs="+", default=["HS256", "RS256"])
+    parser.add_argument("--codecs", nargs="+", default=list(CODECS))
+    args = parser.parse_args()
+
+    claims = {"exp": time.time() + 3600, "email": "user@example.com"}
+    print(f"{'algorithm':<10}{'codec':<8}{'encode/s':>12}{'decode/s':>12}")
+    for algorithm in args.algorithms:
+        keys = codec_keys(algorithm)
+        for name in args.codecs:
+            try:
+                codec = CODECS[name](algorithm, **keys)
+                token = codec.encode(claims)
+                assert codec.decode(token)["email"] == claims["email"]
+            except Exception as e:
+                print(f"{algorithm:<10}{name:<8}  skipped: {e}")
+                continue
+
+            encode = ops_per_second(codec.encode, claims, args.seconds)
+            decode = ops_per_second(codec.decode, token, args.seconds)
+            print(f"{algorithm:<10}{name:<8}{encode:>12,.0f}{decode:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
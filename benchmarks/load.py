@@ -0,0 +1,175 @@
+"""Load-tests the ASGI app in-process against a seeded SQLite database.
+
+Each scenario sends `--requests` requests (`--login-requests` for login,
+which is bound by bcrypt) from `--concurrency` concurrent clients straight
+to `authene.main:app`, and reports latency percentiles, throughput and RSS
+as JSON, so runs can be compared:
+
+    python benchmarks/load.py --users 100000 --output before.json
+    python benchmarks/load.py --users 100000 --scenarios me users
+
+The database is seeded once per run; set SQLALCHEMY_DATABASE_URI to a file
+outside the temporary directory to reuse it between runs.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# every login is for a handful of users from the same client
+os.environ.setdefault("AUTHENE_LOGIN_ATTEMPTS", "0")
+
+from common import (  # noqa: E402
+    asgi_request,
+    max_rss_mb,
+    percentiles,
+    rss_mb,
+    seed_users,
+)
+
+from authene.main import app  # noqa: E402
+from authene.models import AutheneUser, hash_password  # noqa: E402
+
+PASSWORD = "Benchmark123"
+
+
+def auth_headers(email: str) -> list:
+    token = AutheneUser(email=email, password=b"x").token
+    return [(b"authorization", f"Bearer {token}".encode())]
+
+
+def build_scenarios(users: int, seed: int) -> dict:
+    """Maps each scenario to a factory of (method, path, headers, body) requests."""
+    rng = random.Random(seed)
+    # a bounded set of callers, like a real deployment, each with its own token
+    callers = [auth_headers(f"user{i}@example.com") for i in range(min(users, 100))]
+
+    def login():
+        email = f"user{rng.randrange(users)}@example.com"
+        return "POST", "/api/v1/auth/login", [], {"email": email, "password": PASSWORD}
+
+    def me():
+        return "GET", "/api/v1/auth/me", rng.choice(callers), None
+
+    def list_users():
+        return "GET", "/api/v1/users", rng.choice(callers), None
+
+    def get_user():
+        path = f"/api/v1/users/{rng.randrange(users) + 1}"
+        return "GET", path, rng.choice(callers), None
+
+    def update_user():
+        user_id = rng.randrange(users) + 1
+        body = {"id": user_id, "role": rng.choice(["Member", "Admin"])}
+        return "PUT", f"/api/v1/users/{user_id}", rng.choice(callers), body
+
+    return {
+        "login": login,
+        "me": me,
+        "users": list_users,
+        "user": get_user,
+        "update": update_user,
+    }
+
+
+async def run_scenario(build_request, requests: int, concurrency: int) -> dict:
+    timings = []
+    statuses = {}
+    counter = itertools.count()
+    peak_rss = rss_mb()
+
+    async def client():
+        nonlocal peak_rss
+        while next(counter) < requests:
+            method, path, headers, body = build_request()
+            start = time.perf_counter()
+            status, _ = await asgi_request(app, method, path, headers, body)
+            timings.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            peak_rss = max(peak_rss, rss_mb())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(timings),
+        "errors": sum(n for status, n in statuses.items() if status >= 400),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "elapsed_s": elapsed,
+        "throughput_rps": len(timings) / elapsed,
+        **percentiles(timings),
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=("login", "me", "users", "user", "update"),
+        default=["login", "me", "users", "user", "update"],
+    )
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    seeded = seed_users(args.users, password=hash_password(PASSWORD))
+    seed_elapsed = time.perf_counter() - start
+
+    scenarios = build_scenarios(args.users, args.seed)
+    results = {}
+    for name in args.scenarios:
+        requests = args.login_requests if name == "login" else args.requests
+        asyncio.run(run_scenario(scenarios[name], args.warmup, 1))
+        results[name] = asyncio.run(
+            run_scenario(scenarios[name], requests, args.concurrency)
+        )
+        print(
+            f"{name:>7}: {results[name]['throughput_rps']:8.1f} req/s "
+            f"p50 {results[name]['p50_ms']:.2f}ms p99 {results[name]['p99_ms']:.2f}ms "
+            f"errors {results[name]['errors']}",
+            file=sys.stderr,
+        )
+
+    report = {
+        "config": {
+            "users": args.users,
+            "requests": args.requests,
+            "login_requests": args.login_requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "seeded_users": seeded,
+        "seed_elapsed_s": seed_elapsed,
+        "scenarios": results,
+        "max_rss_mb": max_rss_mb(),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
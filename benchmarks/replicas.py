@@ -0,0 +1,123 @@
+"""Checks read/write routing with SQLite files standing in for replicas.
+
+Seeds a primary database, copies it to two replica files (a replication
+snapshot that then never catches up) and sends requests through the ASGI
+app, counting the statements each engine runs. Reads must land on the
+replicas, writes on the primary, and a request that writes must read its
+own writes even though the replicas are stale:
+
+    python benchmarks/replicas.py --requests 200
+    AUTHENE_DB_ASYNC=1 python benchmarks/replicas.py
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import time
+from collections import Counter
+
+os.environ.setdefault(
+    "SQLALCHEMY_REPLICA_URIS", "sqlite:///replica1.db,sqlite:///replica2.db"
+)
+
+from common import asgi_request, seed_users  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
+
+from authene.main import app  # noqa: E402
+from authene.models import AutheneUser  # noqa: E402
+from authene_common.database import (  # noqa: E402
+    async_engine,
+    async_replica_engines,
+    engine,
+    replica_engines,
+)
+
+statements = Counter()
+
+
+def count_statements(target, name: str):
+    @event.listens_for(target, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        statements[(name, statement.split(None, 1)[0].upper())] += 1
+
+
+def replicate():
+    """Copies the primary over every replica file."""
+    primary = sqlite3.connect("foo.db")
+    for index in range(len(replica_engines)):
+        replica = sqlite3.connect(f"replica{index + 1}.db")
+        primary.backup(replica)
+        replica.close()
+    primary.close()
+
+
+def role_on(bind, user_id: int) -> str:
+    with bind.connect() as connection:
+        return connection.scalar(
+            text("SELECT role FROM authene_user WHERE id = :id"), {"id": user_id}
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    assert len(replica_engines) == 2, "expects two SQLALCHEMY_REPLICA_URIS"
+    seed_users(args.users)
+    replicate()
+
+    engines = {"primary": engine}
+    engines.update({f"replica{i + 1}": e for i, e in enumerate(replica_engines)})
+    if async_engine is not None:
+        engines = {"primary": async_engine.sync_engine}
+        engines.update(
+            {
+                f"replica{i + 1}": e.sync_engine
+                for i, e in enumerate(async_replica_engines)
+            }
+        )
+    for name, bind in engines.items():
+        count_statements(bind, name)
+
+    token = AutheneUser(email="user0@example.com", password=b"x").token
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+
+    async def run():
+        start = time.perf_counter()
+        for i in range(args.requests):
+            status, body = await asgi_request(
+                app, "GET", f"/api/v1/users/{i % args.users + 1}", headers
+            )
+            assert status == 200, body
+        reads = time.perf_counter() - start
+
+        # the replicas still hold the old role, the response must not
+        status, body = await asgi_request(
+            app,
+            "PUT",
+            "/api/v1/users/2",
+            headers,
+            body={"id": 2, "role": "Owner"},
+        )
+        assert status == 200, body
+        assert b'"role":"Owner"' in body.replace(b" ", b""), body
+        return reads
+
+    reads = asyncio.run(run())
+
+    assert role_on(engine, 2) == "Owner"
+    assert all(role_on(replica, 2) == "Member" for replica in replica_engines)
+    for (name, verb), count in statements.items():
+        assert name != "primary" or verb != "SELECT" or count <= 2, statements
+        assert name == "primary" or verb == "SELECT", statements
+
+    for (name, verb), count in sorted(statements.items()):
+        print(f"{name:>9} {verb:<8} {count:6d}")
+    print(f"{args.requests} reads in {reads * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
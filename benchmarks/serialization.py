@@ -0,0 +1,101 @@
+"""Compares response_model validation with the fast serialisation path.
+
+Seeds 10k users and measures a single GET /users page holding all of them,
+end to end through the ASGI app, then the serialisation step alone on the
+same ORM rows, with AUTHENE_FAST_SERIALIZATION off and on:
+
+    python benchmarks/serialization.py --users 10000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("AUTHENE_USERS_PAGE_MAX", "100000")
+os.environ.setdefault("AUTHENE_USERS_COUNT_TTL", "0")
+
+from common import asgi_request, seed_users  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from authene.auth import views  # noqa: E402
+from authene.main import app  # noqa: E402
+from authene.models import AutheneUser, UserPagination  # noqa: E402
+from authene_common.database import engine  # noqa: E402
+from authene_common.serialization import get_serializer  # noqa: E402
+
+
+def best_of(fn, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+    }
+
+
+def request_page(users: int, headers: list) -> bytes:
+    query = f"limit={users}&total=false".encode()
+    status, body = asyncio.run(
+        asgi_request(app, "GET", "/api/v1/users", headers, query_string=query)
+    )
+    assert status == 200, body[:200]
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    seed_users(args.users)
+    token = AutheneUser(email="user0@example.com", password=b"x").token
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+
+    with Session(engine) as session:
+        rows = list(session.scalars(select(AutheneUser).limit(args.users)))
+    page = {"items": rows, "itemsPerPage": len(rows), "page": 1, "total": None}
+
+    def validate():
+        # what FastAPI does with a response_model
+        model = UserPagination.model_validate(page, from_attributes=True)
+        JSONResponse(jsonable_encoder(model))
+
+    serializer = get_serializer(UserPagination)
+
+    results = {}
+    for fast in (False, True):
+        views.AUTHENE_FAST_SERIALIZATION = fast
+        body = request_page(args.users, headers)
+        results[fast] = {
+            "request": best_of(lambda: request_page(args.users, headers), args.repeat),
+            "serialize": best_of(
+                (lambda: serializer.dumps(page)) if fast else validate, args.repeat
+            ),
+            "bytes": len(body),
+            "body": body,
+        }
+
+    # both paths must produce the same document
+    assert json.loads(results[False]["body"]) == json.loads(results[True]["body"])
+
+    for fast, result in results.items():
+        name = "fast" if fast else "response_model"
+        print(
+            f"{name:>14}: request {result['request']['median_ms']:8.2f}ms "
+            f"serialize {result['serialize']['median_ms']:8.2f}ms "
+            f"({result['bytes'] / 1024:.0f}KB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
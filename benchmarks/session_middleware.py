@@ -0,0 +1,143 @@
+"""Measures the per-request cost of the database session middleware.
+
+Compares three versions: the original, which built a sessionmaker, a
+scoped_session registry and a session on every request; the same with the
+session opened lazily from `get_db`, both as BaseHTTPMiddleware functions;
+and the current raw ASGI DBSessionMiddleware. Requests are sent straight to
+the ASGI app, from `--concurrency` concurrent clients, to keep client
+overhead out of the numbers:
+
+    python benchmarks/session_middleware.py --requests 5000 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from uuid import uuid1
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("AUTHENE_JWT_SECRET", "benchmark")
+
+# the database url is relative, keep the benchmark database out of the tree
+os.chdir(tempfile.mkdtemp(prefix="authene-bench-"))
+
+from fastapi import FastAPI  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.orm import scoped_session, sessionmaker  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from authene.middleware import (  # noqa: E402
+    DBSessionMiddleware,
+    _request_id_ctx_var,
+    get_request_id,
+)
+from authene_common.database import DbSession, close_db, engine  # noqa: E402
+
+
+async def legacy_db_session_middleware(request: Request, call_next):
+    ctx_token = _request_id_ctx_var.set(str(uuid1()))
+    try:
+        session = scoped_session(sessionmaker(bind=engine), scopefunc=get_request_id)
+        request.state.db = session()
+        response = await call_next(request)
+    finally:
+        request.state.db.close()
+
+    _request_id_ctx_var.reset(ctx_token)
+    return response
+
+
+async def basehttp_db_session_middleware(request: Request, call_next):
+    ctx_token = _request_id_ctx_var.set(str(uuid1()))
+    request.state.db = None
+    try:
+        response = await call_next(request)
+    finally:
+        await close_db(request)
+        _request_id_ctx_var.reset(ctx_token)
+
+    return response
+
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI(openapi_url=None)
+    if isinstance(middleware, type):
+        app.add_middleware(middleware)
+    else:
+        app.middleware("http")(middleware)
+
+    @app.get("/noop")
+    async def noop():
+        return {}
+
+    @app.get("/db")
+    def db(db_session: DbSession):
+        return {"value": db_session.execute(text("SELECT 1")).scalar()}
+
+    return app
+
+
+async def request(app, path: str):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "server": ("bench", 80),
+        "client": ("bench", 1),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(app, path: str, requests: int, concurrency: int) -> float:
+    for _ in range(100):  # warm up
+        await request(app, path)
+
+    async def client(count: int):
+        for _ in range(count):
+            await request(app, path)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(requests // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return elapsed / (requests // concurrency * concurrency) * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    apps = {
+        "before": build_app(legacy_db_session_middleware),
+        "lazy": build_app(basehttp_db_session_middleware),
+        "asgi": build_app(DBSessionMiddleware),
+    }
+    for path in ("/noop", "/db"):
+        for name, app in apps.items():
+            per_request = asyncio.run(run(app, path, args.requests, args.concurrency))
+            print(
+                f"{path:>6} {name:>6}: {per_request:.1f}us/request, "
+                f"{1_000_000 / per_request:.0f} req/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Checks that a changed role reaches every worker's principal cache.
+
+Runs a Redis-protocol stand-in server in-process, then for each cache
+setup starts two worker processes, caches a principal in both, changes
+its role through one worker and times how long the other takes to serve
+the new role:
+
+    memory       per worker caches, no invalidation (stale until the TTL)
+    broadcast    per worker caches, deletes broadcast over pub/sub
+    mmap         one memory mapped file shared by the workers
+    redis        entries on the stand-in server
+
+Also reports the latency of a cache hit for each backend:
+
+    python benchmarks/shared_cache.py --lookups 20000
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+os.environ.setdefault("AUTHENE_PRINCIPAL_CACHE_SIZE", "1000")
+os.environ.setdefault("AUTHENE_PRINCIPAL_CACHE_TTL", "60")
+
+from common import asgi_request, seed_users  # noqa: E402
+
+from authene.models import AutheneUser, Principal  # noqa: E402
+from authene_common.cache import (  # noqa: E402
+    JSONCodec,
+    MmapCache,
+    RedisCache,
+    TTLCache,
+    resp_client,
+)
+
+
+def encode_reply(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode_reply(v) for v in value)
+    if isinstance(value, str):
+        value = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class StandIn(object):
+    """Just enough of a Redis-protocol server: expiring strings and pub/sub."""
+
+    def __init__(self):
+        self.data = {}
+        self.subscribers = {}
+
+    async def read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def lookup(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def execute(self, args, writer) -> bytes:
+        name = args[0].upper()
+        if name in (b"PING", b"AUTH", b"SELECT"):
+            return b"+OK\r\n"
+        if name == b"GET":
+            return encode_reply(self.lookup(args[1]))
+        if name == b"SET":
+            expires_at = None
+            if len(args) > 3 and args[3].upper() == b"PX":
+                expires_at = time.monotonic() + int(args[4]) / 1000
+            self.data[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if name == b"DEL":
+            return encode_reply(
+                sum(self.data.pop(k, None) is not None for k in args[1:])
+            )
+        if name == b"SCAN":
+            pattern = args[args.index(b"MATCH") + 1] if b"MATCH" in args else b"*"
+            keys = [k for k in self.data if fnmatch.fnmatchcase(k, pattern)]
+            return encode_reply([b"0", keys])
+        if name == b"SUBSCRIBE":
+            self.subscribers.setdefault(args[1], set()).add(writer)
+            return encode_reply([b"subscribe", args[1], 1])
+        if name == b"PUBLISH":
+            subscribers = self.subscribers.get(args[1], set())
+            for subscriber in subscribers:
+                subscriber.write(encode_reply([b"message", args[1], args[2]]))
+            return encode_reply(len(subscribers))
+        return b"-ERR unknown command\r\n"
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                args = await self.read_command(reader)
+                if args is None:
+                    break
+                writer.write(self.execute(args, writer))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subscribers in self.subscribers.values():
+                subscribers.discard(writer)
+            writer.close()
+
+    def start(self) -> str:
+        """Serves on a free local port from a background thread, returns its url."""
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+
+        async def serve():
+            server = await asyncio.start_server(self.handle, sock=sock)
+            async with server:
+                await server.serve_forever()
+
+        threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+        return f"redis://127.0.0.1:{sock.getsockname()[1]}/0"
+
+
+def worker(connection):
+    """Serves requests sent over `connection` until it receives None."""
+    from authene.main import app
+    from authene.runtime import current
+
+    cache_invalidations = current().cache_invalidations
+
+    if cache_invalidations is not None:
+        cache_invalidations.start()
+
+    loop = asyncio.new_event_loop()
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        connection.send(loop.run_until_complete(asgi_request(app, *message)))
+
+    if cache_invalidations is not None:
+        cache_invalidations.stop()
+
+
+def role_seen(pipe, headers) -> str:
+    pipe.send(("GET", "/api/v1/auth/me", headers))
+    status, body = pipe.recv()
+    assert status == 200, body
+    return json.loads(body)["role"]
+
+
+def propagation(name: str, env: dict, headers, timeout: float) -> float:
+    """Seconds until the second worker serves a role changed by the first."""
+    context = multiprocessing.get_context("spawn")
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+
+    pipes, processes = [], []
+    for _ in range(2):
+        parent, child = context.Pipe()
+        process = context.Process(target=worker, args=(child,), daemon=True)
+        process.start()
+        pipes.append(parent)
+        processes.append(process)
+
+    for key, value in previous.items():
+        if value is None:
+            os.environ.pop(key)
+        else:
+            os.environ[key] = value
+
+    try:
+        for pipe in pipes:
+            role_seen(pipe, headers)
+        # lets the subscriptions settle
+        time.sleep(0.2)
+
+        pipes[0].send(("PUT", "/api/v1/users/1", headers, {"id": 1, "role": name}))
+        status, body = pipes[0].recv()
+        assert status == 200, body
+
+        start = time.perf_counter()
+        while role_seen(pipes[1], headers) != name:
+            if time.perf_counter() - start > timeout:
+                return float("inf")
+            time.sleep(0.001)
+        return time.perf_counter() - start
+    finally:
+        for pipe in pipes:
+            pipe.send(None)
+        for process in processes:
+            process.join(timeout=5)
+
+
+def hit_latency(cache, lookups: int) -> float:
+    """Microseconds per cache hit."""
+    principal = Principal(id=1, email="user0@example.com", role="Member")
+    cache.set("user0@example.com", principal)
+    start = time.perf_counter()
+    for _ in range(lookups):
+        assert cache.get("user0@example.com").role == "Member"
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    seed_users(10)
+    # spawned workers start in their own directory, point them at this database
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.abspath('foo.db')}"
+    redis_url = StandIn().start()
+    mmap_path = os.path.abspath("principals.cache")
+
+    token = AutheneUser(email="user0@example.com", password=b"x").token
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+
+    setups = {
+        "memory": {"AUTHENE_CACHE_URL": "memory://"},
+        "broadcast": {
+            "AUTHENE_CACHE_URL": "memory://",
+            "AUTHENE_CACHE_INVALIDATION_URL": redis_url,
+        },
+        "mmap": {"AUTHENE_CACHE_URL": f"mmap://{mmap_path}"},
+        "redis": {"AUTHENE_CACHE_URL": redis_url},
+    }
+    for name, env in setups.items():
+        seconds = propagation(name, env, headers, args.timeout)
+        print(
+            f"{name:>10}: new role served by the other worker "
+            f"after {seconds * 1000:.1f}ms"
+        )
+        if name == "memory":
+            assert seconds == float("inf"), "expected the other worker to stay stale"
+        else:
+            assert seconds < args.timeout, f"{name} did not invalidate"
+
+    # the shared backends store principals the way the service does
+    codec = JSONCodec(Principal)
+    caches = {
+        "memory": TTLCache(maxsize=1000, ttl=60),
+        "mmap": MmapCache(mmap_path, namespace="latency", ttl=60, codec=codec),
+        "redis": RedisCache(
+            resp_client(redis_url), namespace="latency", ttl=60, codec=codec
+        ),
+    }
+    for name, cache in caches.items():
+        print(f"{name:>10}: {hit_latency(cache, args.lookups):.2f}us per hit")
+
+
+if __name__ == "__main__":
+    main()
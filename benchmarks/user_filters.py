@@ -0,0 +1,109 @@
+"""Times every filter of GET /users on a large table.
+
+Seeds a large user table (few owners and admins, timestamps spread over
+a couple of years) with the data of tests/test_user_filters.py and times
+the page and count queries of each of its filters, in both sort orders
+and past a cursor. Any plan that reads authene_user without searching an
+index fails the run, as it fails the tests:
+
+    python benchmarks/user_filters.py --users 200000
+    python benchmarks/user_filters.py --analyze
+
+By default the table has no statistics, as the migrations leave it,
+--analyze checks the plans SQLite picks once ANALYZE has run.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import common  # noqa: F401
+from sqlalchemy import func, select, text
+
+from authene.auth.service import (
+    build_count_query,
+    build_page_query,
+    page_key,
+)
+from authene.models import AutheneUser
+from authene_common.database import Base, SessionLocal, engine
+from authene_common.enums import UserSort
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+)
+
+from test_user_filters import cases, explain, full_scans, seed  # noqa: E402
+
+
+def seed_once(users: int):
+    """Inserts `users` users, unless the table already holds them."""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        if not connection.scalar(select(func.count()).select_from(AutheneUser)):
+            seed(connection, users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--analyze", action="store_true")
+    args = parser.parse_args()
+
+    seed_once(args.users)
+    with engine.connect() as connection:
+        if args.analyze:
+            connection.execute(text("ANALYZE"))
+            connection.commit()
+
+        failures = []
+        for name, filters in cases(args.users).items():
+            queries = {"count": build_count_query(filters)}
+            with SessionLocal() as db_session:
+                for sort in UserSort:
+                    first = build_page_query(
+                        limit=args.limit + 1, sort=sort, filters=filters
+                    )
+                    queries[f"{sort.value}"] = first
+
+                    start = time.perf_counter()
+                    items = db_session.scalars(first).all()
+                    elapsed = time.perf_counter() - start
+
+                    after = page_key(items[-1], sort) if items else None
+                    queries[f"{sort.value} after"] = build_page_query(
+                        limit=args.limit + 1, after=after, sort=sort, filters=filters
+                    )
+                    start = time.perf_counter()
+                    db_session.scalars(queries[f"{sort.value} after"]).all()
+                    elapsed_after = time.perf_counter() - start
+                    print(
+                        f"{name:>28} {sort.value:>10}: {len(items):3d} rows "
+                        f"{elapsed * 1000:7.2f}ms, "
+                        f"next page {elapsed_after * 1000:7.2f}ms"
+                    )
+
+                start = time.perf_counter()
+                total = db_session.scalar(queries["count"])
+                print(
+                    f"{name:>28} {'count':>10}: {total:6d} "
+                    f"{(time.perf_counter() - start) * 1000:7.2f}ms"
+                )
+
+            for query_name, query in queries.items():
+                plan = explain(connection, query)
+                if full_scans(plan):
+                    failures.append(f"{name}, {query_name}: {plan}")
+
+    if failures:
+        print("\nfull table scans:")
+        for failure in failures:
+            print(f"  {failure}")
+        raise SystemExit(1)
+    print("\nevery filter searched an index")
+
+
+if __name__ == "__main__":
+    main()
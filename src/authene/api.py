@@ -1,11 +1,11 @@
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
-from authene.auth.service import get_current_user
+from authene.auth.async_service import get_current_principal
 from authene.auth.views import auth_router, user_router
+from authene_common.timing import TimedJSONResponse
 
 
 class ErrorMessage(BaseModel):
@@ -17,7 +17,7 @@ class ErrorResponse(BaseModel):
 
 
 api_router = APIRouter(
-    default_response_class=JSONResponse,
+    default_response_class=TimedJSONResponse,
     responses={
         400: {"model": ErrorResponse},
         401: {"model": ErrorResponse},
@@ -37,5 +37,5 @@ authenticated_api_router.include_router(user_router, prefix="/users", tags=["use
 
 api_router.include_router(
     authenticated_api_router,
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(get_current_principal)],
 )
@@ -0,0 +1,694 @@
+"""Awaitable counterparts of `authene.auth.service`.
+
+Each function runs natively on an `AsyncSession` when the app's database
+is async (AUTHENE_DB_ASYNC) and otherwise hands the sync service function to
+the threadpool, so route handlers can await them in either mode.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Annotated, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import Row, insert, select
+from sqlalchemy import update as sql_update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.status import HTTP_403_FORBIDDEN
+
+from authene.auth import service
+from authene.hashing import hasher
+from authene.models import (
+    ApiKeyCreate,
+    ApiKeyGrant,
+    AutheneApiKey,
+    AutheneUser,
+    Principal,
+    UserCreate,
+    UserFilter,
+    UserRegister,
+    UserUpdate,
+)
+from authene.runtime import current
+from authene_common.cache import CacheBackend
+from authene_common.database import current_database, get_db, is_async, use_primary
+from authene_common.enums import ApiKeyScope, BulkStatus, UserSort
+
+logger = logging.getLogger(__name__)
+
+
+async def call_cache(cache: Optional[CacheBackend], method: str, *args):
+    """Calls `method` of the cache, if any, off the event loop when it does network I/O."""
+    if cache is None:
+        return None
+    if cache.blocking:
+        return await run_in_threadpool(getattr(cache, method), *args)
+    return getattr(cache, method)(*args)
+
+
+async def invalidate_principal(email: str):
+    await call_cache(current().principal_cache, "delete", email)
+
+
+async def get_all(*, db_session, filter=None) -> List[AutheneUser]:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.get_all, db_session=db_session, filter=filter
+        )
+
+    query = select(AutheneUser)
+    if filter is not None:
+        query = query.where(filter)
+
+    return list(await db_session.scalars(query))
+
+
+async def get_page(
+    *,
+    db_session,
+    limit: int,
+    after: Optional[Tuple] = None,
+    sort: UserSort = UserSort.id,
+    filters: Optional[UserFilter] = None,
+) -> List[AutheneUser]:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.get_page,
+            db_session=db_session,
+            limit=limit,
+            after=after,
+            sort=sort,
+            filters=filters,
+        )
+
+    query = service.build_page_query(
+        limit=limit, after=after, sort=sort, filters=filters
+    )
+    return list(await db_session.scalars(query))
+
+
+async def count(*, db_session, filters: Optional[UserFilter] = None) -> int:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.count, db_session=db_session, filters=filters
+        )
+
+    cache = current().count_cache if filters is None or filters.is_empty() else None
+    total = await call_cache(cache, "get", "all")
+    if total is not None:
+        return total
+
+    total = await db_session.scalar(service.build_count_query(filters))
+    await call_cache(cache, "set", "all", total)
+    return total
+
+
+async def export_rows(
+    *, since: Optional[datetime] = None, batch_size: int
+) -> AsyncIterator[Sequence[Row]]:
+    database = current_database()
+    if database.async_engine is None:
+        iterator = service.export_rows(
+            bind=database.read_engine(), since=since, batch_size=batch_size
+        )
+        try:
+            while True:
+                partition = await run_in_threadpool(next, iterator, None)
+                if partition is None:
+                    break
+                yield partition
+        finally:
+            await run_in_threadpool(iterator.close)
+        return
+
+    query = service.build_export_query(since=since)
+    async with database.async_read_engine().connect() as connection:
+        result = await connection.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+
+async def get(*, db_session, user_id: int) -> Optional[AutheneUser]:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.get, db_session=db_session, user_id=user_id
+        )
+
+    return await db_session.scalar(select(AutheneUser).where(AutheneUser.id == user_id))
+
+
+async def get_by_email(*, db_session, email: str) -> Optional[AutheneUser]:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.get_by_email, db_session=db_session, email=email
+        )
+
+    return await db_session.scalar(
+        select(AutheneUser).where(AutheneUser.email == email)
+    )
+
+
+async def create(
+    *,
+    db_session,
+    user_in: UserRegister | UserCreate,
+    hashed_password: Optional[bytes] = None,
+) -> AutheneUser:
+    if hashed_password is None:
+        hashed_password = await hasher.hash(user_in.password)
+
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.create,
+            db_session=db_session,
+            user_in=user_in,
+            hashed_password=hashed_password,
+        )
+
+    user = service.build_user(user_in=user_in, hashed_password=hashed_password)
+    db_session.add(user)
+    await db_session.commit()
+    await invalidate_principal(user.email)
+    await call_cache(current().count_cache, "clear")
+    return user
+
+
+async def rollback(db_session):
+    if is_async(db_session):
+        await db_session.rollback()
+    else:
+        db_session.rollback()
+
+
+async def get_existing_emails(*, db_session, emails: List[str]) -> set:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.get_existing_emails, db_session=db_session, emails=emails
+        )
+
+    query = select(AutheneUser.email).where(AutheneUser.email.in_(emails))
+    return set(await db_session.scalars(query))
+
+
+async def get_emails_by_id(*, db_session, ids: List[int]) -> dict:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.get_emails_by_id, db_session=db_session, ids=ids
+        )
+
+    query = select(AutheneUser.id, AutheneUser.email).where(AutheneUser.id.in_(ids))
+    return dict((await db_session.execute(query)).all())
+
+
+async def bulk_insert(*, db_session, rows: List[dict]) -> dict:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.bulk_insert, db_session=db_session, rows=rows
+        )
+
+    query = insert(AutheneUser).returning(AutheneUser.email, AutheneUser.id)
+    ids = dict((await db_session.execute(query, rows)).all())
+    await db_session.commit()
+    await call_cache(current().count_cache, "clear")
+    return ids
+
+
+async def bulk_update(*, db_session, rows: List[dict], emails: List[str]):
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.bulk_update, db_session=db_session, rows=rows, emails=emails
+        )
+
+    await db_session.execute(sql_update(AutheneUser), rows)
+    await db_session.commit()
+    for email in emails:
+        await invalidate_principal(email)
+
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+async def bulk_create_users(
+    *, db_session, users_in: List[UserCreate], chunk_size: int
+) -> List[dict]:
+    """Creates users a chunk at a time: one IN query for existing emails, hashing
+    in parallel on the hasher pool and one executemany insert per transaction."""
+    results = [None] * len(users_in)
+    pending, seen = [], set()
+    for index, user_in in enumerate(users_in):
+        if user_in.email in seen:
+            results[index] = {"status": BulkStatus.duplicate}
+        else:
+            seen.add(user_in.email)
+            pending.append((index, user_in))
+
+    for chunk in chunked(pending, chunk_size):
+        existing = await get_existing_emails(
+            db_session=db_session, emails=[u.email for _, u in chunk]
+        )
+        new = []
+        for index, user_in in chunk:
+            if user_in.email in existing:
+                results[index] = {"status": BulkStatus.exists}
+            else:
+                new.append((index, user_in))
+        if not new:
+            continue
+
+        hashes = await asyncio.gather(*(hasher.hash(u.password) for _, u in new))
+        rows = [
+            {"email": u.email, "role": u.role, "password": hashed_password}
+            for (_, u), hashed_password in zip(new, hashes)
+        ]
+        try:
+            ids = await bulk_insert(db_session=db_session, rows=rows)
+        except IntegrityError:
+            await rollback(db_session)
+            logger.exception("Unable to bulk create a chunk of %s users", len(rows))
+            for index, _ in new:
+                results[index] = {
+                    "status": BulkStatus.failed,
+                    "detail": "The chunk containing this item could not be written.",
+                }
+            continue
+
+        for index, user_in in new:
+            results[index] = {"status": BulkStatus.created, "id": ids[user_in.email]}
+
+    return [
+        {"index": index, "email": user_in.email, **result}
+        for index, (user_in, result) in enumerate(zip(users_in, results))
+    ]
+
+
+async def bulk_update_users(
+    *, db_session, users_in: List[UserUpdate], chunk_size: int
+) -> List[dict]:
+    """Updates users a chunk at a time: one IN query for existing ids, hashing
+    in parallel on the hasher pool and one executemany update per transaction."""
+    columns = set(AutheneUser.__table__.columns.keys()) - {"id", "password"}
+    results = [None] * len(users_in)
+    pending, seen = [], set()
+    for index, user_in in enumerate(users_in):
+        if user_in.id in seen:
+            results[index] = {"status": BulkStatus.duplicate}
+        else:
+            seen.add(user_in.id)
+            pending.append((index, user_in))
+
+    for chunk in chunked(pending, chunk_size):
+        emails = await get_emails_by_id(
+            db_session=db_session, ids=[u.id for _, u in chunk]
+        )
+        found = []
+        for index, user_in in chunk:
+            if user_in.id in emails:
+                found.append((index, user_in))
+            else:
+                results[index] = {"status": BulkStatus.not_found}
+        if not found:
+            continue
+
+        hashes = await asyncio.gather(
+            *(hasher.hash(u.password) for _, u in found if u.password)
+        )
+        hashes = iter(hashes)
+        now = datetime.utcnow()
+        rows = []
+        for _, user_in in found:
+            update_data = user_in.model_dump(
+                exclude={"password"}, exclude_defaults=True
+            )
+            row = {k: v for k, v in update_data.items() if k in columns}
+            row.update(id=user_in.id, updated_at=now)
+            if user_in.password:
+                row["password"] = next(hashes)
+            rows.append(row)
+
+        try:
+            await bulk_update(
+                db_session=db_session,
+                rows=rows,
+                emails=[emails[u.id] for _, u in found],
+            )
+        except IntegrityError:
+            await rollback(db_session)
+            logger.exception("Unable to bulk update a chunk of %s users", len(rows))
+            for index, _ in found:
+                results[index] = {
+                    "status": BulkStatus.failed,
+                    "detail": "The chunk containing this item could not be written.",
+                }
+            continue
+
+        for index, user_in in found:
+            results[index] = {"status": BulkStatus.updated, "email": emails[user_in.id]}
+
+    return [
+        {"index": index, "id": user_in.id, **result}
+        for index, (user_in, result) in enumerate(zip(users_in, results))
+    ]
+
+
+async def get_or_create(*, db_session, user_in: UserRegister) -> AutheneUser:
+    user = await get_by_email(db_session=db_session, email=user_in.email)
+    if not user:
+        try:
+            user = await create(db_session=db_session, user_in=user_in)
+        except IntegrityError:
+            await rollback(db_session)
+            # most likely on the primary already, but not yet on the replica read
+            use_primary(db_session)
+            user = await get_by_email(db_session=db_session, email=user_in.email)
+            if not user:
+                logger.exception(
+                    "Unable to create user with email address %s", user_in.email
+                )
+    return user
+
+
+async def update(
+    *,
+    db_session,
+    user: AutheneUser,
+    user_in: UserUpdate,
+    hashed_password: Optional[bytes] = None,
+) -> AutheneUser:
+    if user_in.password and hashed_password is None:
+        hashed_password = await hasher.hash(user_in.password)
+
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.update,
+            db_session=db_session,
+            user=user,
+            user_in=user_in,
+            hashed_password=hashed_password,
+        )
+
+    service.apply_update(user=user, user_in=user_in, hashed_password=hashed_password)
+    await db_session.commit()
+    await invalidate_principal(user.email)
+    return user
+
+
+async def update_password_hash(
+    *, db_session, user: AutheneUser, hashed_password: bytes
+):
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.update_password_hash,
+            db_session=db_session,
+            user=user,
+            hashed_password=hashed_password,
+        )
+
+    user.password = hashed_password
+    await db_session.commit()
+
+
+async def issue_refresh_token(*, db_session, user: AutheneUser) -> str:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.issue_refresh_token, db_session=db_session, user=user
+        )
+
+    token, row = service.build_refresh_token(user.id)
+    db_session.add(row)
+    await db_session.commit()
+    return token
+
+
+async def rotate_refresh_token(
+    *, db_session, token: str
+) -> Optional[Tuple[AutheneUser, str]]:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.rotate_refresh_token, db_session=db_session, token=token
+        )
+
+    user_id = await db_session.scalar(service.build_consume_refresh_token_query(token))
+    if user_id is None:
+        reused_by = await db_session.scalar(
+            service.build_reused_refresh_token_query(token)
+        )
+        if reused_by is not None:
+            logger.warning(f"Refresh token reused, revoking all of user {reused_by}'s.")
+            await db_session.execute(
+                service.build_revoke_refresh_tokens_query(reused_by)
+            )
+        await db_session.commit()
+        return None
+
+    user = await get(db_session=db_session, user_id=user_id)
+    if not user:
+        await db_session.commit()
+        return None
+
+    new_token, row = service.build_refresh_token(user_id)
+    db_session.add(row)
+    await db_session.commit()
+    return user, new_token
+
+
+async def revoke_refresh_token(*, db_session, token: str):
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.revoke_refresh_token, db_session=db_session, token=token
+        )
+
+    await db_session.execute(service.build_delete_refresh_token_query(token))
+    await db_session.commit()
+
+
+async def revoke_access_token(*, db_session, claims: dict):
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.revoke_access_token, db_session=db_session, claims=claims
+        )
+
+    row = service.build_revoked_token(claims)
+    if row is None:
+        return
+
+    db_session.add(row)
+    try:
+        await db_session.commit()
+    except IntegrityError:
+        # already revoked
+        await db_session.rollback()
+    current().revocations.add(claims["jti"], claims["exp"])
+
+
+async def refresh_revocations():
+    database = current_database()
+    if database.async_engine is None:
+        return await run_in_threadpool(service.refresh_revocations, database.engine)
+
+    revocations = current().revocations
+    async with database.async_engine.connect() as connection:
+        rows = (await connection.execute(revocations.build_query())).all()
+    revocations.load(rows)
+
+
+async def watch_revocations(interval: float):
+    """Keeps the revocation list up to date until cancelled."""
+    while True:
+        try:
+            await refresh_revocations()
+        except Exception:
+            logger.exception("Unable to refresh the token revocation list.")
+        await asyncio.sleep(interval)
+
+
+async def create_api_key(
+    *, db_session, user_id: int, api_key_in: ApiKeyCreate
+) -> Tuple[str, AutheneApiKey]:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.create_api_key,
+            db_session=db_session,
+            user_id=user_id,
+            api_key_in=api_key_in,
+        )
+
+    key, row = service.build_api_key(user_id=user_id, api_key_in=api_key_in)
+    db_session.add(row)
+    await db_session.commit()
+    return key, row
+
+
+async def get_api_keys(*, db_session, user_id: int) -> List[AutheneApiKey]:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.get_api_keys, db_session=db_session, user_id=user_id
+        )
+
+    return list(await db_session.scalars(service.build_api_keys_query(user_id)))
+
+
+async def delete_api_key(*, db_session, user_id: int, api_key_id: int) -> bool:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.delete_api_key,
+            db_session=db_session,
+            user_id=user_id,
+            api_key_id=api_key_id,
+        )
+
+    key_hash = await db_session.scalar(
+        service.build_delete_api_key_query(user_id=user_id, api_key_id=api_key_id)
+    )
+    await db_session.commit()
+    if key_hash is None:
+        return False
+
+    await call_cache(current().api_key_provider.cache, "delete", key_hash)
+    return True
+
+
+async def get_principal(*, db_session, email: str) -> Principal:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.get_principal, db_session=db_session, email=email
+        )
+
+    principal = await call_cache(current().principal_cache, "get", email)
+    if principal:
+        return principal
+
+    user = await get_by_email(db_session=db_session, email=email)
+    if not user:
+        raise service.InvalidCredentialException
+
+    principal = Principal.from_user(user)
+    await call_cache(current().principal_cache, "set", email, principal)
+    return principal
+
+
+async def get_principals(*, db_session, emails: Sequence[str]) -> Dict[str, Principal]:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.get_principals, db_session=db_session, emails=emails
+        )
+
+    cache = current().principal_cache
+    if cache is not None and cache.blocking:
+        principals, missing = await run_in_threadpool(
+            service.get_cached_principals, emails
+        )
+    else:
+        principals, missing = service.get_cached_principals(emails)
+
+    if missing:
+        result = await db_session.execute(service.build_principals_query(missing))
+        for row in result:
+            principal = Principal(id=row.id, email=row.email, role=row.role)
+            principals[row.email] = principal
+            await call_cache(cache, "set", row.email, principal)
+    return principals
+
+
+async def authenticate_api_key(
+    *, db_session, key: str
+) -> Tuple[ApiKeyGrant, Principal]:
+    if not is_async(db_session):
+        return await run_in_threadpool(
+            service.authenticate_api_key, db_session=db_session, key=key
+        )
+
+    provider = current().api_key_provider
+    key_hash = service.hash_api_key(key)
+    now = datetime.utcnow()
+
+    principal = None
+    grant = await call_cache(provider.cache, "get", key_hash)
+    if grant is None:
+        row = (await db_session.execute(service.build_api_key_query(key_hash))).first()
+        if row is None:
+            raise service.InvalidCredentialException
+        grant, principal = provider.build_grant(row)
+        await call_cache(provider.cache, "set", key_hash, grant)
+        await call_cache(current().principal_cache, "set", principal.email, principal)
+    provider.check(grant, now)
+
+    if provider.needs_touch(grant, now):
+        await db_session.execute(service.build_touch_api_key_query(grant.id, now))
+        await db_session.commit()
+        grant.last_used_at = now
+        await call_cache(provider.cache, "set", key_hash, grant)
+
+    if principal is None:
+        principal = await get_principal(db_session=db_session, email=grant.email)
+    return grant, principal
+
+
+async def resolve_user(*, db_session, email: str) -> AutheneUser:
+    user = await get_by_email(db_session=db_session, email=email)
+    if not user:
+        user = await get_or_create(
+            db_session=db_session, user_in=UserRegister(email=email)
+        )
+
+    if user:
+        await call_cache(
+            current().principal_cache, "set", email, Principal.from_user(user)
+        )
+    return user
+
+
+async def get_current_user(request: Request) -> AutheneUser:
+    key = current().api_key_provider.get_key(request)
+    if key is not None:
+        db_session = get_db(request)
+        request.state.api_key, principal = await authenticate_api_key(
+            db_session=db_session, key=key
+        )
+        user = await get(db_session=db_session, user_id=principal.id)
+        if not user:
+            raise service.InvalidCredentialException
+        return user
+
+    user_email = service.get_current_email(request)
+    return await resolve_user(db_session=get_db(request), email=user_email)
+
+
+async def get_current_principal(request: Request) -> Principal:
+    """Gets the identity of the current user, without touching the database when cached."""
+    key = current().api_key_provider.get_key(request)
+    if key is not None:
+        request.state.api_key, principal = await authenticate_api_key(
+            db_session=get_db(request), key=key
+        )
+        return principal
+
+    user_email = service.get_current_email(request)
+    principal = await call_cache(current().principal_cache, "get", user_email)
+    if principal:
+        return principal
+
+    user = await resolve_user(db_session=get_db(request), email=user_email)
+    if not user:
+        raise service.InvalidCredentialException
+    return Principal.from_user(user)
+
+
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+
+def require_scope(scope: ApiKeyScope):
+    """A dependency turning away API keys without `scope`, tokens are unscoped."""
+
+    async def check_scope(request: Request, current_principal: CurrentPrincipal):
+        grant = getattr(request.state, "api_key", None)
+        if grant is not None and scope.value not in grant.scopes:
+            raise HTTPException(
+                status_code=HTTP_403_FORBIDDEN,
+                detail=[{"msg": f"The API key lacks the '{scope}' scope."}],
+            )
+
+    return Depends(check_scope)
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import Row
+
+from authene.auth.service import EXPORT_COLUMNS
+from authene_common.enums import ExportFormat
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def format_value(value):
+    # same output as the datetime json encoder on AutheneBase
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return value
+
+
+def encode_ndjson(rows: Sequence[Row]) -> bytes:
+    lines = (
+        json.dumps(dict(zip(EXPORT_COLUMNS, map(format_value, row)))) for row in rows
+    )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def encode_csv(rows: Sequence[Row]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([format_value(v) for v in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def stream_export(
+    partitions: AsyncIterator[Sequence[Row]], format: ExportFormat
+) -> AsyncIterator[bytes]:
+    """Encodes each batch of rows as soon as it arrives, one chunk per batch."""
+    if format == ExportFormat.csv:
+        yield encode_csv([EXPORT_COLUMNS])
+        encode = encode_csv
+    else:
+        encode = encode_ndjson
+
+    async for rows in partitions:
+        if rows:
+            yield encode(rows)
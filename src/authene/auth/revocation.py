@@ -0,0 +1,119 @@
+"""The in-memory list of revoked access tokens.
+
+Revoked token ids (`jti`) are stored in the `authene_revoked_token` table.
+Each worker keeps a copy of the ones that have not expired yet: a Bloom
+filter that rules out almost every token with a few bit lookups, backed by
+an exact set that settles the rare false positive. Checking a token never
+queries the database; the copy is brought up to date by `refresh`, which
+only reads the rows added since the last call.
+
+SQLAlchemy is only imported once the list is refreshed and the models
+never are, so `authene.edge` can keep a list without them.
+"""
+
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Tuple
+
+from authene_common.bloom import BloomFilter
+
+if TYPE_CHECKING:
+    from sqlalchemy import Select, TableClause
+
+# ids are not always committed in order by concurrent transactions, each
+# refresh reads back this many ids before the last one it saw
+REFRESH_OVERLAP = 100
+
+
+def timestamp(value: datetime) -> float:
+    # expiry datetimes are stored naive, in UTC
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+@lru_cache(maxsize=None)
+def revoked_tokens() -> "TableClause":
+    """The columns of `AutheneRevokedToken` the list reads, as a lightweight table."""
+    from sqlalchemy import DateTime, Integer, String, column, table
+
+    return table(
+        "authene_revoked_token",
+        column("id", Integer),
+        column("jti", String),
+        column("expires_at", DateTime),
+    )
+
+
+class RevocationList(object):
+    def __init__(
+        self,
+        capacity: int = 1024,
+        error_rate: float = 0.001,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.clock = clock
+        self.last_id = 0
+
+        self._expiry: Dict[str, float] = {}
+        self._filter = BloomFilter(capacity, error_rate)
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def __contains__(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._filter and jti in self._expiry
+
+    def add(self, jti: str, expires_at: float):
+        with self._lock:
+            self._add(jti, expires_at)
+
+    def _add(self, jti: str, expires_at: float):
+        if jti in self._expiry:
+            return
+        self._expiry[jti] = expires_at
+        if len(self._filter) >= self._filter.capacity:
+            self._rebuild()
+        else:
+            self._filter.add(jti)
+
+    def _rebuild(self):
+        # a new filter, with room to grow, swapped in once it is complete
+        bloom = BloomFilter(max(self.capacity, 2 * len(self._expiry)), self.error_rate)
+        for jti in self._expiry:
+            bloom.add(jti)
+        self._filter = bloom
+
+    def build_query(self) -> "Select":
+        """Selects the unexpired revocations added since the last refresh."""
+        from sqlalchemy import select
+
+        revoked = revoked_tokens().c
+        return (
+            select(revoked.id, revoked.jti, revoked.expires_at)
+            .where(revoked.id > self.last_id - REFRESH_OVERLAP)
+            .where(revoked.expires_at > datetime.utcnow())
+            .order_by(revoked.id)
+        )
+
+    def load(self, rows: Iterable[Tuple[int, str, datetime]]):
+        """Adds the rows returned by `build_query` and drops expired entries."""
+        with self._lock:
+            for id, jti, expires_at in rows:
+                self._add(jti, timestamp(expires_at))
+                self.last_id = max(self.last_id, id)
+            self._prune()
+
+    def _prune(self):
+        now = self.clock()
+        expired = [jti for jti, exp in self._expiry.items() if exp <= now]
+        if expired:
+            for jti in expired:
+                del self._expiry[jti]
+            self._rebuild()
+
+    def refresh(self, connection):
+        self.load(connection.execute(self.build_query()))
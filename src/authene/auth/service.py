@@ -1,18 +1,51 @@
+import hashlib
 import logging
-from typing import Annotated, Optional
+import math
+import secrets
+from datetime import datetime, timedelta
+from typing import Annotated, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from fastapi import Depends, HTTPException
 from fastapi.security.utils import get_authorization_scheme_param
-from jose import JWTError, jwt
-from jose.exceptions import JWKError
+from sqlalchemy import (
+    Delete,
+    Engine,
+    Row,
+    Select,
+    Update,
+    and_,
+)
+from sqlalchemy import delete as sql_delete
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy import update as sql_update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from starlette.requests import Request
-from starlette.status import HTTP_401_UNAUTHORIZED
-
-from authene.models import AutheneUser, UserCreate, UserRegister, UserUpdate
-from authene_common.config import AUTHENE_AUTH_REGISTRATION_ENABLED, AUTHENE_JWT_SECRET
-from authene_common.enums import UserRoles
+from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_429_TOO_MANY_REQUESTS
+
+from authene.auth.verifier import TokenVerifier
+from authene.models import (
+    ApiKeyCreate,
+    ApiKeyGrant,
+    AutheneApiKey,
+    AutheneRefreshToken,
+    AutheneRevokedToken,
+    AutheneUser,
+    Principal,
+    UserCreate,
+    UserFilter,
+    UserRegister,
+    UserUpdate,
+    hash_password,
+)
+from authene.runtime import current
+from authene_common.cache import CacheBackend
+from authene_common.config import (
+    AUTHENE_AUTH_REGISTRATION_ENABLED,
+    AUTHENE_JWT_REFRESH_EXP,
+)
+from authene_common.database import get_db, use_primary
+from authene_common.enums import UserRoles, UserSort
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +56,8 @@ InvalidCredentialException = HTTPException(
 )
 
 
-class BasicAuthProviderPlugin(object):
-    def get_current_user(self, request: Request, **kwargs):
+class BasicAuthProviderPlugin(TokenVerifier):
+    def get_current_claims(self, request: Request, **kwargs) -> Optional[dict]:
         authorization: str = request.headers.get("Authorization")
         scheme, param = get_authorization_scheme_param(authorization)
         if not authorization or scheme.lower() != "bearer":
@@ -35,27 +68,285 @@ class BasicAuthProviderPlugin(object):
 
         token = authorization.split()[1]
 
-        try:
-            data = jwt.decode(token, AUTHENE_JWT_SECRET)
-        except (JWKError, JWTError):
-            raise HTTPException(
-                status_code=HTTP_401_UNAUTHORIZED,
-                detail=[{"msg": "Could not validate credentials"}],
-            ) from None
-        return data["email"]
+        data, _ = self.introspect(token)
+        if data is None:
+            raise InvalidCredentialException
+        return data
+
+    def get_current_user(self, request: Request, **kwargs):
+        data = self.get_current_claims(request)
+        if data:
+            return data["email"]
+
+
+API_KEY_PREFIX = "ak_"
+
+
+def hash_api_key(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class ApiKeyAuthProviderPlugin(object):
+    """Authenticates machine clients by API key, next to BasicAuthProviderPlugin.
+
+    Keys are random, so their sha256 digest is all that is stored and
+    verifying one is a lookup on the unique key_hash index rather than a
+    password check. The grants found are cached by digest. Keys are sent in
+    an X-API-Key header, or as a bearer token by clients that only do those.
+    """
+
+    def __init__(
+        self, cache: Optional[CacheBackend] = None, touch_interval: float = 60
+    ):
+        self.cache = cache
+        self.touch_interval = timedelta(seconds=touch_interval)
+
+    def get_key(self, request: Request) -> Optional[str]:
+        key = request.headers.get("X-API-Key")
+        if key:
+            return key
+
+        scheme, param = get_authorization_scheme_param(
+            request.headers.get("Authorization")
+        )
+        # access tokens are JWTs, which never start with the prefix
+        if scheme.lower() == "bearer" and param.startswith(API_KEY_PREFIX):
+            return param
+        return None
+
+    def build_grant(self, row: Row) -> Tuple[ApiKeyGrant, Principal]:
+        """The grant and principal of a row of `build_api_key_query`."""
+        grant = ApiKeyGrant(
+            id=row.id,
+            email=row.email,
+            scopes=frozenset((row.scopes or "").split()),
+            expires_at=row.expires_at,
+            last_used_at=row.last_used_at,
+        )
+        return grant, Principal(id=row.user_id, email=row.email, role=row.role)
+
+    def check(self, grant: ApiKeyGrant, now: datetime):
+        if grant.expires_at is not None and grant.expires_at <= now:
+            raise InvalidCredentialException
+
+    def needs_touch(self, grant: ApiKeyGrant, now: datetime) -> bool:
+        """Whether last_used_at is due a write, at most once per interval."""
+        return grant.last_used_at is None or (
+            now - grant.last_used_at >= self.touch_interval
+        )
+
+
+def throttle_login(request: Request, email: str):
+    """Rejects the attempt with a 429 once the email or client ip runs out of attempts."""
+    login_limiter = current().login_limiter
+    if login_limiter is None:
+        return
+
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = login_limiter.hit(f"login:email:{email}", f"login:ip:{client_ip}")
+    if retry_after:
+        raise HTTPException(
+            status_code=HTTP_429_TOO_MANY_REQUESTS,
+            detail=[{"msg": "Too many login attempts, try again later."}],
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
 
 
-auth_provider = BasicAuthProviderPlugin()
+def clear_count_cache():
+    count_cache = current().count_cache
+    if count_cache is not None:
+        count_cache.clear()
+
+
+def invalidate_principal(email: str):
+    """Drops the cached principal for the given email, if any."""
+    principal_cache = current().principal_cache
+    if principal_cache is not None:
+        principal_cache.delete(email)
 
 
 def get_all(*, db_session: Session, filter=None):
     query = db_session.query(AutheneUser)
-    if filter:
-        query.filter(filter)
+    if filter is not None:
+        query = query.filter(filter)
 
     return query.all()
 
 
+def page_key_types(sort: UserSort) -> Tuple[type, ...]:
+    if sort == UserSort.created_at:
+        return (datetime, int)
+    return (int,)
+
+
+def page_key(user: AutheneUser, sort: UserSort) -> Tuple:
+    """The keyset position of a user for the given sort order."""
+    if sort == UserSort.created_at:
+        return (user.created_at, user.id)
+    return (user.id,)
+
+
+def prefix_range(prefix: str) -> Tuple[str, Optional[str]]:
+    """The [lower, upper) range of the strings starting with `prefix` under a
+    binary collation, upper is None when nothing sorts after them."""
+    head = prefix
+    while head:
+        following = ord(head[-1]) + 1
+        if following == 0xD800:
+            # surrogates can't be stored, skip past them
+            following = 0xE000
+        if following <= 0x10FFFF:
+            return prefix, head[:-1] + chr(following)
+        head = head[:-1]
+    return prefix, None
+
+
+def build_filter_conditions(filters: Optional[UserFilter]) -> list:
+    """The WHERE conditions of `filters`, each an equality or a range on an
+    indexed column.
+
+    The email prefix is a range rather than LIKE, which SQLite only searches
+    an index for when case sensitive and PostgreSQL only under the C
+    collation or with a pattern ops index.
+    """
+    if filters is None:
+        return []
+
+    conditions = []
+    if filters.role:
+        conditions.append(AutheneUser.role.in_(filters.role))
+    if filters.email_prefix:
+        lower, upper = prefix_range(filters.email_prefix)
+        conditions.append(AutheneUser.email >= lower)
+        if upper is not None:
+            conditions.append(AutheneUser.email < upper)
+    for column, since, before in (
+        (AutheneUser.created_at, filters.created_since, filters.created_before),
+        (AutheneUser.updated_at, filters.updated_since, filters.updated_before),
+    ):
+        if since is not None:
+            conditions.append(column >= since)
+        if before is not None:
+            conditions.append(column < before)
+    return conditions
+
+
+def searches_in_page_order(filters: Optional[UserFilter], sort: UserSort) -> bool:
+    """Whether an index finds the users matching `filters` in page order.
+
+    The role indexes serve a single role in either order and (created_at, id)
+    serves its ranges sorted by created_at. The users matching several roles,
+    an email prefix or an updated_at range have to be sorted once found.
+    """
+    if filters is None or filters.is_empty() or len(filters.role) == 1:
+        return True
+    if filters.role:
+        return False
+    return sort == UserSort.created_at and (
+        filters.created_since is not None or filters.created_before is not None
+    )
+
+
+def build_page_query(
+    *,
+    limit: int,
+    after: Optional[Tuple] = None,
+    sort: UserSort = UserSort.id,
+    filters: Optional[UserFilter] = None,
+) -> Select:
+    """Builds a keyset query for the `limit` users following `after`."""
+    conditions = build_filter_conditions(filters)
+
+    if sort == UserSort.created_at:
+        if after is not None:
+            created_at, user_id = after
+            conditions.append(
+                or_(
+                    AutheneUser.created_at > created_at,
+                    and_(
+                        AutheneUser.created_at == created_at,
+                        AutheneUser.id > user_id,
+                    ),
+                )
+            )
+        order_by = (AutheneUser.created_at, AutheneUser.id)
+    else:
+        if after is not None:
+            conditions.append(AutheneUser.id > after[0])
+        order_by = (AutheneUser.id,)
+
+    if not searches_in_page_order(filters, sort):
+        # find the ids on the filter's index and sort them, SQLite would
+        # rather walk the primary key in page order and can end up reading
+        # the whole table when few users match
+        conditions = [AutheneUser.id.in_(select(AutheneUser.id).where(*conditions))]
+
+    return select(AutheneUser).where(*conditions).order_by(*order_by).limit(limit)
+
+
+def get_page(
+    *,
+    db_session: Session,
+    limit: int,
+    after: Optional[Tuple] = None,
+    sort: UserSort = UserSort.id,
+    filters: Optional[UserFilter] = None,
+) -> List[AutheneUser]:
+    query = build_page_query(limit=limit, after=after, sort=sort, filters=filters)
+    return db_session.scalars(query).all()
+
+
+def build_count_query(filters: Optional[UserFilter] = None) -> Select:
+    return (
+        select(func.count())
+        .select_from(AutheneUser)
+        .where(*build_filter_conditions(filters))
+    )
+
+
+def count(*, db_session: Session, filters: Optional[UserFilter] = None) -> int:
+    """Counts the users matching `filters`, reusing a recent count of all
+    users when the count cache is enabled."""
+    count_cache = current().count_cache
+    cached = count_cache is not None and (filters is None or filters.is_empty())
+    if cached:
+        total = count_cache.get("all")
+        if total is not None:
+            return total
+
+    total = db_session.scalar(build_count_query(filters))
+    if cached:
+        count_cache.set("all", total)
+    return total
+
+
+EXPORT_COLUMNS = ("id", "email", "role", "created_at", "updated_at")
+
+
+def build_export_query(*, since: Optional[datetime] = None) -> Select:
+    """Selects plain export rows, following the (updated_at, id) index with `since`."""
+    query = select(*(getattr(AutheneUser, c) for c in EXPORT_COLUMNS))
+    if since is not None:
+        return query.where(AutheneUser.updated_at >= since).order_by(
+            AutheneUser.updated_at, AutheneUser.id
+        )
+    return query.order_by(AutheneUser.id)
+
+
+def export_rows(
+    *, bind: Engine, since: Optional[datetime] = None, batch_size: int
+) -> Iterator[Sequence[Row]]:
+    """Streams users in batches over a server-side cursor on its own connection.
+
+    The connection outlives the request's session, which is closed before a
+    streaming response has finished sending its body.
+    """
+    query = build_export_query(since=since)
+    with bind.connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(query)
+        yield from result.partitions()
+
+
 def get(*, db_session: Session, user_id: int) -> Optional[AutheneUser]:
     return db_session.query(AutheneUser).filter(AutheneUser.id == user_id).one_or_none()
 
@@ -66,22 +357,66 @@ def get_by_email(*, db_session: Session, email: str) -> Optional[AutheneUser]:
     )
 
 
-def create(*, db_session: Session, user_in: (UserRegister | UserCreate)) -> AutheneUser:
-    password = bytes(user_in.password, "utf-8")
+def build_user(
+    *, user_in: UserRegister | UserCreate, hashed_password: bytes
+) -> AutheneUser:
     user = AutheneUser(
-        **user_in.model_dump(exclude={"password", "role"}), password=password
+        **user_in.model_dump(exclude={"password", "role"}), password=hashed_password
     )
 
     role = UserRoles.member
     if hasattr(user_in, "role"):
         role = user_in.role
     user.role = role
+    return user
+
+
+def create(
+    *,
+    db_session: Session,
+    user_in: UserRegister | UserCreate,
+    hashed_password: Optional[bytes] = None,
+) -> AutheneUser:
+    if hashed_password is None:
+        hashed_password = hash_password(user_in.password)
 
+    user = build_user(user_in=user_in, hashed_password=hashed_password)
     db_session.add(user)
     db_session.commit()
+    invalidate_principal(user.email)
+    clear_count_cache()
     return user
 
 
+def get_existing_emails(*, db_session: Session, emails: List[str]) -> set:
+    """Returns which of the given emails already belong to a user, in one query."""
+    query = select(AutheneUser.email).where(AutheneUser.email.in_(emails))
+    return set(db_session.scalars(query))
+
+
+def get_emails_by_id(*, db_session: Session, ids: List[int]) -> dict:
+    """Maps the given user ids that exist to their emails, in one query."""
+    query = select(AutheneUser.id, AutheneUser.email).where(AutheneUser.id.in_(ids))
+    return dict(db_session.execute(query).all())
+
+
+def bulk_insert(*, db_session: Session, rows: List[dict]) -> dict:
+    """Inserts users with a single executemany and commits, returns email -> id."""
+    query = insert(AutheneUser).returning(AutheneUser.email, AutheneUser.id)
+    ids = dict(db_session.execute(query, rows).all())
+    db_session.commit()
+    clear_count_cache()
+    return ids
+
+
+def bulk_update(*, db_session: Session, rows: List[dict], emails: List[str]):
+    """Updates users by primary key with a single executemany and commits."""
+    db_session.execute(sql_update(AutheneUser), rows)
+    db_session.commit()
+    for email in emails:
+        invalidate_principal(email)
+
+
 def get_or_create(*, db_session: Session, user_in: UserRegister) -> AutheneUser:
     user = get_by_email(db_session=db_session, email=user_in.email)
     if not user:
@@ -89,15 +424,19 @@ def get_or_create(*, db_session: Session, user_in: UserRegister) -> AutheneUser:
             user = create(db_session=db_session, user_in=user_in)
         except IntegrityError:
             db_session.rollback()
-            logger.exception(
-                "Unable to create user with email address %s", user_in.email
-            )
+            # most likely on the primary already, but not yet on the replica read
+            use_primary(db_session)
+            user = get_by_email(db_session=db_session, email=user_in.email)
+            if not user:
+                logger.exception(
+                    "Unable to create user with email address %s", user_in.email
+                )
     return user
 
 
-def update(
-    *, db_session: Session, user: AutheneUser, user_in: UserUpdate
-) -> AutheneUser:
+def apply_update(
+    *, user: AutheneUser, user_in: UserUpdate, hashed_password: Optional[bytes]
+):
     user_data = user.dict()
 
     update_data = user_in.model_dump(exclude={"password"}, exclude_defaults=True)
@@ -106,31 +445,428 @@ def update(
         if field in update_data:
             setattr(user, field, update_data[field])
 
-    if user_in.password:
-        password = bytes(user_in.password, "utf-8")
-        user.password = password
+    if hashed_password:
+        user.password = hashed_password
+
 
+def update(
+    *,
+    db_session: Session,
+    user: AutheneUser,
+    user_in: UserUpdate,
+    hashed_password: Optional[bytes] = None,
+) -> AutheneUser:
+    if user_in.password and hashed_password is None:
+        hashed_password = hash_password(user_in.password)
+
+    apply_update(user=user, user_in=user_in, hashed_password=hashed_password)
     db_session.commit()
+    invalidate_principal(user.email)
     return user
 
 
-def get_current_user(request: Request) -> AutheneUser:
-    user_email = auth_provider.get_current_user(request)
+def update_password_hash(
+    *, db_session: Session, user: AutheneUser, hashed_password: bytes
+):
+    """Stores a new hash of the user's unchanged password."""
+    user.password = hashed_password
+    db_session.commit()
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def build_refresh_token(user_id: int) -> Tuple[str, AutheneRefreshToken]:
+    """A new refresh token and the row storing its digest."""
+    token = secrets.token_urlsafe(32)
+    row = AutheneRefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        expires_at=datetime.utcnow() + timedelta(seconds=AUTHENE_JWT_REFRESH_EXP),
+    )
+    return token, row
+
+
+def build_consume_refresh_token_query(token: str) -> Update:
+    """Revokes an unused, unexpired refresh token, returning its user's id.
+
+    Doing it in one statement means a token can only be exchanged once, even
+    by concurrent requests.
+    """
+    now = datetime.utcnow()
+    return (
+        sql_update(AutheneRefreshToken)
+        .where(
+            AutheneRefreshToken.token_hash == hash_refresh_token(token),
+            AutheneRefreshToken.revoked_at.is_(None),
+            AutheneRefreshToken.expires_at > now,
+        )
+        .values(revoked_at=now)
+        .returning(AutheneRefreshToken.user_id)
+    )
+
+
+def build_reused_refresh_token_query(token: str) -> Select:
+    return select(AutheneRefreshToken.user_id).where(
+        AutheneRefreshToken.token_hash == hash_refresh_token(token),
+        AutheneRefreshToken.revoked_at.is_not(None),
+    )
+
+
+def build_revoke_refresh_tokens_query(user_id: int) -> Update:
+    return (
+        sql_update(AutheneRefreshToken)
+        .where(
+            AutheneRefreshToken.user_id == user_id,
+            AutheneRefreshToken.revoked_at.is_(None),
+        )
+        .values(revoked_at=datetime.utcnow())
+    )
+
+
+def issue_refresh_token(*, db_session: Session, user: AutheneUser) -> str:
+    token, row = build_refresh_token(user.id)
+    db_session.add(row)
+    db_session.commit()
+    return token
+
+
+def rotate_refresh_token(
+    *, db_session: Session, token: str
+) -> Optional[Tuple[AutheneUser, str]]:
+    """Exchanges a refresh token for a new one, returning it with its user.
+
+    Refresh tokens are single use. One presented again has leaked, so every
+    refresh token of its user is revoked and they have to log in again.
+    """
+    user_id = db_session.execute(build_consume_refresh_token_query(token)).scalar()
+    if user_id is None:
+        reused_by = db_session.execute(build_reused_refresh_token_query(token)).scalar()
+        if reused_by is not None:
+            logger.warning(f"Refresh token reused, revoking all of user {reused_by}'s.")
+            db_session.execute(build_revoke_refresh_tokens_query(reused_by))
+        db_session.commit()
+        return None
+
+    user = get(db_session=db_session, user_id=user_id)
+    if not user:
+        db_session.commit()
+        return None
+
+    new_token, row = build_refresh_token(user_id)
+    db_session.add(row)
+    db_session.commit()
+    return user, new_token
+
+
+def build_delete_refresh_token_query(token: str) -> Delete:
+    # deleted rather than revoked, presenting it again is not a reuse
+    return sql_delete(AutheneRefreshToken).where(
+        AutheneRefreshToken.token_hash == hash_refresh_token(token)
+    )
+
+
+def revoke_refresh_token(*, db_session: Session, token: str):
+    db_session.execute(build_delete_refresh_token_query(token))
+    db_session.commit()
+
+
+def build_revoked_token(claims: dict) -> Optional[AutheneRevokedToken]:
+    if not claims.get("jti"):
+        return None
+    return AutheneRevokedToken(
+        jti=claims["jti"], expires_at=datetime.utcfromtimestamp(claims["exp"])
+    )
+
+
+def revoke_access_token(*, db_session: Session, claims: dict):
+    """Revokes an access token until it expires, on every worker.
+
+    This worker stops accepting it right away, the others on their next
+    refresh of the revocation list.
+    """
+    row = build_revoked_token(claims)
+    if row is None:
+        return
+
+    db_session.add(row)
+    try:
+        db_session.commit()
+    except IntegrityError:
+        # already revoked
+        db_session.rollback()
+    current().revocations.add(claims["jti"], claims["exp"])
+
+
+def refresh_revocations(bind: Engine):
+    with bind.connect() as connection:
+        current().revocations.refresh(connection)
+
+
+def build_api_key(
+    *, user_id: int, api_key_in: ApiKeyCreate
+) -> Tuple[str, AutheneApiKey]:
+    """A new API key and the row storing its digest."""
+    key = API_KEY_PREFIX + secrets.token_urlsafe(32)
+    expires_at = None
+    if api_key_in.expires_in:
+        expires_at = datetime.utcnow() + timedelta(seconds=api_key_in.expires_in)
+    row = AutheneApiKey(
+        user_id=user_id,
+        name=api_key_in.name,
+        prefix=key[: len(API_KEY_PREFIX) + 8],
+        key_hash=hash_api_key(key),
+        scopes=" ".join(sorted({scope.value for scope in api_key_in.scopes})),
+        expires_at=expires_at,
+    )
+    return key, row
+
+
+def create_api_key(
+    *, db_session: Session, user_id: int, api_key_in: ApiKeyCreate
+) -> Tuple[str, AutheneApiKey]:
+    key, row = build_api_key(user_id=user_id, api_key_in=api_key_in)
+    db_session.add(row)
+    db_session.commit()
+    return key, row
+
+
+def build_api_keys_query(user_id: int) -> Select:
+    return (
+        select(AutheneApiKey)
+        .where(AutheneApiKey.user_id == user_id)
+        .order_by(AutheneApiKey.id)
+    )
+
+
+def get_api_keys(*, db_session: Session, user_id: int) -> List[AutheneApiKey]:
+    return db_session.scalars(build_api_keys_query(user_id)).all()
+
+
+def build_delete_api_key_query(*, user_id: int, api_key_id: int) -> Delete:
+    return (
+        sql_delete(AutheneApiKey)
+        .where(AutheneApiKey.id == api_key_id, AutheneApiKey.user_id == user_id)
+        .returning(AutheneApiKey.key_hash)
+    )
+
+
+def delete_api_key(*, db_session: Session, user_id: int, api_key_id: int) -> bool:
+    """Revokes one of the user's API keys, returning whether it existed.
+
+    A memory cache only forgets the key in this worker, the others keep
+    accepting it for up to AUTHENE_API_KEY_CACHE_TTL unless its deletes are
+    broadcast.
+    """
+    key_hash = db_session.execute(
+        build_delete_api_key_query(user_id=user_id, api_key_id=api_key_id)
+    ).scalar()
+    db_session.commit()
+    if key_hash is None:
+        return False
+
+    cache = current().api_key_provider.cache
+    if cache is not None:
+        cache.delete(key_hash)
+    return True
+
+
+def build_api_key_query(key_hash: str) -> Select:
+    """An API key and its user, found on the unique key_hash index."""
+    return (
+        select(
+            AutheneApiKey.id,
+            AutheneApiKey.scopes,
+            AutheneApiKey.expires_at,
+            AutheneApiKey.last_used_at,
+            AutheneUser.id.label("user_id"),
+            AutheneUser.email,
+            AutheneUser.role,
+        )
+        .join(AutheneUser, AutheneUser.id == AutheneApiKey.user_id)
+        .where(AutheneApiKey.key_hash == key_hash)
+    )
+
+
+def build_touch_api_key_query(api_key_id: int, now: datetime) -> Update:
+    return (
+        sql_update(AutheneApiKey)
+        .where(AutheneApiKey.id == api_key_id)
+        .values(last_used_at=now)
+    )
+
+
+def get_principal(*, db_session: Session, email: str) -> Principal:
+    """The principal of an existing user, from the principal cache if there."""
+    principal_cache = current().principal_cache
+    if principal_cache is not None:
+        principal = principal_cache.get(email)
+        if principal:
+            return principal
+
+    user = get_by_email(db_session=db_session, email=email)
+    if not user:
+        raise InvalidCredentialException
+
+    principal = Principal.from_user(user)
+    if principal_cache is not None:
+        principal_cache.set(email, principal)
+    return principal
+
+
+def build_principals_query(emails: Sequence[str]) -> Select:
+    return select(AutheneUser.id, AutheneUser.email, AutheneUser.role).where(
+        AutheneUser.email.in_(emails)
+    )
+
+
+def get_cached_principals(emails: Sequence[str]) -> Tuple[Dict[str, Principal], list]:
+    """Splits `emails` into the principals cached and the emails that are not."""
+    principal_cache = current().principal_cache
+    principals = {}
+    missing = []
+    for email in dict.fromkeys(emails):
+        principal = principal_cache.get(email) if principal_cache is not None else None
+        if principal:
+            principals[email] = principal
+        else:
+            missing.append(email)
+    return principals, missing
+
+
+def get_principals(
+    *, db_session: Session, emails: Sequence[str]
+) -> Dict[str, Principal]:
+    """The principals of the existing users among `emails`, keyed by email.
+
+    Cached principals cost nothing, the rest are resolved with a single
+    query. Unknown emails are left out, nothing is created.
+    """
+    principals, missing = get_cached_principals(emails)
+    principal_cache = current().principal_cache
+    if missing:
+        for row in db_session.execute(build_principals_query(missing)):
+            principal = Principal(id=row.id, email=row.email, role=row.role)
+            principals[row.email] = principal
+            if principal_cache is not None:
+                principal_cache.set(row.email, principal)
+    return principals
+
+
+def authenticate_api_key(
+    *, db_session: Session, key: str
+) -> Tuple[ApiKeyGrant, Principal]:
+    """Verifies an API key, returning its grant and its user's principal.
+
+    A cached grant costs no query, otherwise the key and its user take one
+    indexed lookup. The principal of a cached grant is resolved like a
+    token's, so a changed role applies as soon as it is invalidated.
+    """
+    key_hash = hash_api_key(key)
+    now = datetime.utcnow()
+    runtime = current()
+    api_key_provider, principal_cache = (
+        runtime.api_key_provider,
+        runtime.principal_cache,
+    )
+    cache = api_key_provider.cache
+
+    principal = None
+    grant = cache.get(key_hash) if cache is not None else None
+    if grant is None:
+        row = db_session.execute(build_api_key_query(key_hash)).first()
+        if row is None:
+            raise InvalidCredentialException
+        grant, principal = api_key_provider.build_grant(row)
+        if cache is not None:
+            cache.set(key_hash, grant)
+        if principal_cache is not None:
+            principal_cache.set(principal.email, principal)
+    api_key_provider.check(grant, now)
+
+    if api_key_provider.needs_touch(grant, now):
+        db_session.execute(build_touch_api_key_query(grant.id, now))
+        db_session.commit()
+        grant.last_used_at = now
+        if cache is not None:
+            cache.set(key_hash, grant)
+
+    if principal is None:
+        principal = get_principal(db_session=db_session, email=grant.email)
+    return grant, principal
+
+
+def get_current_email(request: Request) -> str:
+    user_email = current().auth_provider.get_current_user(request)
     if not user_email:
         logger.exception(
             f"Unable to determine user email based on configured auth provider or no default auth user email defined."
         )
         raise InvalidCredentialException
+    return user_email
 
-    return get_or_create(
-        db_session=request.state.db,
-        user_in=UserRegister(email=user_email),
-    )
+
+def resolve_user(*, db_session: Session, email: str) -> AutheneUser:
+    # we only build a UserRegister (and pay for hashing a generated password)
+    # when the user does not exist yet
+    user = get_by_email(db_session=db_session, email=email)
+    if not user:
+        user = get_or_create(db_session=db_session, user_in=UserRegister(email=email))
+
+    principal_cache = current().principal_cache
+    if user and principal_cache is not None:
+        principal_cache.set(email, Principal.from_user(user))
+    return user
+
+
+def get_current_user(request: Request) -> AutheneUser:
+    key = current().api_key_provider.get_key(request)
+    if key is not None:
+        db_session = get_db(request)
+        request.state.api_key, principal = authenticate_api_key(
+            db_session=db_session, key=key
+        )
+        user = get(db_session=db_session, user_id=principal.id)
+        if not user:
+            raise InvalidCredentialException
+        return user
+
+    user_email = get_current_email(request)
+    return resolve_user(db_session=get_db(request), email=user_email)
 
 
 CurrentUser = Annotated[AutheneUser, Depends(get_current_user)]
 
 
-def get_current_role(request: Request, current_user: CurrentUser) -> UserRoles:
+def get_current_principal(request: Request) -> Principal:
+    """Gets the identity of the current user, without touching the database when cached."""
+    runtime = current()
+    key = runtime.api_key_provider.get_key(request)
+    if key is not None:
+        request.state.api_key, principal = authenticate_api_key(
+            db_session=get_db(request), key=key
+        )
+        return principal
+
+    user_email = get_current_email(request)
+    principal_cache = runtime.principal_cache
+    if principal_cache is not None:
+        principal = principal_cache.get(user_email)
+        if principal:
+            return principal
+
+    user = resolve_user(db_session=get_db(request), email=user_email)
+    if not user:
+        raise InvalidCredentialException
+    return Principal.from_user(user)
+
+
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+
+def get_current_role(
+    request: Request, current_principal: CurrentPrincipal
+) -> UserRoles:
     """Attempts to get the current user depending on the configured authentication provider."""
-    return current_user.role
+    return current_principal.role
@@ -0,0 +1,58 @@
+"""Verification of Authene's access tokens.
+
+`TokenVerifier` is what `BasicAuthProviderPlugin` and `authene.edge`
+share: a token is active when its signature and expiry check out and its
+`jti` is not revoked. It only needs the key ring, so it is importable
+without FastAPI, SQLAlchemy or the models.
+"""
+
+import hashlib
+from typing import Optional, Tuple
+
+from jose.exceptions import ExpiredSignatureError, JWKError, JWTError
+
+from authene.auth.revocation import RevocationList
+from authene.tokens import KeyRing
+from authene_common.cache import TTLCache
+from authene_common.enums import TokenStatus
+from authene_common.timing import timed
+
+
+class TokenVerifier(object):
+    def __init__(
+        self,
+        keyring: KeyRing,
+        token_cache: Optional[TTLCache] = None,
+        revocations: Optional[RevocationList] = None,
+    ):
+        self.keyring = keyring
+        self.token_cache = token_cache
+        self.revocations = revocations
+
+    def decode_token(self, token: str) -> dict:
+        """Verifies a token, reusing the claims of a previously verified one if cached."""
+        if self.token_cache is None:
+            with timed("jwt"):
+                return self.keyring.verify(token)
+
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        data = self.token_cache.get(key)
+        if data is None:
+            with timed("jwt"):
+                data = self.keyring.verify(token)
+            self.token_cache.set(key, data, expires_at=data.get("exp"))
+        return data
+
+    def introspect(self, token: str) -> Tuple[Optional[dict], TokenStatus]:
+        """Verifies a token without raising, returning its claims if active and its status."""
+        try:
+            data = self.decode_token(token)
+        except ExpiredSignatureError:
+            return None, TokenStatus.expired
+        except (JWKError, JWTError):
+            return None, TokenStatus.invalid
+
+        # checked after the cache, revoking a token must not wait for it to expire
+        if self.revocations is not None and data.get("jti") in self.revocations:
+            return None, TokenStatus.revoked
+        return data, TokenStatus.active
@@ -1,65 +1,177 @@
-from fastapi import APIRouter, HTTPException, status
-from pydantic import ValidationError
+from datetime import datetime
+from typing import Annotated, List, Optional, Type
 
-from authene.auth.service import CurrentUser, create, get, get_all, get_by_email, update
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.requests import Request
+
+from authene.auth.async_service import (
+    CurrentPrincipal,
+    bulk_create_users,
+    bulk_update_users,
+    count,
+    create,
+    create_api_key,
+    delete_api_key,
+    export_rows,
+    get,
+    get_api_keys,
+    get_by_email,
+    get_page,
+    get_principals,
+    issue_refresh_token,
+    require_scope,
+    revoke_access_token,
+    revoke_refresh_token,
+    rotate_refresh_token,
+    update,
+    update_password_hash,
+)
+from authene.auth.export import MEDIA_TYPES, stream_export
+from authene.auth.service import (
+    InvalidCredentialException,
+    page_key,
+    page_key_types,
+    throttle_login,
+)
 from authene.exceptions import (
     InvalidConfigurationError,
     InvalidPasswordError,
     InvalidUsernameError,
 )
+from authene.hashing import hasher, needs_rehash
 from authene.models import (
+    ApiKeyCreate,
+    ApiKeyCreateResponse,
+    ApiKeyRead,
+    TokenIntrospect,
+    TokenIntrospectResponse,
+    TokenRefresh,
+    UserBulk,
+    UserBulkResponse,
     UserCreate,
+    UserFilter,
     UserLogin,
     UserLoginResponse,
+    UserLogout,
     UserPagination,
     UserRead,
     UserRegister,
     UserRegisterResponse,
     UserUpdate,
 )
-from authene_common.config import AUTHENE_AUTH_REGISTRATION_ENABLED
+from authene.runtime import current
+from authene_common.config import (
+    AUTHENE_AUTH_REGISTRATION_ENABLED,
+    AUTHENE_BULK_CHUNK_SIZE,
+    AUTHENE_EXPORT_BATCH_SIZE,
+    AUTHENE_FAST_SERIALIZATION,
+    AUTHENE_JWKS_MAX_AGE,
+    AUTHENE_USERS_PAGE_MAX,
+    AUTHENE_USERS_PAGE_SIZE,
+)
 from authene_common.database import DbSession
+from authene_common.enums import ApiKeyScope, ExportFormat, UserSort
 from authene_common.models import PrimaryKey
+from authene_common.pagination import InvalidCursorError, encode_cursor, resolve_page
+from authene_common.serialization import json_response
 
 auth_router = APIRouter()
 user_router = APIRouter()
+well_known_router = APIRouter()
+
+
+def respond(model: Type[BaseModel], content):
+    """Serialises `content` as `model` straight to JSON bytes when
+    AUTHENE_FAST_SERIALIZATION is enabled, otherwise hands it to FastAPI to
+    validate against the route's response_model."""
+    if AUTHENE_FAST_SERIALIZATION:
+        return json_response(model, content)
+    return content
 
 
 @user_router.get(
     "",
     response_model=UserPagination,
+    dependencies=[require_scope(ApiKeyScope.users_read)],
 )
-def get_users(db_session: DbSession):
-    """Gets all organization users."""
+async def get_users(
+    db_session: DbSession,
+    limit: Annotated[
+        int, Query(ge=1, le=AUTHENE_USERS_PAGE_MAX)
+    ] = AUTHENE_USERS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    sort: UserSort = UserSort.id,
+    total: bool = True,
+    role: Annotated[List[str], Query()] = [],
+    email_prefix: Annotated[Optional[str], Query(min_length=1)] = None,
+    created_since: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    updated_since: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+):
+    """Gets a page of organization users, ordered by `sort`.
 
-    items = get_all(db_session=db_session)
+    Only users with one of the given roles, an email starting with
+    `email_prefix` (case sensitive) and timestamps within the given ranges
+    are listed, the cursor of the next page expects the same filters.
+    """
+    filters = UserFilter(
+        role=role,
+        email_prefix=email_prefix,
+        created_since=created_since,
+        created_before=created_before,
+        updated_since=updated_since,
+        updated_before=updated_before,
+    )
+    try:
+        page, after = resolve_page(cursor, page_key_types(sort))
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[{"msg": "Invalid cursor."}],
+        ) from None
 
-    return {
-        "items": [
-            {
-                "id": u.id,
-                "email": u.email,
-                "role": u.role,
-            }
-            for u in items
-        ],
-        "itemsPerPage": len(items),
-        "page": 1,
-        "total": 1,
-    }
+    # one extra row tells us whether there is a next page
+    items = await get_page(
+        db_session=db_session,
+        limit=limit + 1,
+        after=after,
+        sort=sort,
+        filters=filters,
+    )
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(page + 1, page_key(items[-1], sort))
+
+    return respond(
+        UserPagination,
+        {
+            "items": items,
+            "itemsPerPage": limit,
+            "page": page,
+            "total": (
+                await count(db_session=db_session, filters=filters) if total else None
+            ),
+            "next": next_cursor,
+        },
+    )
 
 
 @user_router.post(
     "",
     response_model=UserRead,
+    dependencies=[require_scope(ApiKeyScope.users_write)],
 )
-def create_user(
+async def create_user(
     user_in: UserCreate,
     db_session: DbSession,
-    current_user: CurrentUser,
+    current_principal: CurrentPrincipal,
 ):
     """Creates a new user."""
-    user = get_by_email(db_session=db_session, email=user_in.email)
+    user = await get_by_email(db_session=db_session, email=user_in.email)
     if user:
         raise ValidationError(
             [
@@ -68,69 +180,126 @@ def create_user(
             model=UserCreate,
         )
 
-    user = create(db_session=db_session, user_in=user_in)
-    return user
+    user = await create(db_session=db_session, user_in=user_in)
+    return respond(UserRead, user)
 
 
-@user_router.get("/{user_id}", response_model=UserRead)
-def get_user(db_session: DbSession, user_id: PrimaryKey):
+@user_router.post(
+    "/bulk",
+    response_model=UserBulkResponse,
+    dependencies=[require_scope(ApiKeyScope.users_write)],
+)
+async def bulk_users(
+    bulk_in: UserBulk,
+    db_session: DbSession,
+    current_principal: CurrentPrincipal,
+):
+    """Creates and updates many users at once, reporting a result per item."""
+    return {
+        "create": await bulk_create_users(
+            db_session=db_session,
+            users_in=bulk_in.create,
+            chunk_size=AUTHENE_BULK_CHUNK_SIZE,
+        ),
+        "update": await bulk_update_users(
+            db_session=db_session,
+            users_in=bulk_in.update,
+            chunk_size=AUTHENE_BULK_CHUNK_SIZE,
+        ),
+    }
+
+
+@user_router.get(
+    "/export",
+    response_class=StreamingResponse,
+    dependencies=[require_scope(ApiKeyScope.users_read)],
+)
+async def export_users(
+    format: ExportFormat = ExportFormat.ndjson,
+    since: Optional[datetime] = None,
+):
+    """Streams all users as NDJSON or CSV, optionally only those updated since `since`."""
+    partitions = export_rows(since=since, batch_size=AUTHENE_EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        stream_export(partitions, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format.value}"'},
+    )
+
+
+@user_router.get(
+    "/{user_id}",
+    response_model=UserRead,
+    dependencies=[require_scope(ApiKeyScope.users_read)],
+)
+async def get_user(db_session: DbSession, user_id: PrimaryKey):
     """Get a user."""
-    user = get(db_session=db_session, user_id=user_id)
+    user = await get(db_session=db_session, user_id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=[{"msg": "A user with this id does not exist."}],
         )
 
-    return user
+    return respond(UserRead, user)
 
 
 @user_router.put(
     "/{user_id}",
     response_model=UserRead,
+    dependencies=[require_scope(ApiKeyScope.users_write)],
 )
-def update_user(
+async def update_user(
     db_session: DbSession,
     user_id: PrimaryKey,
     user_in: UserUpdate,
-    current_user: CurrentUser,
+    current_principal: CurrentPrincipal,
 ):
     """Update a user."""
-    user = get(db_session=db_session, user_id=user_id)
+    user = await get(db_session=db_session, user_id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=[{"msg": "A user with this id does not exist."}],
         )
-    return update(db_session=db_session, user=user, user_in=user_in)
+    user = await update(db_session=db_session, user=user, user_in=user_in)
+    return respond(UserRead, user)
 
 
 @auth_router.get("/me", response_model=UserRead)
-def get_me(
+async def get_me(
     *,
     db_session: DbSession,
-    current_user: CurrentUser,
+    current_principal: CurrentPrincipal,
 ):
-    return current_user
+    return respond(UserRead, current_principal)
 
 
 @auth_router.post("/login", response_model=UserLoginResponse)
-def login_user(
+async def login_user(
+    request: Request,
     user_in: UserLogin,
     db_session: DbSession,
 ):
-    user = get_by_email(db_session=db_session, email=user_in.email)
-    if user and user.check_password(user_in.password):
-        projects = []
-        for user_project in user.projects:
-            projects.append(
-                {
-                    "project": user_project.project,
-                    "default": user_project.default,
-                    "role": user_project.role,
-                }
+    # before any database or bcrypt work
+    throttle_login(request, user_in.email)
+
+    user = await get_by_email(db_session=db_session, email=user_in.email)
+    if user and await hasher.check(user_in.password, user.password):
+        # the plaintext is only ever at hand here, so hashes made with an older
+        # scheme or cost are upgraded as their users log in
+        if needs_rehash(user.password):
+            await update_password_hash(
+                db_session=db_session,
+                user=user,
+                hashed_password=await hasher.hash(user_in.password),
             )
-        return {"projects": projects, "token": user.token}
+        return {
+            "token": user.token,
+            "refresh_token": await issue_refresh_token(
+                db_session=db_session, user=user
+            ),
+        }
 
     raise ValidationError(
         [
@@ -141,21 +310,150 @@ def login_user(
     )
 
 
-def register_user(
+async def register_user(
     user_in: UserRegister,
     db_session: DbSession,
 ):
-    user = get_by_email(db_session=db_session, email=user_in.email)
+    user = await get_by_email(db_session=db_session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400, detail=f"User with email '{user_in.email}' already exists."
         )
 
-    user = create(db_session=db_session, user_in=user_in)
-    return user
+    user = await create(db_session=db_session, user_in=user_in)
+    return {
+        "token": user.token,
+        "refresh_token": await issue_refresh_token(db_session=db_session, user=user),
+    }
+
+
+@auth_router.post("/refresh", response_model=UserLoginResponse)
+async def refresh_token(token_in: TokenRefresh, db_session: DbSession):
+    """Exchanges a refresh token for a new access token and refresh token."""
+    rotated = await rotate_refresh_token(
+        db_session=db_session, token=token_in.refresh_token
+    )
+    if not rotated:
+        raise InvalidCredentialException
+
+    user, new_refresh_token = rotated
+    return {"token": user.token, "refresh_token": new_refresh_token}
+
+
+@auth_router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_user(request: Request, logout_in: UserLogout, db_session: DbSession):
+    """Revokes the access token used for the request and the given refresh token."""
+    claims = current().auth_provider.get_current_claims(request)
+    if not claims:
+        raise InvalidCredentialException
+
+    await revoke_access_token(db_session=db_session, claims=claims)
+    if logout_in.refresh_token:
+        await revoke_refresh_token(db_session=db_session, token=logout_in.refresh_token)
+
+
+@auth_router.post(
+    "/introspect",
+    response_model=TokenIntrospectResponse,
+    dependencies=[require_scope(ApiKeyScope.tokens_introspect)],
+)
+async def introspect_tokens(
+    introspect_in: TokenIntrospect,
+    db_session: DbSession,
+    current_principal: CurrentPrincipal,
+):
+    """Verifies a batch of tokens for a gateway, returning each one's status, claims and user.
+
+    Results are in the order of the tokens. Each distinct token is verified
+    once and the users of the active ones are resolved with a single query.
+    """
+    auth_provider = current().auth_provider
+    verified = {
+        token: auth_provider.introspect(token) for token in introspect_in.tokens
+    }
+    principals = await get_principals(
+        db_session=db_session,
+        emails=[
+            claims["email"]
+            for claims, _ in verified.values()
+            if claims is not None and claims.get("email")
+        ],
+    )
+
+    results = []
+    for token in introspect_in.tokens:
+        claims, token_status = verified[token]
+        results.append(
+            {
+                "active": claims is not None,
+                "status": token_status,
+                "claims": claims,
+                "user": principals.get(claims.get("email")) if claims else None,
+            }
+        )
+    return respond(TokenIntrospectResponse, {"results": results})
+
+
+@auth_router.post("/api-keys", response_model=ApiKeyCreateResponse)
+async def create_user_api_key(
+    request: Request,
+    api_key_in: ApiKeyCreate,
+    db_session: DbSession,
+    current_principal: CurrentPrincipal,
+):
+    """Creates an API key acting as the current user, the key is only shown once."""
+    if getattr(request.state, "api_key", None) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=[{"msg": "API keys can't create API keys."}],
+        )
+
+    key, row = await create_api_key(
+        db_session=db_session, user_id=current_principal.id, api_key_in=api_key_in
+    )
+    return {**row.dict(), "key": key}
+
+
+@auth_router.get("/api-keys", response_model=List[ApiKeyRead])
+async def get_user_api_keys(db_session: DbSession, current_principal: CurrentPrincipal):
+    """Lists the current user's API keys, by prefix."""
+    return await get_api_keys(db_session=db_session, user_id=current_principal.id)
+
+
+@auth_router.delete("/api-keys/{api_key_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_user_api_key(
+    api_key_id: PrimaryKey,
+    db_session: DbSession,
+    current_principal: CurrentPrincipal,
+):
+    """Revokes one of the current user's API keys."""
+    deleted = await delete_api_key(
+        db_session=db_session, user_id=current_principal.id, api_key_id=api_key_id
+    )
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=[{"msg": "API key not found."}],
+        )
 
 
 if AUTHENE_AUTH_REGISTRATION_ENABLED:
     register_user = auth_router.post("/register", response_model=UserRegisterResponse)(
         register_user
     )
+
+
+@well_known_router.get("/jwks.json", include_in_schema=False)
+async def get_jwks(request: Request):
+    """Publishes the public keys tokens are verified with."""
+    keyring = current().keyring
+    headers = {
+        "Cache-Control": f"public, max-age={AUTHENE_JWKS_MAX_AGE}",
+        "ETag": keyring.jwks_etag,
+    }
+    if request.headers.get("If-None-Match") == keyring.jwks_etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(
+        content=keyring.jwks_json, media_type="application/json", headers=headers
+    )
@@ -0,0 +1,218 @@
+"""JWT encoders/decoders with their keys prepared once, at startup.
+
+Every codec only accepts tokens signed with the configured algorithm and
+raises `jose` exceptions, whichever library does the work.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Dict, Optional
+
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+
+def b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class JWTCodec(object):
+    """Signs claims with the signing key and verifies tokens signed by any key.
+
+    `keys` maps key ids to PEM encoded keys for asymmetric algorithms, HMAC
+    algorithms use `secret` and no key id.
+    """
+
+    name: str
+
+    def __init__(
+        self,
+        algorithm: str,
+        secret: Optional[str] = None,
+        keys: Optional[Dict[str, str]] = None,
+        signing_kid: Optional[str] = None,
+    ):
+        self.algorithm = algorithm
+        self.secret = secret
+        self.keys = keys or {}
+        self.signing_kid = signing_kid
+
+    def encode(self, claims: dict) -> str:
+        raise NotImplementedError
+
+    def decode(self, token: str) -> dict:
+        raise NotImplementedError
+
+
+class JoseCodec(JWTCodec):
+    """python-jose with pre-constructed key objects."""
+
+    name = "jose"
+
+    def __init__(self, algorithm: str, **kwargs):
+        super().__init__(algorithm, **kwargs)
+        # jose's key backends are slow to import, the other codecs don't need them
+        from jose import jwk, jwt
+
+        self.jwt = jwt
+        self.headers = {"kid": self.signing_kid} if self.signing_kid else None
+
+        if self.keys:
+            self.signing_key = (
+                jwk.construct(self.keys[self.signing_kid], algorithm)
+                if self.signing_kid
+                else None
+            )
+            self.verify_keys = {
+                kid: jwk.construct(pem, algorithm).public_key()
+                for kid, pem in self.keys.items()
+            }
+        else:
+            self.signing_key = jwk.construct(self.secret, algorithm)
+            self.verify_keys = {None: self.signing_key}
+
+    def encode(self, claims: dict) -> str:
+        return self.jwt.encode(
+            claims, self.signing_key, algorithm=self.algorithm, headers=self.headers
+        )
+
+    def decode(self, token: str) -> dict:
+        kid = self.jwt.get_unverified_header(token).get("kid") if self.keys else None
+        key = self.verify_keys.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown key id '{kid}'.")
+        return self.jwt.decode(token, key, algorithms=[self.algorithm])
+
+
+class NativeHMACCodec(JWTCodec):
+    """A stdlib-only HS256/384/512 codec.
+
+    The encoded header segment and the keyed HMAC state are computed once;
+    each call only serialises the claims and copies the HMAC state.
+    """
+
+    name = "native"
+
+    def __init__(self, algorithm: str, **kwargs):
+        super().__init__(algorithm, **kwargs)
+        if algorithm not in HMAC_DIGESTS:
+            raise ValueError(f"The native codec does not support {algorithm}.")
+
+        header = json.dumps(
+            {"alg": algorithm, "typ": "JWT"}, separators=(",", ":"), sort_keys=True
+        )
+        self.header_segment = b64encode(header.encode("utf-8"))
+        self.mac = hmac.new(
+            self.secret.encode("utf-8"), digestmod=HMAC_DIGESTS[algorithm]
+        )
+
+    def sign(self, signing_input: bytes) -> bytes:
+        mac = self.mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: dict) -> str:
+        payload = json.dumps(claims, separators=(",", ":")).encode("utf-8")
+        signing_input = self.header_segment + b"." + b64encode(payload)
+        return (signing_input + b"." + b64encode(self.sign(signing_input))).decode(
+            "ascii"
+        )
+
+    def decode(self, token: str) -> dict:
+        try:
+            signing_input, _, signature = token.rpartition(".")
+            header_segment, _, payload_segment = signing_input.partition(".")
+
+            # tokens we issued carry exactly our header, skip parsing it
+            if header_segment.encode("ascii") != self.header_segment:
+                header = json.loads(b64decode(header_segment))
+                if header.get("alg") != self.algorithm:
+                    raise JWTError("The specified alg value is not allowed")
+
+            expected = self.sign(signing_input.encode("ascii"))
+            if not hmac.compare_digest(expected, b64decode(signature)):
+                raise JWTError("Signature verification failed.")
+
+            claims = json.loads(b64decode(payload_segment))
+        except (ValueError, TypeError, UnicodeError) as e:
+            raise JWTError("Error decoding token.") from e
+
+        if not isinstance(claims, dict):
+            raise JWTError("Invalid payload string: must be a json object")
+
+        now = time.time()
+        if "exp" in claims:
+            if not isinstance(claims["exp"], (int, float)):
+                raise JWTClaimsError("Expiration Time claim (exp) must be a number.")
+            if claims["exp"] < now:
+                raise ExpiredSignatureError("Signature has expired.")
+        if "nbf" in claims:
+            if not isinstance(claims["nbf"], (int, float)):
+                raise JWTClaimsError("Not Before claim (nbf) must be a number.")
+            if claims["nbf"] > now:
+                raise JWTClaimsError("The token is not yet valid (nbf)")
+        return claims
+
+
+class PyJWTCodec(JWTCodec):
+    """PyJWT with pre-parsed key objects, requires `pyjwt[crypto]` for RS/ES."""
+
+    name = "pyjwt"
+
+    def __init__(self, algorithm: str, **kwargs):
+        super().__init__(algorithm, **kwargs)
+        try:
+            import jwt as pyjwt
+        except ImportError:
+            raise ValueError("The pyjwt codec requires the PyJWT package.") from None
+
+        self.pyjwt = pyjwt
+        self.headers = {"kid": self.signing_kid} if self.signing_kid else None
+        prepare_key = pyjwt.get_algorithm_by_name(algorithm).prepare_key
+
+        if self.keys:
+            self.signing_key = (
+                prepare_key(self.keys[self.signing_kid]) if self.signing_kid else None
+            )
+            self.verify_keys = {}
+            for kid, pem in self.keys.items():
+                key = prepare_key(pem)
+                self.verify_keys[kid] = (
+                    key.public_key() if hasattr(key, "public_key") else key
+                )
+        else:
+            self.signing_key = prepare_key(self.secret)
+            self.verify_keys = {None: self.signing_key}
+
+    def encode(self, claims: dict) -> str:
+        return self.pyjwt.encode(
+            claims, self.signing_key, algorithm=self.algorithm, headers=self.headers
+        )
+
+    def decode(self, token: str) -> dict:
+        pyjwt = self.pyjwt
+        try:
+            kid = pyjwt.get_unverified_header(token).get("kid") if self.keys else None
+            key = self.verify_keys.get(kid)
+            if key is None:
+                raise JWTError(f"Unknown key id '{kid}'.")
+            return pyjwt.decode(token, key, algorithms=[self.algorithm])
+        except pyjwt.ExpiredSignatureError as e:
+            raise ExpiredSignatureError(str(e)) from None
+        except pyjwt.InvalidTokenError as e:
+            raise JWTError(str(e)) from None
+
+
+CODECS = {codec.name: codec for codec in (JoseCodec, NativeHMACCodec, PyJWTCodec)}
@@ -0,0 +1,242 @@
+"""A verify-only app for sidecars and edge proxies, `uvicorn authene.edge:app`.
+
+It verifies access tokens exactly like the API does, with the same keys,
+codec, token cache and revocation list (see `authene.auth.verifier`), and
+serves nothing else. FastAPI, pydantic, the models and the password hashers
+are never imported, SQLAlchemy only to refresh the revocation list:
+
+    GET /verify                  the bearer token's status, claims and user
+    GET /.well-known/jwks.json   the public keys, as the API publishes them
+
+/verify answers 200 for an active token and 401 otherwise, so a proxy can
+call it for each request (e.g. nginx's auth_request). The revocation list
+is reloaded from the database every AUTHENE_REVOCATION_REFRESH_INTERVAL
+unless AUTHENE_EDGE_REVOCATIONS is off, revoked tokens then verify until
+they expire. Users are read from AUTHENE_EDGE_PRINCIPALS_FILE, a snapshot
+of every user's id, email and role written from the database with
+
+    python -m authene.edge principals.json
+
+and reloaded whenever it changes. Without a snapshot `user` is null.
+
+`benchmarks/edge.py` compares its start up time and memory with the API's.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from authene.auth.revocation import RevocationList
+from authene.auth.verifier import TokenVerifier
+from authene.tokens import KeyRing
+from authene_common.cache import TTLCache
+from authene_common.config import (
+    AUTHENE_EDGE_PRINCIPALS_FILE,
+    AUTHENE_EDGE_REVOCATIONS,
+    AUTHENE_JWKS_MAX_AGE,
+    AUTHENE_JWT_ALG,
+    AUTHENE_JWT_CACHE_SIZE,
+    AUTHENE_JWT_CACHE_TTL,
+    AUTHENE_JWT_CODEC,
+    AUTHENE_JWT_KEYS_DIR,
+    AUTHENE_JWT_SECRET,
+    AUTHENE_JWT_SIGNING_KID,
+    AUTHENE_REVOCATION_ERROR_RATE,
+    AUTHENE_REVOCATION_REFRESH_INTERVAL,
+    SQLALCHEMY_DATABASE_URI,
+)
+from authene_common.enums import TokenStatus
+
+logger = logging.getLogger(__name__)
+
+
+class PrincipalSnapshot(object):
+    """The principals of a snapshot file, keyed by email, reloaded when the file changes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = None
+        self.principals: Dict[str, dict] = {}
+
+    def get(self, email: Optional[str]) -> Optional[dict]:
+        return self.principals.get(email)
+
+    def reload(self) -> bool:
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self.mtime:
+            return False
+
+        with open(self.path) as snapshot:
+            principals = json.load(snapshot)["principals"]
+        self.principals = {principal["email"]: principal for principal in principals}
+        self.mtime = mtime
+        return True
+
+
+def write_snapshot(path: str):
+    """Writes every user's principal to `path`, replacing the file at once."""
+    from sqlalchemy import select
+
+    from authene.models import AutheneUser
+    from authene_common.database import default_database
+
+    engine = default_database().engine
+    query = select(AutheneUser.id, AutheneUser.email, AutheneUser.role).order_by(
+        AutheneUser.id
+    )
+    with engine.connect() as connection:
+        principals = [
+            {"id": row.id, "email": row.email, "role": row.role}
+            for row in connection.execute(query)
+        ]
+
+    # the edge may read the file at any time, it must never see half of it
+    partial = f"{path}.partial"
+    with open(partial, "w") as snapshot:
+        json.dump({"principals": principals}, snapshot, separators=(",", ":"))
+    os.replace(partial, path)
+
+
+# the same keys as the API's, read from the same settings on first use
+keyring = KeyRing(
+    algorithm=AUTHENE_JWT_ALG,
+    secret=AUTHENE_JWT_SECRET,
+    keys_dir=AUTHENE_JWT_KEYS_DIR,
+    signing_kid=AUTHENE_JWT_SIGNING_KID,
+    codec=AUTHENE_JWT_CODEC,
+)
+
+revocations = (
+    RevocationList(error_rate=AUTHENE_REVOCATION_ERROR_RATE)
+    if AUTHENE_EDGE_REVOCATIONS
+    else None
+)
+
+verifier = TokenVerifier(
+    keyring=keyring,
+    token_cache=(
+        TTLCache(maxsize=AUTHENE_JWT_CACHE_SIZE, ttl=AUTHENE_JWT_CACHE_TTL)
+        if AUTHENE_JWT_CACHE_SIZE > 0
+        else None
+    ),
+    revocations=revocations,
+)
+
+snapshot = (
+    PrincipalSnapshot(AUTHENE_EDGE_PRINCIPALS_FILE)
+    if AUTHENE_EDGE_PRINCIPALS_FILE
+    else None
+)
+
+
+def refresh(engine):
+    if revocations is not None:
+        with engine.connect() as connection:
+            revocations.refresh(connection)
+    if snapshot is not None and snapshot.reload():
+        logger.info(f"Loaded {len(snapshot.principals)} principals.")
+
+
+async def watch(interval: float):
+    """Keeps the revocation list and the principal snapshot up to date until cancelled."""
+    engine = None
+    if revocations is not None:
+        from sqlalchemy import create_engine
+
+        engine = create_engine(SQLALCHEMY_DATABASE_URI)
+
+    try:
+        while True:
+            try:
+                await run_in_threadpool(refresh, engine)
+            except Exception:
+                logger.exception(
+                    "Unable to refresh the edge's revocations or principals."
+                )
+            await asyncio.sleep(interval)
+    finally:
+        if engine is not None:
+            engine.dispose()
+
+
+async def verify(request: Request) -> Response:
+    """The status, claims and user of the request's bearer token, 401 unless active."""
+    scheme, _, token = (request.headers.get("Authorization") or "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        claims, status = verifier.introspect(token)
+    else:
+        claims, status = None, TokenStatus.invalid
+
+    user = None
+    if claims is not None and snapshot is not None:
+        user = snapshot.get(claims.get("email"))
+    return JSONResponse(
+        {
+            "active": claims is not None,
+            "status": status.value,
+            "claims": claims,
+            "user": user,
+        },
+        status_code=200 if claims is not None else 401,
+    )
+
+
+async def get_jwks(request: Request) -> Response:
+    """Publishes the public keys tokens are verified with."""
+    headers = {
+        "Cache-Control": f"public, max-age={AUTHENE_JWKS_MAX_AGE}",
+        "ETag": keyring.jwks_etag,
+    }
+    if request.headers.get("If-None-Match") == keyring.jwks_etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(
+        content=keyring.jwks_json, media_type="application/json", headers=headers
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    # fails the start up, rather than the first request, on a missing setting
+    keyring.load()
+    task = None
+    if revocations is not None or snapshot is not None:
+        task = asyncio.create_task(watch(AUTHENE_REVOCATION_REFRESH_INTERVAL))
+    yield
+    if task is not None:
+        task.cancel()
+
+
+app = Starlette(
+    routes=[
+        Route("/verify", verify),
+        Route("/.well-known/jwks.json", get_jwks),
+    ],
+    lifespan=lifespan,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Writes the principal snapshot authene.edge reads users from."
+    )
+    parser.add_argument(
+        "path", help="e.g. the AUTHENE_EDGE_PRINCIPALS_FILE of the edge"
+    )
+    args = parser.parse_args()
+
+    write_snapshot(args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Builds the Authene application.
+
+`authene.main:app` is built with the defaults as soon as it is imported.
+Importing this module costs next to nothing: FastAPI and the models are only
+imported when `create_app` runs, so a server that forks workers can build
+the app in each worker once it has started:
+
+    uvicorn --factory authene.factory:create_app
+
+The database engines, the JWT keys and the caches are created when the
+app's lifespan starts, from its `AppSettings` (see `authene.runtime`), so
+apps built with different settings can be served by the same process.
+
+`benchmarks/import_time.py` tracks what importing and building costs.
+"""
+
+from typing import TYPE_CHECKING, NamedTuple, Optional, Sequence
+
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+
+
+class AppSettings(NamedTuple):
+    # mount the frontend and its static files at /, API-only workers skip it
+    frontend: bool = True
+    # where the frontend's files are, defaults to STATIC_DIR
+    static_dir: Optional[str] = None
+
+    # the rest default to the setting of the same name, see `resolved`
+    database_url: Optional[str] = None
+    replica_urls: Optional[Sequence[str]] = None
+    db_async: Optional[bool] = None
+    async_database_url: Optional[str] = None
+
+    jwt_alg: Optional[str] = None
+    jwt_secret: Optional[str] = None
+    jwt_keys_dir: Optional[str] = None
+    jwt_signing_kid: Optional[str] = None
+    jwt_codec: Optional[str] = None
+
+    cache_url: Optional[str] = None
+    cache_invalidation_url: Optional[str] = None
+
+    def resolved(self) -> "AppSettings":
+        """These settings, with the ones left unset read from the environment."""
+        from authene_common import config
+
+        defaults = {
+            "static_dir": config.STATIC_DIR,
+            "database_url": config.SQLALCHEMY_DATABASE_URI,
+            "replica_urls": list(config.SQLALCHEMY_REPLICA_URIS),
+            "db_async": config.AUTHENE_DB_ASYNC,
+            "async_database_url": config.SQLALCHEMY_ASYNC_DATABASE_URI,
+            "jwt_alg": config.AUTHENE_JWT_ALG,
+            "jwt_secret": config.AUTHENE_JWT_SECRET,
+            "jwt_keys_dir": config.AUTHENE_JWT_KEYS_DIR,
+            "jwt_signing_kid": config.AUTHENE_JWT_SIGNING_KID,
+            "jwt_codec": config.AUTHENE_JWT_CODEC,
+            "cache_url": config.AUTHENE_CACHE_URL,
+            "cache_invalidation_url": config.AUTHENE_CACHE_INVALIDATION_URL,
+        }
+        return self._replace(
+            **{
+                name: default
+                for name, default in defaults.items()
+                if getattr(self, name) is None
+            }
+        )
+
+
+def create_app(settings: Optional[AppSettings] = None) -> "FastAPI":
+    """Builds the app: the API under /api/v1, the well-known routes and the frontend.
+
+    Its databases, keys and caches are only created once its lifespan starts.
+    Without `settings` it uses the default runtime, the one scripts get from
+    `authene.runtime.current`, otherwise one of its own.
+    """
+    from contextlib import asynccontextmanager
+    from os import path
+
+    from fastapi import FastAPI, status
+    from fastapi.responses import JSONResponse
+
+    from authene.api import api_router
+    from authene.auth.views import well_known_router
+    from authene.hashing import hasher
+    from authene.middleware import (
+        DBSessionMiddleware,
+        RuntimeMiddleware,
+        SecurityHeadersMiddleware,
+        SPAFallbackMiddleware,
+    )
+    from authene.runtime import Runtime, default
+    from authene_common import config, timing
+
+    own_runtime = settings is not None
+    settings = (settings or AppSettings()).resolved()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        runtime = Runtime(settings) if own_runtime else default()
+        with runtime.activated():
+            await runtime.start()
+            try:
+                yield {"runtime": runtime}
+            finally:
+                await runtime.stop()
+                hasher.shutdown()
+
+    async def not_found(request, exc):
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"detail": [{"msg": "Not Found."}]},
+        )
+
+    exception_handlers = {404: not_found}
+
+    app = FastAPI(
+        exception_handlers=exception_handlers, openapi_url="", lifespan=lifespan
+    )
+
+    api = FastAPI(
+        title="Authene",
+        description="Welcome to Authene's API documentation! Here you will able to discover all of the ways you can interact with the Authene API.",
+        root_path="/api/v1",
+        docs_url=None,
+        openapi_url="/docs/openapi.json",
+        redoc_url="/docs",
+    )
+
+    api.add_middleware(DBSessionMiddleware)
+
+    app.add_middleware(SecurityHeadersMiddleware)
+    app.add_middleware(RuntimeMiddleware)
+
+    api.include_router(api_router)
+
+    app.include_router(well_known_router, prefix="/.well-known")
+
+    if config.AUTHENE_METRICS:
+        timing.collectors["hasher"] = hasher.metrics
+        app.add_route("/metrics", timing.metrics_endpoint, include_in_schema=False)
+
+    app.mount("/api/v1", app=api)
+    app.state.api = api
+
+    # we mount the frontend and app
+    if settings.frontend:
+        frontend = FastAPI(openapi_url="")
+        frontend.add_middleware(SPAFallbackMiddleware, static_dir=settings.static_dir)
+
+        if settings.static_dir and path.isdir(settings.static_dir):
+            from fastapi.staticfiles import StaticFiles
+
+            frontend.mount("/", StaticFiles(directory=settings.static_dir), name="app")
+
+        app.mount("/", app=frontend)
+
+    return app
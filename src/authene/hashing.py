@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
+from typing import List, Optional, Tuple
+
+import bcrypt
+
+from authene_common import timing
+from authene_common.config import (
+    AUTHENE_BCRYPT_ROUNDS,
+    AUTHENE_HASHING_POOL,
+    AUTHENE_HASHING_WORKERS,
+    AUTHENE_PASSWORD_SCHEME,
+    AUTHENE_SCRYPT_LN,
+    AUTHENE_SCRYPT_P,
+    AUTHENE_SCRYPT_R,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BcryptScheme(object):
+    """bcrypt with a fixed work factor, each extra round doubles its cost."""
+
+    name = "bcrypt"
+    prefixes = (b"$2a$", b"$2b$", b"$2y$")
+
+    def __init__(self, rounds: int = 12):
+        self.rounds = rounds
+
+    def hash(self, password: str) -> bytes:
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(self.rounds))
+
+    def check(self, password: str, hashed: bytes) -> bool:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed)
+
+    def identify(self, hashed: bytes) -> bool:
+        return hashed.startswith(self.prefixes)
+
+    def needs_rehash(self, hashed: bytes) -> bool:
+        # $2b$12$<salt and hash>
+        return int(hashed[4:6]) != self.rounds
+
+
+class ScryptScheme(object):
+    """scrypt from the standard library, with tunable memory and parallelism.
+
+    Hashes are stored as `$scrypt$ln=15,r=8,p=1$<salt>$<key>`, with the
+    base64 encoded salt and key.
+    """
+
+    name = "scrypt"
+    prefix = b"$scrypt$"
+
+    def __init__(self, ln: int = 15, r: int = 8, p: int = 1):
+        self.ln = ln
+        self.r = r
+        self.p = p
+
+    @staticmethod
+    def derive(password: str, salt: bytes, ln: int, r: int, p: int) -> bytes:
+        # the key needs 128 * n * r bytes, leave room for it over OpenSSL's default
+        return hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=salt,
+            n=2**ln,
+            r=r,
+            p=p,
+            maxmem=256 * 2**ln * r,
+            dklen=32,
+        )
+
+    def hash(self, password: str) -> bytes:
+        salt = os.urandom(16)
+        key = self.derive(password, salt, self.ln, self.r, self.p)
+        return b"%s%s$%s$%s" % (
+            self.prefix,
+            f"ln={self.ln},r={self.r},p={self.p}".encode("ascii"),
+            base64.b64encode(salt),
+            base64.b64encode(key),
+        )
+
+    def parse(self, hashed: bytes) -> Tuple[dict, bytes, bytes]:
+        params, salt, key = hashed[len(self.prefix) :].split(b"$")
+        params = dict(item.split(b"=") for item in params.split(b","))
+        params = {k.decode("ascii"): int(v) for k, v in params.items()}
+        return params, base64.b64decode(salt), base64.b64decode(key)
+
+    def check(self, password: str, hashed: bytes) -> bool:
+        params, salt, key = self.parse(hashed)
+        return hmac.compare_digest(self.derive(password, salt, **params), key)
+
+    def identify(self, hashed: bytes) -> bool:
+        return hashed.startswith(self.prefix)
+
+    def needs_rehash(self, hashed: bytes) -> bool:
+        params, _, _ = self.parse(hashed)
+        return params != {"ln": self.ln, "r": self.r, "p": self.p}
+
+
+schemes = {
+    "bcrypt": BcryptScheme(rounds=AUTHENE_BCRYPT_ROUNDS),
+    "scrypt": ScryptScheme(
+        ln=AUTHENE_SCRYPT_LN, r=AUTHENE_SCRYPT_R, p=AUTHENE_SCRYPT_P
+    ),
+}
+
+if AUTHENE_PASSWORD_SCHEME not in schemes:
+    raise ValueError(f"Unknown password scheme '{AUTHENE_PASSWORD_SCHEME}'.")
+
+scheme = schemes[AUTHENE_PASSWORD_SCHEME]
+
+
+def identify(hashed: bytes):
+    return next((s for s in schemes.values() if s.identify(hashed)), None)
+
+
+def hashpw(password: str) -> bytes:
+    """Hashes a password with a freshly generated salt, using the configured scheme."""
+    return scheme.hash(password)
+
+
+def checkpw(password: str, hashed: bytes) -> bool:
+    """Checks a password against a stored hash of any supported scheme."""
+    hashed_with = identify(hashed)
+    if hashed_with is None:
+        return False
+    return hashed_with.check(password, hashed)
+
+
+def needs_rehash(hashed: bytes) -> bool:
+    """Whether a hash was made with another scheme or cost than the configured ones."""
+    return not scheme.identify(hashed) or scheme.needs_rehash(hashed)
+
+
+class PasswordHasher(object):
+    """Runs bcrypt on a dedicated pool so it never blocks the event loop or
+    FastAPI's shared threadpool.
+
+    bcrypt releases the GIL while hashing, so a thread pool scales across
+    cores; a process pool can be selected for full isolation.
+    """
+
+    def __init__(self, pool: str = "thread", workers: Optional[int] = None):
+        if pool not in ("thread", "process"):
+            raise ValueError(f"Unknown hashing pool '{pool}'.")
+
+        if workers is None:
+            # the executors' own defaults
+            cpus = os.cpu_count() or 1
+            workers = cpus if pool == "process" else min(32, cpus + 4)
+
+        self.pool = pool
+        self.workers = workers
+
+        self.pending = 0
+        self.latency = timing.Histogram(
+            "authene_hasher_seconds",
+            "Time from submitting a hash or check to its result, queueing included.",
+            timing.DEFAULT_BUCKETS,
+            label="operation",
+        )
+
+        self._executor: Optional[Executor] = None
+        self._lock = Lock()
+
+    @property
+    def executor(self) -> Executor:
+        # created lazily so importing the app never forks worker processes
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.pool == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="hasher"
+                        )
+        return self._executor
+
+    async def _run(self, operation: str, fn, *args):
+        with self._lock:
+            self.pending += 1
+
+        start = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(self.executor.submit(fn, *args))
+        finally:
+            elapsed = time.perf_counter() - start
+            timing.add("bcrypt", elapsed)
+            with self._lock:
+                self.pending -= 1
+            self.latency.observe(operation, elapsed)
+
+    async def hash(self, password: str) -> bytes:
+        return await self._run("hash", hashpw, password)
+
+    async def check(self, password: str, hashed: bytes) -> bool:
+        return await self._run("check", checkpw, password, hashed)
+
+    def metrics(self) -> List[str]:
+        """The pool's size, load and latency as Prometheus metrics."""
+        pending = self.pending
+        in_flight = min(pending, self.workers)
+        return [
+            *timing.gauge(
+                "authene_hasher_workers", "Workers of the hashing pool.", self.workers
+            ),
+            *timing.gauge(
+                "authene_hasher_in_flight",
+                "Hashes and checks being run by a worker.",
+                in_flight,
+            ),
+            *timing.gauge(
+                "authene_hasher_queue_depth",
+                "Hashes and checks waiting for a free worker.",
+                pending - in_flight,
+            ),
+            *self.latency.render(),
+        ]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hasher = PasswordHasher(pool=AUTHENE_HASHING_POOL, workers=AUTHENE_HASHING_WORKERS)
+
+
+def measure(scheme, samples: int = 3) -> float:
+    """The fastest of `samples` hashes with `scheme`, in seconds."""
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        scheme.hash("calibration-password")
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def calibrate(candidates, target: float) -> List[Tuple[object, float]]:
+    """Times increasingly expensive schemes until one takes longer than `target`."""
+    results = []
+    for candidate in candidates:
+        elapsed = measure(candidate)
+        results.append((candidate, elapsed))
+        if elapsed > target:
+            break
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures this host and picks the password hashing cost "
+        "closest to, without exceeding, a target hash time."
+    )
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--scheme", choices=sorted(schemes), default="bcrypt")
+    parser.add_argument("--scrypt-r", type=int, default=AUTHENE_SCRYPT_R)
+    parser.add_argument("--scrypt-p", type=int, default=AUTHENE_SCRYPT_P)
+    args = parser.parse_args()
+    target = args.target_ms / 1000
+
+    if args.scheme == "bcrypt":
+        candidates = (BcryptScheme(rounds) for rounds in range(4, 32))
+        setting = lambda s: f"AUTHENE_BCRYPT_ROUNDS={s.rounds}"  # noqa: E731
+    else:
+        candidates = (
+            ScryptScheme(ln, args.scrypt_r, args.scrypt_p) for ln in range(10, 25)
+        )
+        setting = lambda s: (  # noqa: E731
+            f"AUTHENE_SCRYPT_LN={s.ln} AUTHENE_SCRYPT_R={s.r} AUTHENE_SCRYPT_P={s.p}"
+        )
+
+    results = calibrate(candidates, target)
+    for candidate, elapsed in results:
+        print(f"{setting(candidate):<60} {elapsed * 1000:8.1f}ms")
+
+    within = [candidate for candidate, elapsed in results if elapsed <= target]
+    chosen = within[-1] if within else results[0][0]
+    print(f"\nAUTHENE_PASSWORD_SCHEME={args.scheme} {setting(chosen)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Raw ASGI middleware.
+
+Unlike `@app.middleware("http")` functions, which Starlette runs through
+BaseHTTPMiddleware with an extra task and a memory stream per request,
+these wrap `send` directly, so response bodies pass through untouched.
+"""
+
+from contextvars import ContextVar
+from os import path
+from time import perf_counter
+from typing import Final, Optional
+from uuid import uuid1
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import FileResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from authene_common import config, timing
+from authene_common.database import close_db
+
+REQUEST_ID_CTX_KEY: Final[str] = "request_id"
+_request_id_ctx_var: ContextVar[Optional[str]] = ContextVar(
+    REQUEST_ID_CTX_KEY, default=None
+)
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id_ctx_var.get()
+
+
+class DBSessionMiddleware(object):
+    """Scopes a request id, the request's database session and its timing."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # we create a per-request id such that we can correlate everything done for a particular request.
+        ctx_token = _request_id_ctx_var.set(str(uuid1()))
+        timing_token = timing.start_request()
+        start = perf_counter()
+
+        # the session itself is only opened when `get_db` is first called,
+        # requests that never touch the database don't pay for one
+        scope.setdefault("state", {})["db"] = None
+
+        finished = False
+
+        async def send_wrapper(message: Message):
+            nonlocal finished
+            if timing_token is not None:
+                if message["type"] == "http.response.start":
+                    # only covers the time up to here, the body isn't sent yet
+                    server_timing = timing.server_timing(perf_counter() - start)
+                    if server_timing:
+                        headers = MutableHeaders(scope=message)
+                        headers["Server-Timing"] = server_timing
+                elif message["type"] == "http.response.body" and not message.get(
+                    "more_body", False
+                ):
+                    await send(message)
+                    # the whole response, streamed bodies included
+                    timing.add("total", perf_counter() - start)
+                    finished = True
+                    return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if timing_token is not None and not finished:
+                # the response was never completed, e.g. the app raised
+                timing.add("total", perf_counter() - start)
+            await close_db(Request(scope))
+            timing.finish_request(timing_token)
+            _request_id_ctx_var.reset(ctx_token)
+
+
+class RuntimeMiddleware(object):
+    """Makes the runtime the app's lifespan built current for each request.
+
+    Without one, e.g. when the app is called without running its lifespan,
+    requests use the default runtime.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        runtime = scope.get("state", {}).get("runtime")
+        if scope["type"] == "lifespan" or runtime is None:
+            await self.app(scope, receive, send)
+            return
+
+        with runtime.activated():
+            await self.app(scope, receive, send)
+
+
+class SecurityHeadersMiddleware(object):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["Strict-Transport-Security"] = (
+                    "max-age=31536000 ; includeSubDomains"
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class SPAFallbackMiddleware(object):
+    """Serves the frontend's index.html for any path that would be a 404,
+    so client-side routes can be loaded directly."""
+
+    def __init__(self, app: ASGIApp, static_dir: Optional[str] = None):
+        self.app = app
+        self.static_dir = static_dir or config.STATIC_DIR
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.static_dir:
+            await self.app(scope, receive, send)
+            return
+
+        not_found = False
+
+        async def send_wrapper(message: Message):
+            nonlocal not_found
+            if message["type"] == "http.response.start":
+                not_found = message["status"] == 404
+            if not not_found:
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        if not_found:
+            response = FileResponse(path.join(self.static_dir, "index.html"))
+            await response(scope, receive, send)
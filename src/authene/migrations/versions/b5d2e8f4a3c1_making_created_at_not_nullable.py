@@ -0,0 +1,41 @@
+"""Making created_at not nullable
+
+Revision ID: b5d2e8f4a3c1
+Revises: 7f3b1d9c5e26
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b5d2e8f4a3c1"
+down_revision: Union[str, None] = "7f3b1d9c5e26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("authene_user", "authene_refresh_token", "authene_api_key")
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        # rows written before the default was set get their last update
+        op.execute(
+            f"UPDATE {table} SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) "
+            "WHERE created_at IS NULL"
+        )
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                "created_at", existing_type=sa.DateTime(), nullable=False
+            )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                "created_at", existing_type=sa.DateTime(), nullable=True
+            )
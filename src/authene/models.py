@@ -1,17 +1,35 @@
 import secrets
 import string
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
-import bcrypt
-from jose import jwt
-from pydantic import EmailStr, validator
-from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
-
-from authene_common.config import AUTHENE_JWT_ALG, AUTHENE_JWT_EXP, AUTHENE_JWT_SECRET
+from pydantic import EmailStr, Field, conint, validator
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+)
+
+from authene.hashing import checkpw, hashpw
+from authene.runtime import current
+from authene_common.config import (
+    AUTHENE_BULK_MAX_ITEMS,
+    AUTHENE_INTROSPECT_MAX_TOKENS,
+    AUTHENE_JWT_EXP,
+)
 from authene_common.database import Base
-from authene_common.enums import UserRoles
-from authene_common.models import AutheneBase, Pagination, PrimaryKey, TimeStampMixin
+from authene_common.enums import ApiKeyScope, BulkStatus, TokenStatus, UserRoles
+from authene_common.models import (
+    AutheneBase,
+    CursorPagination,
+    PrimaryKey,
+    TimeStampMixin,
+)
 
 
 def generate_password():
@@ -30,12 +48,18 @@ def generate_password():
 
 def hash_password(password: str):
     """Generates a hashed version of the provided password."""
-    pw = bytes(password, "utf-8")
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(pw, salt)
+    return hashpw(password)
 
 
 class AutheneUser(Base, TimeStampMixin):
+    __table_args__ = (
+        Index("ix_authene_user_created_at_id", "created_at", "id"),
+        Index("ix_authene_user_updated_at_id", "updated_at", "id"),
+        # serve a role filter in either page order
+        Index("ix_authene_user_role_id", "role", "id"),
+        Index("ix_authene_user_role_created_at_id", "role", "created_at", "id"),
+    )
+
     id = Column(Integer, primary_key=True)
     email = Column(String, unique=True)
     password = Column(LargeBinary, nullable=False)
@@ -43,7 +67,7 @@ class AutheneUser(Base, TimeStampMixin):
     role = Column(String, nullable=True)
 
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode("utf-8"), self.password)
+        return checkpw(password, self.password)
 
     @property
     def token(self):
@@ -52,8 +76,135 @@ class AutheneUser(Base, TimeStampMixin):
         data = {
             "exp": exp,
             "email": self.email,
+            "jti": uuid.uuid4().hex,
         }
-        return jwt.encode(data, AUTHENE_JWT_SECRET, algorithm=AUTHENE_JWT_ALG)
+        return current().keyring.sign(data)
+
+
+class AutheneRefreshToken(Base, TimeStampMixin):
+    """A refresh token, of which only the sha256 digest is stored."""
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("authene_user.id", ondelete="CASCADE"), index=True
+    )
+    token_hash = Column(String(64), unique=True)
+    expires_at = Column(DateTime)
+    revoked_at = Column(DateTime, nullable=True)
+
+
+class AutheneRevokedToken(Base):
+    """An access token revoked before its expiry, see authene.auth.revocation."""
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, unique=True)
+    expires_at = Column(DateTime, index=True)
+
+
+class AutheneApiKey(Base, TimeStampMixin):
+    """An API key a machine client acts as its user with, within its scopes.
+
+    Only the sha256 digest of the key is stored, its first characters are
+    kept to tell keys apart.
+    """
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("authene_user.id", ondelete="CASCADE"), index=True
+    )
+    name = Column(String, nullable=True)
+    prefix = Column(String(16))
+    key_hash = Column(String(64), unique=True)
+    # space separated ApiKeyScope values
+    scopes = Column(String, default="")
+    expires_at = Column(DateTime, nullable=True)
+    last_used_at = Column(DateTime, nullable=True)
+
+
+class Principal(object):
+    """A compact snapshot of an authenticated user's identity and role."""
+
+    __slots__ = ("id", "email", "role")
+
+    def __init__(self, id: int, email: str, role: Optional[str]):
+        self.id = id
+        self.email = email
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user: AutheneUser) -> "Principal":
+        return cls(id=user.id, email=user.email, role=user.role)
+
+    def to_record(self) -> list:
+        return [self.id, self.email, self.role]
+
+    @classmethod
+    def from_record(cls, record: list) -> "Principal":
+        """Rebuilds a principal from a shared cache, see `authene_common.cache.JSONCodec`."""
+        id, email, role = record
+        if (
+            type(id) is not int
+            or type(email) is not str
+            or not (role is None or type(role) is str)
+        ):
+            raise ValueError(f"Not a principal record: {record!r}")
+        return cls(id=id, email=email, role=role)
+
+    def __repr__(self):
+        return "<Principal #{} '{}' {}>".format(self.id, self.email, self.role)
+
+
+class ApiKeyGrant(object):
+    """What a verified API key grants, cached by the digest of the key."""
+
+    __slots__ = ("id", "email", "scopes", "expires_at", "last_used_at")
+
+    def __init__(
+        self,
+        id: int,
+        email: str,
+        scopes: frozenset,
+        expires_at: Optional[datetime],
+        last_used_at: Optional[datetime],
+    ):
+        self.id = id
+        self.email = email
+        self.scopes = scopes
+        self.expires_at = expires_at
+        self.last_used_at = last_used_at
+
+    def to_record(self) -> list:
+        return [
+            self.id,
+            self.email,
+            sorted(self.scopes),
+            self.expires_at.isoformat() if self.expires_at else None,
+            self.last_used_at.isoformat() if self.last_used_at else None,
+        ]
+
+    @classmethod
+    def from_record(cls, record: list) -> "ApiKeyGrant":
+        """Rebuilds a grant from a shared cache, see `authene_common.cache.JSONCodec`."""
+        id, email, scopes, expires_at, last_used_at = record
+        if (
+            type(id) is not int
+            or type(email) is not str
+            or type(scopes) is not list
+            or not all(type(scope) is str for scope in scopes)
+        ):
+            raise ValueError(f"Not an API key grant record: {record!r}")
+        return cls(
+            id=id,
+            email=email,
+            scopes=frozenset(scopes),
+            expires_at=datetime.fromisoformat(expires_at) if expires_at else None,
+            last_used_at=datetime.fromisoformat(last_used_at) if last_used_at else None,
+        )
+
+    def __repr__(self):
+        return "<ApiKeyGrant #{} '{}' {}>".format(
+            self.id, self.email, " ".join(sorted(self.scopes))
+        )
 
 
 class UserBase(AutheneBase):
@@ -81,12 +232,21 @@ class UserRegister(UserLogin):
 
     @validator("password", pre=True, always=True)
     def password_required(cls, v):
-        password = v or generate_password()
-        return hash_password(password)
+        # hashing happens off the event loop, see authene.hashing
+        return v or generate_password()
 
 
 class UserLoginResponse(AutheneBase):
     token: Optional[str] = None
+    refresh_token: Optional[str] = None
+
+
+class TokenRefresh(AutheneBase):
+    refresh_token: str
+
+
+class UserLogout(AutheneBase):
+    refresh_token: Optional[str] = None
 
 
 class UserRead(UserBase):
@@ -99,24 +259,112 @@ class UserUpdate(AutheneBase):
     password: Optional[str] = None
     role: Optional[str] = UserRoles.admin
 
-    @validator("password", pre=True)
-    def hash(cls, v):
-        return hash_password(str(v))
-
 
 class UserCreate(AutheneBase):
     email: EmailStr
     password: Optional[str] = None
     role: Optional[str] = UserRoles.admin
 
-    @validator("password", pre=True)
-    def hash(cls, v):
-        return hash_password(str(v))
+    @validator("password", pre=True, always=True)
+    def password_required(cls, v):
+        # as for UserRegister, the user gets a generated password
+        return v or generate_password()
+
+
+class TokenIntrospect(AutheneBase):
+    tokens: List[str] = Field(
+        ..., min_length=1, max_length=AUTHENE_INTROSPECT_MAX_TOKENS
+    )
+
+
+class TokenIntrospection(AutheneBase):
+    active: bool
+    status: TokenStatus
+    claims: Optional[dict] = None
+    # None for a valid token whose user has not been provisioned yet
+    user: Optional[UserRead] = None
+
+
+class TokenIntrospectResponse(AutheneBase):
+    # in the order of the tokens
+    results: List[TokenIntrospection] = []
+
+
+class ApiKeyCreate(AutheneBase):
+    name: Optional[str] = Field(None, max_length=255)
+    scopes: List[ApiKeyScope] = []
+    # seconds, the key never expires when unset
+    expires_in: Optional[conint(gt=0)] = None
+
+
+class ApiKeyRead(AutheneBase):
+    id: PrimaryKey
+    name: Optional[str] = None
+    prefix: str
+    scopes: List[str] = []
+    created_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    last_used_at: Optional[datetime] = None
+
+    @validator("scopes", pre=True)
+    def split_scopes(cls, v):
+        if isinstance(v, str):
+            return v.split()
+        return v or []
+
+
+class ApiKeyCreateResponse(ApiKeyRead):
+    # only ever shown here, the key can't be recovered from its digest
+    key: str
 
 
 class UserRegisterResponse(AutheneBase):
     token: Optional[str] = None
+    refresh_token: Optional[str] = None
 
 
-class UserPagination(Pagination):
+class UserPagination(CursorPagination):
     items: List[UserRead]
+
+
+class UserFilter(AutheneBase):
+    """Narrows a page of users, every filter has an index to search.
+
+    `email_prefix` is case sensitive, the ranges include their `since` and
+    exclude their `before` bound.
+    """
+
+    role: List[str] = []
+    email_prefix: Optional[str] = Field(None, min_length=1)
+    created_since: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    updated_since: Optional[datetime] = None
+    updated_before: Optional[datetime] = None
+
+    @validator("created_since", "created_before", "updated_since", "updated_before")
+    def naive_utc(cls, v):
+        # timestamps are stored as naive UTC
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+    def is_empty(self) -> bool:
+        return not self.model_dump(exclude_defaults=True)
+
+
+class UserBulk(AutheneBase):
+    create: List[UserCreate] = Field([], max_length=AUTHENE_BULK_MAX_ITEMS)
+    update: List[UserUpdate] = Field([], max_length=AUTHENE_BULK_MAX_ITEMS)
+
+
+class UserBulkResult(AutheneBase):
+    index: int
+    status: BulkStatus
+    id: Optional[PrimaryKey] = None
+    email: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class UserBulkResponse(AutheneBase):
+    create: List[UserBulkResult] = []
+    update: List[UserBulkResult] = []
@@ -0,0 +1,195 @@
+"""What an app creates from its settings: databases, JWT keys and caches.
+
+`authene.factory.create_app` builds a `Runtime` in the app's lifespan and
+makes it current while the app handles a request, so apps built with other
+settings can share a process. Outside of those requests (scripts,
+benchmarks, an app called without running its lifespan) `current` is the
+default runtime, built from the environment on first use.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+from authene_common import config
+from authene_common.database import (
+    Database,
+    default_database,
+    reset_database,
+    use_database,
+)
+
+if TYPE_CHECKING:
+    from authene.factory import AppSettings
+
+
+class Runtime(object):
+    """The resources of one app, built from its resolved `AppSettings`."""
+
+    def __init__(self, settings: "AppSettings", database: Optional[Database] = None):
+        # the service imports this module, only import it back once it is loaded
+        from authene.auth.revocation import RevocationList
+        from authene.auth.service import (
+            ApiKeyAuthProviderPlugin,
+            BasicAuthProviderPlugin,
+        )
+        from authene.models import ApiKeyGrant, Principal
+        from authene.tokens import KeyRing
+        from authene_common.cache import JSONCodec, TTLCache, load_bus, load_cache
+        from authene_common.ratelimit import (
+            MemoryRateLimitBackend,
+            RateLimiter,
+            load_backend,
+        )
+
+        self.settings = settings
+        self.database = database or Database(
+            settings.database_url,
+            replica_urls=settings.replica_urls,
+            use_async=settings.db_async,
+            async_url=settings.async_database_url,
+        )
+        self.keyring = KeyRing(
+            algorithm=settings.jwt_alg,
+            secret=settings.jwt_secret,
+            keys_dir=settings.jwt_keys_dir,
+            signing_kid=settings.jwt_signing_kid,
+            codec=settings.jwt_codec,
+        )
+
+        self.revocations = RevocationList(
+            error_rate=config.AUTHENE_REVOCATION_ERROR_RATE
+        )
+        self.auth_provider = BasicAuthProviderPlugin(
+            keyring=self.keyring,
+            # verifying beats a round trip to a shared cache, tokens stay per worker
+            token_cache=(
+                TTLCache(
+                    maxsize=config.AUTHENE_JWT_CACHE_SIZE,
+                    ttl=config.AUTHENE_JWT_CACHE_TTL,
+                )
+                if config.AUTHENE_JWT_CACHE_SIZE > 0
+                else None
+            ),
+            revocations=self.revocations,
+        )
+
+        self.cache_invalidations = (
+            load_bus(settings.cache_invalidation_url)
+            if settings.cache_invalidation_url
+            else None
+        )
+        self.principal_cache = (
+            load_cache(
+                settings.cache_url,
+                "principal",
+                maxsize=config.AUTHENE_PRINCIPAL_CACHE_SIZE,
+                ttl=config.AUTHENE_PRINCIPAL_CACHE_TTL,
+                bus=self.cache_invalidations,
+                codec=JSONCodec(Principal),
+            )
+            if config.AUTHENE_PRINCIPAL_CACHE_SIZE > 0
+            else None
+        )
+        self.api_key_provider = ApiKeyAuthProviderPlugin(
+            cache=(
+                load_cache(
+                    settings.cache_url,
+                    "api_key",
+                    maxsize=config.AUTHENE_API_KEY_CACHE_SIZE,
+                    ttl=config.AUTHENE_API_KEY_CACHE_TTL,
+                    bus=self.cache_invalidations,
+                    codec=JSONCodec(ApiKeyGrant),
+                )
+                if config.AUTHENE_API_KEY_CACHE_SIZE > 0
+                else None
+            ),
+            touch_interval=config.AUTHENE_API_KEY_TOUCH_INTERVAL,
+        )
+        self.count_cache = (
+            load_cache(
+                settings.cache_url,
+                "count",
+                maxsize=16,
+                ttl=config.AUTHENE_USERS_COUNT_TTL,
+                bus=self.cache_invalidations,
+            )
+            if config.AUTHENE_USERS_COUNT_TTL > 0
+            else None
+        )
+
+        self.login_limiter = (
+            RateLimiter(
+                backend=(
+                    load_backend(config.AUTHENE_LOGIN_THROTTLE_BACKEND)
+                    if config.AUTHENE_LOGIN_THROTTLE_BACKEND
+                    else MemoryRateLimitBackend(
+                        sweep_interval=config.AUTHENE_LOGIN_ATTEMPTS_PERIOD
+                    )
+                ),
+                capacity=config.AUTHENE_LOGIN_ATTEMPTS,
+                period=config.AUTHENE_LOGIN_ATTEMPTS_PERIOD,
+            )
+            if config.AUTHENE_LOGIN_ATTEMPTS > 0
+            else None
+        )
+
+        self._revocation_watch: Optional[asyncio.Task] = None
+
+    @contextmanager
+    def activated(self):
+        """Makes this runtime, and its database, current in the enclosed block."""
+        token = _current.set(self)
+        database_token = use_database(self.database)
+        try:
+            yield self
+        finally:
+            reset_database(database_token)
+            _current.reset(token)
+
+    async def start(self):
+        """Loads the keys and starts the background work, with this runtime current."""
+        from authene.auth.async_service import watch_revocations
+
+        # the keys are read lazily, a missing setting fails the start up
+        # rather than the first login
+        self.keyring.load()
+        if self.cache_invalidations is not None:
+            self.cache_invalidations.start()
+        self._revocation_watch = asyncio.create_task(
+            watch_revocations(config.AUTHENE_REVOCATION_REFRESH_INTERVAL)
+        )
+
+    async def stop(self):
+        if self._revocation_watch is not None:
+            self._revocation_watch.cancel()
+            self._revocation_watch = None
+        if self.cache_invalidations is not None:
+            self.cache_invalidations.stop()
+        await self.database.dispose()
+
+
+_current: ContextVar[Optional[Runtime]] = ContextVar("authene_runtime", default=None)
+_default: Optional[Runtime] = None
+_default_lock = Lock()
+
+
+def default() -> Runtime:
+    """The runtime of the environment's settings, built on first use."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                from authene.factory import AppSettings
+
+                _default = Runtime(
+                    AppSettings().resolved(), database=default_database()
+                )
+    return _default
+
+
+def current() -> Runtime:
+    """The runtime of the app handling the current request, else the default one."""
+    return _current.get() or default()
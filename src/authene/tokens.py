@@ -0,0 +1,146 @@
+"""Signing and verification keys for Authene's JWTs.
+
+With an HMAC algorithm (the default HS256) tokens are signed with
+AUTHENE_JWT_SECRET. With an asymmetric one (RS256/384/512, ES256/384/512)
+every `*.pem` file in AUTHENE_JWT_KEYS_DIR is a key whose id is the file name
+without the extension, e.g. `2026-10.pem` has the kid `2026-10`. Tokens are
+signed with AUTHENE_JWT_SIGNING_KID, or the last kid in sorted order, and
+carry it in their `kid` header. Tokens signed with any key in the directory
+verify, and all their public halves are published as a JWKS.
+
+To rotate, add the new key, publish it for at least the JWKS cache max-age,
+switch the signing kid, and remove the old key once AUTHENE_JWT_EXP has
+passed. Public-only PEM files can be kept to verify tokens without signing.
+
+Encoding and decoding go through the codec named by AUTHENE_JWT_CODEC, see
+`authene.codecs`. Each app builds its own `KeyRing` from its settings, see
+`authene.runtime`.
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
+
+from authene.codecs import CODECS
+
+logger = logging.getLogger(__name__)
+
+
+def is_asymmetric(algorithm: str) -> bool:
+    return algorithm[:2] in ("RS", "ES")
+
+
+class KeyRing(object):
+    """The keys tokens are signed and verified with, read on first use.
+
+    Nothing is read or prepared until the first token is signed or verified
+    (or `load` is called), so importing the app needs no keys. A missing
+    setting raises a ValueError naming it.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        secret: Optional[str] = None,
+        keys_dir: Optional[str] = None,
+        signing_kid: Optional[str] = None,
+        codec: str = "jose",
+    ):
+        self.algorithm = algorithm
+        self.secret = secret
+        self.keys_dir = keys_dir
+        self.signing_kid = signing_kid
+        self.codec_name = codec
+        self.keys: Dict[str, "jwk.Key"] = {}
+        self.public_keys: Dict[str, "jwk.Key"] = {}
+
+        self._codec = None
+        self._lock = Lock()
+
+    def load(self) -> "KeyRing":
+        """Reads the keys and prepares the codec, once."""
+        if self._codec is None:
+            with self._lock:
+                if self._codec is None:
+                    self._load()
+        return self
+
+    def _load(self):
+        algorithm = self.algorithm
+        pems: Dict[str, str] = {}
+
+        if self.codec_name not in CODECS:
+            raise ValueError(
+                f"Unknown JWT codec '{self.codec_name}', set AUTHENE_JWT_CODEC "
+                f"to one of {', '.join(sorted(CODECS))}."
+            )
+
+        if is_asymmetric(algorithm):
+            from jose import jwk
+
+            if not self.keys_dir:
+                raise ValueError(
+                    f"{algorithm} requires AUTHENE_JWT_KEYS_DIR to be set."
+                )
+            for path in sorted(Path(self.keys_dir).glob("*.pem")):
+                pems[path.stem] = path.read_text()
+                self.keys[path.stem] = jwk.construct(pems[path.stem], algorithm)
+
+            self.signing_kid = self.signing_kid or next(
+                (kid for kid in reversed(self.keys) if self._is_private(kid)), None
+            )
+            if self.signing_kid not in self.keys or not self._is_private(
+                self.signing_kid
+            ):
+                raise ValueError(f"No private signing key found in '{self.keys_dir}'.")
+        elif not self.secret:
+            raise ValueError(f"{algorithm} requires AUTHENE_JWT_SECRET to be set.")
+
+        self.public_keys = {kid: key.public_key() for kid, key in self.keys.items()}
+        self._jwks = {
+            "keys": [
+                {
+                    **key.to_dict(),
+                    "kid": kid,
+                    "use": "sig",
+                    "alg": algorithm,
+                }
+                for kid, key in self.public_keys.items()
+            ]
+        }
+        self._jwks_json = json.dumps(self._jwks, separators=(",", ":")).encode("utf-8")
+        self._jwks_etag = '"{}"'.format(
+            hashlib.sha256(self._jwks_json).hexdigest()[:32]
+        )
+        # set last, `load` takes a prepared codec to mean everything is
+        self._codec = CODECS[self.codec_name](
+            algorithm, secret=self.secret, keys=pems, signing_kid=self.signing_kid
+        )
+
+    def _is_private(self, kid: str) -> bool:
+        return "d" in self.keys[kid].to_dict()
+
+    @property
+    def codec(self):
+        return self.load()._codec
+
+    @property
+    def jwks_json(self) -> bytes:
+        return self.load()._jwks_json
+
+    @property
+    def jwks_etag(self) -> str:
+        return self.load()._jwks_etag
+
+    def sign(self, claims: dict) -> str:
+        return self.codec.encode(claims)
+
+    def verify(self, token: str) -> dict:
+        """Decodes a token, checking its signature with the key named by its kid."""
+        return self.codec.decode(token)
+
+    def jwks(self) -> dict:
+        return self.load()._jwks
@@ -0,0 +1,605 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from queue import SimpleQueue
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from authene_common.resp import RespClient, RespConnection, RespError
+
+try:
+    import orjson
+
+    json_dumps, json_loads = orjson.dumps, orjson.loads
+
+except ImportError:
+    import json
+
+    def json_dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    json_loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+_missing = object()
+
+
+class CacheBackend(object):
+    """Stores values until they expire.
+
+    `TTLCache` keeps them in the worker's own memory. `MmapCache` is shared
+    by the workers of a host and `RedisCache` by every worker using the same
+    server, so deleting an entry drops it for all of them. Shared backends
+    store their values with a `JSONCodec`.
+    """
+
+    # calls make network round trips, async code runs them in the threadpool
+    blocking = False
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        """Stores a value, expiring it at the earlier of the TTL and `expires_at`."""
+        raise NotImplementedError
+
+    def delete(self, key: Hashable) -> bool:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class JSONCodec(object):
+    """Turns the values of a shared backend into JSON and back.
+
+    Whoever can write to the file or the server can put any bytes in the
+    cache, decoding them must never run code. Values are plain JSON, or
+    instances of `record` stored as what its `to_record` returns and
+    rebuilt by its `from_record`, which raises ValueError or TypeError on
+    anything it doesn't expect.
+    """
+
+    def __init__(self, record: Optional[type] = None):
+        self.record = record
+
+    def dumps(self, value: Any) -> bytes:
+        return json_dumps(value.to_record() if self.record is not None else value)
+
+    def loads(self, payload: bytes) -> Any:
+        value = json_loads(payload)
+        return self.record.from_record(value) if self.record is not None else value
+
+
+def decode(codec: JSONCodec, payload: bytes, default: Any) -> Any:
+    try:
+        return codec.loads(payload)
+    except (ValueError, TypeError):
+        logger.warning("Ignoring a cache entry that can't be decoded.", exc_info=True)
+        return default
+
+
+def encode_key(key: Hashable) -> bytes:
+    return key if isinstance(key, bytes) else str(key).encode("utf-8")
+
+
+def deadline(now: float, ttl: float, expires_at: Optional[float]) -> float:
+    if expires_at is None:
+        return now + ttl
+    return min(now + ttl, expires_at)
+
+
+class TTLCache(CacheBackend):
+    """A bounded, thread-safe LRU cache whose entries expire after a TTL.
+
+    Every entry carries its own expiry timestamp so callers can shorten the
+    lifetime of individual entries (e.g. to a token's ``exp`` claim).
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._data: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable):
+        return self.get(key, _missing) is not _missing
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        """Stores a value, expiring it at the earlier of the TTL and `expires_at`."""
+        now = self.clock()
+        expires_at = deadline(now, self.ttl, expires_at)
+        if expires_at <= now:
+            return
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class MmapCache(CacheBackend):
+    """A fixed size hash table in a memory mapped file, shared by every worker
+    of the host that maps the same `path`.
+
+    Each key hashes to one slot and a newer entry overwrites whatever was
+    there, so the file never grows past `slots * slot_size` bytes. Values
+    that don't fit a slot aren't cached. Slots are written without locks:
+    each one carries a checksum of its contents, and a read racing a write
+    sees a mismatch and counts as a miss. `clear` bumps the namespace's
+    generation, which is hashed into every key.
+    """
+
+    MAGIC = b"AUTHENE\x01"
+    HEADER = struct.Struct("<8sII")
+    GENERATION = struct.Struct("<Q")
+    GENERATIONS = 64
+    # key digest, expires at, payload length, checksum
+    SLOT = struct.Struct("<16sdI8s")
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        ttl: float,
+        slots: int = 65536,
+        slot_size: int = 512,
+        clock: Callable[[], float] = time.time,
+        codec: Optional[JSONCodec] = None,
+    ):
+        if slot_size <= self.SLOT.size:
+            raise ValueError(f"slot_size must be larger than {self.SLOT.size}")
+
+        self.path = path
+        self.namespace = namespace.encode("utf-8")
+        self.ttl = ttl
+        self.slots = slots
+        self.slot_size = slot_size
+        self.clock = clock
+        self.codec = codec or JSONCodec()
+
+        self.capacity = slot_size - self.SLOT.size
+        self.data_offset = self.HEADER.size + self.GENERATIONS * self.GENERATION.size
+        index = int.from_bytes(hashlib.blake2b(self.namespace).digest()[:8], "little")
+        self.generation_offset = (
+            self.HEADER.size + (index % self.GENERATIONS) * self.GENERATION.size
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._map: Optional[mmap.mmap] = None
+        self._lock = Lock()
+
+    @property
+    def map(self) -> mmap.mmap:
+        # mapped lazily so importing the app never touches the file
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    self._map = self._open()
+        return self._map
+
+    def _open(self) -> mmap.mmap:
+        size = self.data_offset + self.slots * self.slot_size
+        header = self.HEADER.pack(self.MAGIC, self.slots, self.slot_size)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.pread(fd, self.HEADER.size, 0) != header:
+                # a new file, or one laid out for other settings
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, header, 0)
+            return mmap.mmap(fd, size)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _digest(self, key: Hashable) -> bytes:
+        (generation,) = self.GENERATION.unpack_from(self.map, self.generation_offset)
+        return hashlib.blake2b(
+            b"%s\0%d\0%s" % (self.namespace, generation, encode_key(key)),
+            digest_size=16,
+        ).digest()
+
+    def _offset(self, digest: bytes) -> int:
+        slot = int.from_bytes(digest[:8], "little") % self.slots
+        return self.data_offset + slot * self.slot_size
+
+    @staticmethod
+    def _checksum(digest: bytes, expires_at: float, payload: bytes) -> bytes:
+        checksum = hashlib.blake2b(digest, digest_size=8)
+        checksum.update(struct.pack("<d", expires_at))
+        checksum.update(payload)
+        return checksum.digest()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        digest = self._digest(key)
+        offset = self._offset(digest)
+        stored, expires_at, length, checksum = self.SLOT.unpack_from(self.map, offset)
+
+        if stored != digest or length > self.capacity or expires_at <= self.clock():
+            self.misses += 1
+            return default
+
+        start = offset + self.SLOT.size
+        payload = self.map[start : start + length]
+        if self._checksum(stored, expires_at, payload) != checksum:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return decode(self.codec, payload, default)
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        now = self.clock()
+        expires_at = deadline(now, self.ttl, expires_at)
+        if expires_at <= now:
+            return
+
+        payload = self.codec.dumps(value)
+        if len(payload) > self.capacity:
+            return
+
+        digest = self._digest(key)
+        offset = self._offset(digest)
+        stored, previous_expiry, _, _ = self.SLOT.unpack_from(self.map, offset)
+        if stored not in (digest, bytes(16)) and previous_expiry > now:
+            self.evictions += 1
+
+        slot = self.SLOT.pack(
+            digest,
+            expires_at,
+            len(payload),
+            self._checksum(digest, expires_at, payload),
+        )
+        self.map[offset : offset + len(slot) + len(payload)] = slot + payload
+
+    def delete(self, key: Hashable) -> bool:
+        digest = self._digest(key)
+        offset = self._offset(digest)
+        if self.map[offset : offset + 16] != digest:
+            return False
+        self.map[offset : offset + 16] = bytes(16)
+        return True
+
+    def clear(self):
+        (generation,) = self.GENERATION.unpack_from(self.map, self.generation_offset)
+        self.GENERATION.pack_into(self.map, self.generation_offset, generation + 1)
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisCache(CacheBackend):
+    """Entries kept on a Redis-protocol server under `namespace:` prefixed keys.
+
+    A server that can't be reached is logged and treated as a miss, the
+    cache must never take requests down with it.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        client: RespClient,
+        namespace: str,
+        ttl: float,
+        clock: Callable[[], float] = time.time,
+        codec: Optional[JSONCodec] = None,
+    ):
+        self.client = client
+        self.prefix = f"{namespace}:".encode("utf-8")
+        self.ttl = ttl
+        self.clock = clock
+        self.codec = codec or JSONCodec()
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _execute(self, *args, default: Any = None) -> Any:
+        try:
+            return self.client.execute(*args)
+        except (OSError, RespError):
+            self.errors += 1
+            logger.warning("Cache command %s failed.", args[0], exc_info=True)
+            return default
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        payload = self._execute("GET", self.prefix + encode_key(key))
+        if payload is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return decode(self.codec, payload, default)
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        now = self.clock()
+        milliseconds = int((deadline(now, self.ttl, expires_at) - now) * 1000)
+        if milliseconds <= 0:
+            return
+
+        payload = self.codec.dumps(value)
+        self._execute("SET", self.prefix + encode_key(key), payload, "PX", milliseconds)
+
+    def delete(self, key: Hashable) -> bool:
+        return self._execute("DEL", self.prefix + encode_key(key), default=0) == 1
+
+    def clear(self):
+        cursor = b"0"
+        while True:
+            reply = self._execute(
+                "SCAN", cursor, "MATCH", self.prefix + b"*", "COUNT", 1000
+            )
+            if reply is None:
+                return
+
+            cursor, keys = reply
+            if keys:
+                self._execute("DEL", *keys)
+            if cursor == b"0":
+                return
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+class InvalidationBus(object):
+    """Carries deletes and clears between the workers' in-memory caches."""
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self.caches: Dict[str, CacheBackend] = {}
+
+    def register(self, name: str, cache: CacheBackend):
+        self.caches[name] = cache
+
+    def publish(self, name: str, key: Optional[Hashable]):
+        """Tells the other workers to drop `key` from cache `name`, all of it if None."""
+        raise NotImplementedError
+
+    def receive(self, message: bytes):
+        try:
+            origin, name, key = json_loads(message)
+        except (ValueError, TypeError):
+            logger.warning("Ignoring a malformed cache invalidation %r.", message[:64])
+            return
+
+        cache = self.caches.get(name)
+        if origin == self.origin or cache is None:
+            return
+
+        if key is None:
+            cache.clear()
+        else:
+            cache.delete(key)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """Broadcasts over the pub/sub `channel` of a Redis-protocol server.
+
+    One thread publishes, so callers never wait on the network, and another
+    applies what the other workers publish. Messages sent while the
+    subscription is down are lost, so every registered cache is cleared
+    whenever it is (re)established.
+    """
+
+    def __init__(
+        self,
+        client: RespClient,
+        channel: str = "authene:invalidate",
+        reconnect_interval: float = 1.0,
+    ):
+        super().__init__()
+        self.client = client
+        self.channel = channel
+        self.reconnect_interval = reconnect_interval
+
+        self._outbox: SimpleQueue = SimpleQueue()
+        self._subscription: Optional[RespConnection] = None
+        self._threads: List[Thread] = []
+        self._running = False
+
+    def publish(self, name: str, key: Optional[Hashable]):
+        # nothing drains the outbox before start
+        if self._running:
+            self._outbox.put(json_dumps([self.origin, name, key]))
+
+    def start(self):
+        if self._running:
+            return
+
+        self._running = True
+        self._threads = [
+            Thread(target=self._publish_loop, name="cache-publish", daemon=True),
+            Thread(target=self._subscribe_loop, name="cache-subscribe", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running = False
+        self._outbox.put(None)
+        if self._subscription is not None:
+            self._subscription.close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def _publish_loop(self):
+        while True:
+            message = self._outbox.get()
+            if message is None:
+                return
+            try:
+                self.client.execute("PUBLISH", self.channel, message)
+            except (OSError, RespError):
+                logger.exception("Unable to broadcast a cache invalidation.")
+
+    def _subscribe_loop(self):
+        while self._running:
+            try:
+                self._subscription = self.client.subscribe(self.channel)
+                for cache in self.caches.values():
+                    cache.clear()
+                for message in self._subscription.messages():
+                    self.receive(message)
+            except (OSError, RespError):
+                if self._running:
+                    logger.exception("Lost the cache invalidation channel, retrying.")
+                    time.sleep(self.reconnect_interval)
+
+
+class BroadcastCache(CacheBackend):
+    """A worker's in-memory cache whose deletes and clears reach every worker."""
+
+    def __init__(self, name: str, local: CacheBackend, bus: InvalidationBus):
+        self.name = name
+        self.local = local
+        self.bus = bus
+        bus.register(name, local)
+
+    def __len__(self):
+        return len(self.local)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.local.get(key, default)
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        self.local.set(key, value, expires_at=expires_at)
+
+    def delete(self, key: Hashable) -> bool:
+        deleted = self.local.delete(key)
+        self.bus.publish(self.name, key)
+        return deleted
+
+    def clear(self):
+        self.local.clear()
+        self.bus.publish(self.name, None)
+
+    def stats(self) -> dict:
+        return self.local.stats()
+
+
+@lru_cache(maxsize=None)
+def resp_client(url: str) -> RespClient:
+    return RespClient(url)
+
+
+def load_cache(
+    url: str,
+    name: str,
+    maxsize: int,
+    ttl: float,
+    bus: Optional[InvalidationBus] = None,
+    codec: Optional[JSONCodec] = None,
+) -> CacheBackend:
+    """Builds cache `name` on the backend at `url`.
+
+    `memory://` keeps `maxsize` entries in the worker, broadcasting deletes
+    over `bus` when given. `mmap:///path?slots=65536&slot_size=512` shares
+    a file between the workers of a host, `redis://host:6379/0` a server,
+    both store values with `codec`.
+    """
+    parts = urlsplit(url)
+    if parts.scheme == "memory":
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        return BroadcastCache(name, cache, bus) if bus is not None else cache
+    if parts.scheme == "mmap":
+        options = {key: int(value) for key, value in parse_qsl(parts.query)}
+        return MmapCache(parts.path, namespace=name, ttl=ttl, codec=codec, **options)
+    if parts.scheme == "redis":
+        return RedisCache(
+            resp_client(url), namespace=f"authene:{name}", ttl=ttl, codec=codec
+        )
+    raise ValueError(f"Unknown cache backend '{parts.scheme}'.")
+
+
+def load_bus(url: str) -> InvalidationBus:
+    """Builds the invalidation bus at `url`, a `redis://host:6379/0` server."""
+    parts = urlsplit(url)
+    if parts.scheme == "redis":
+        return RedisInvalidationBus(resp_client(url))
+    raise ValueError(f"Unknown cache invalidation bus '{parts.scheme}'.")
@@ -1,6 +1,7 @@
 import logging
 
 from starlette.config import Config
+from starlette.datastructures import CommaSeparatedStrings
 
 config = Config(".env")
 
@@ -8,7 +9,122 @@ LOG_LEVEL = config("LOG_LEVEL", default=logging.WARNING)
 
 AUTHENE_JWT_SECRET = config("AUTHENE_JWT_SECRET", default=None)
 AUTHENE_JWT_ALG = config("AUTHENE_JWT_ALG", default="HS256")
-AUTHENE_JWT_EXP = config("AUTHENE_JWT_EXP", cast=int, default=86400)  # Seconds
+# access token lifetime, sessions are kept alive with refresh tokens. It used
+# to default to 86400, set it to keep day long access tokens for clients that
+# don't refresh yet; see CHANGELOG.md
+AUTHENE_JWT_EXP = config("AUTHENE_JWT_EXP", cast=int, default=900)  # Seconds
+AUTHENE_JWT_REFRESH_EXP = config(
+    "AUTHENE_JWT_REFRESH_EXP", cast=int, default=30 * 86400
+)  # Seconds
+# jose, native (stdlib, HS* only) or pyjwt, see authene.codecs
+AUTHENE_JWT_CODEC = config("AUTHENE_JWT_CODEC", default="jose")
+
+# asymmetric (RS*/ES*) signing keys, see authene.tokens
+AUTHENE_JWT_KEYS_DIR = config("AUTHENE_JWT_KEYS_DIR", default=None)
+AUTHENE_JWT_SIGNING_KID = config("AUTHENE_JWT_SIGNING_KID", default=None)
+AUTHENE_JWKS_MAX_AGE = config("AUTHENE_JWKS_MAX_AGE", cast=int, default=3600)  # Seconds
+
+# revoked access tokens, reloaded from the database every interval
+AUTHENE_REVOCATION_REFRESH_INTERVAL = config(
+    "AUTHENE_REVOCATION_REFRESH_INTERVAL", cast=float, default=5
+)  # Seconds
+AUTHENE_REVOCATION_ERROR_RATE = config(
+    "AUTHENE_REVOCATION_ERROR_RATE", cast=float, default=0.001
+)
+
+# authene.edge, the verify-only app: whether it reloads the revocation list
+# from the database, and a JSON principal snapshot it reloads when changed
+AUTHENE_EDGE_REVOCATIONS = config("AUTHENE_EDGE_REVOCATIONS", cast=bool, default=True)
+AUTHENE_EDGE_PRINCIPALS_FILE = config("AUTHENE_EDGE_PRINCIPALS_FILE", default=None)
+
+# verified token cache, disabled when size is 0
+AUTHENE_JWT_CACHE_SIZE = config("AUTHENE_JWT_CACHE_SIZE", cast=int, default=0)
+AUTHENE_JWT_CACHE_TTL = config(
+    "AUTHENE_JWT_CACHE_TTL", cast=int, default=300
+)  # Seconds
+
+# principal (id, email, role) cache, disabled when size is 0
+AUTHENE_PRINCIPAL_CACHE_SIZE = config(
+    "AUTHENE_PRINCIPAL_CACHE_SIZE", cast=int, default=0
+)
+AUTHENE_PRINCIPAL_CACHE_TTL = config(
+    "AUTHENE_PRINCIPAL_CACHE_TTL", cast=int, default=60
+)  # Seconds
+
+# verified API key cache, keyed by the keys' digests, disabled when size is 0
+AUTHENE_API_KEY_CACHE_SIZE = config(
+    "AUTHENE_API_KEY_CACHE_SIZE", cast=int, default=1000
+)
+AUTHENE_API_KEY_CACHE_TTL = config(
+    "AUTHENE_API_KEY_CACHE_TTL", cast=int, default=60
+)  # Seconds
+# an API key's last_used_at is written at most once per interval
+AUTHENE_API_KEY_TOUCH_INTERVAL = config(
+    "AUTHENE_API_KEY_TOUCH_INTERVAL", cast=int, default=60
+)  # Seconds
+
+# where the principal, API key and user count caches live: "memory://" in
+# each worker, "mmap:///path?slots=65536&slot_size=512" shared by a host's
+# workers or "redis://host:6379/0" shared by all, see authene_common.cache
+AUTHENE_CACHE_URL = config("AUTHENE_CACHE_URL", default="memory://")
+# a "redis://host:6379/0" server whose pub/sub carries the deletes of
+# memory caches (e.g. a changed role) to every other worker
+AUTHENE_CACHE_INVALIDATION_URL = config("AUTHENE_CACHE_INVALIDATION_URL", default=None)
+
+# bcrypt runs on a dedicated "thread" or "process" pool
+AUTHENE_HASHING_POOL = config("AUTHENE_HASHING_POOL", default="thread")
+AUTHENE_HASHING_WORKERS = config("AUTHENE_HASHING_WORKERS", cast=int, default=None)
+
+# password hashing scheme, "bcrypt" or "scrypt", and its cost; hashes made with
+# other settings are upgraded on login. `python -m authene.hashing` calibrates
+AUTHENE_PASSWORD_SCHEME = config("AUTHENE_PASSWORD_SCHEME", default="bcrypt")
+AUTHENE_BCRYPT_ROUNDS = config("AUTHENE_BCRYPT_ROUNDS", cast=int, default=12)
+# scrypt uses 128 * 2**LN * R bytes of memory per hash, P is its parallelism
+AUTHENE_SCRYPT_LN = config("AUTHENE_SCRYPT_LN", cast=int, default=15)
+AUTHENE_SCRYPT_R = config("AUTHENE_SCRYPT_R", cast=int, default=8)
+AUTHENE_SCRYPT_P = config("AUTHENE_SCRYPT_P", cast=int, default=1)
+
+# serialise API responses straight to JSON bytes (with orjson when installed)
+# instead of re-validating them against their response model
+AUTHENE_FAST_SERIALIZATION = config(
+    "AUTHENE_FAST_SERIALIZATION", cast=bool, default=False
+)
+
+# GET /users page sizes and how long the total count is reused
+AUTHENE_USERS_PAGE_SIZE = config("AUTHENE_USERS_PAGE_SIZE", cast=int, default=50)
+AUTHENE_USERS_PAGE_MAX = config("AUTHENE_USERS_PAGE_MAX", cast=int, default=1000)
+AUTHENE_USERS_COUNT_TTL = config(
+    "AUTHENE_USERS_COUNT_TTL", cast=int, default=30
+)  # Seconds
+
+# rows fetched per round trip by the streaming user export
+AUTHENE_EXPORT_BATCH_SIZE = config("AUTHENE_EXPORT_BATCH_SIZE", cast=int, default=1000)
+
+# tokens a single POST /auth/introspect may verify
+AUTHENE_INTROSPECT_MAX_TOKENS = config(
+    "AUTHENE_INTROSPECT_MAX_TOKENS", cast=int, default=100
+)
+
+# POST /users/bulk limits, each chunk is written in its own transaction
+AUTHENE_BULK_MAX_ITEMS = config("AUTHENE_BULK_MAX_ITEMS", cast=int, default=10000)
+AUTHENE_BULK_CHUNK_SIZE = config("AUTHENE_BULK_CHUNK_SIZE", cast=int, default=500)
+
+# login attempts allowed per email and per client ip within the period,
+# throttling is off unless attempts is set. Without a shared backend the
+# limits are per worker process, N workers let N times as many attempts
+# through. Clients behind one NAT or proxy share the ip limit, size it for
+# them (and have the proxy pass the client's address through)
+AUTHENE_LOGIN_ATTEMPTS = config("AUTHENE_LOGIN_ATTEMPTS", cast=int, default=0)
+AUTHENE_LOGIN_ATTEMPTS_PERIOD = config(
+    "AUTHENE_LOGIN_ATTEMPTS_PERIOD", cast=int, default=60
+)  # Seconds
+# a 'package.module:ClassName' RateLimitBackend shared by workers, in-memory if unset
+AUTHENE_LOGIN_THROTTLE_BACKEND = config("AUTHENE_LOGIN_THROTTLE_BACKEND", default=None)
+
+# per-stage request timing, reported in a Server-Timing header and/or as
+# Prometheus histograms on /metrics, see authene_common.timing
+AUTHENE_SERVER_TIMING = config("AUTHENE_SERVER_TIMING", cast=bool, default=False)
+AUTHENE_METRICS = config("AUTHENE_METRICS", cast=bool, default=False)
 
 STATIC_DIR = config("STATIC_DIR", default=None)
 
@@ -16,4 +132,14 @@ AUTHENE_AUTH_REGISTRATION_ENABLED = config(
     "AUTHENE_AUTH_REGISTRATION_ENABLED", default=False
 )
 
-SQLALCHEMY_DATABASE_URI = f"sqlite:///foo.db"
+SQLALCHEMY_DATABASE_URI = config("SQLALCHEMY_DATABASE_URI", default="sqlite:///foo.db")
+# comma separated read replicas of SQLALCHEMY_DATABASE_URI, reads are spread
+# over them and writes go to the primary, see authene_common.database
+SQLALCHEMY_REPLICA_URIS = config(
+    "SQLALCHEMY_REPLICA_URIS", cast=CommaSeparatedStrings, default=""
+)
+
+# run the service layer on an AsyncEngine, the async url is derived from
+# SQLALCHEMY_DATABASE_URI (aiosqlite/asyncpg) unless provided
+AUTHENE_DB_ASYNC = config("AUTHENE_DB_ASYNC", cast=bool, default=False)
+SQLALCHEMY_ASYNC_DATABASE_URI = config("SQLALCHEMY_ASYNC_DATABASE_URI", default=None)
@@ -1,16 +1,208 @@
+import random
 import re
-from typing import Annotated
+from contextvars import ContextVar, Token
+from threading import Lock
+from typing import Annotated, List, Optional, Sequence
 
 from fastapi import Depends
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.orm import (Session, declarative_base, declared_attr,
-                            sessionmaker)
+from sqlalchemy import Engine, create_engine, inspect
+from sqlalchemy.orm import Session, declarative_base, declared_attr, sessionmaker
 from starlette.requests import Request
 
-from authene_common import config
+from authene_common import config, timing
 
-engine = create_engine(config.SQLALCHEMY_DATABASE_URI)
-SessionLocal = sessionmaker(bind=engine)
+
+class RoutingSession(Session):
+    """Sends reads to one of the replicas and everything else to the primary.
+
+    A session picks a single replica, so a request reads one consistent
+    view. Once it writes, flushes or runs a select marked with
+    `execution_options(primary=True)`, as locking reads (FOR UPDATE) must
+    be, the session sticks to the primary, so the rest of the request reads
+    its own writes instead of a replica that may not have caught up yet.
+    `use_primary` sticks it there up front.
+    """
+
+    def __init__(self, *args, replicas: List[Engine] = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = random.choice(replicas) if replicas else None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper, clause=clause, **kwargs)
+        if self.replica is None or self.info.get("primary"):
+            return primary
+
+        # flushes ask for a bind without a statement
+        if (
+            clause is None
+            or not clause.is_select
+            or clause.get_execution_options().get("primary")
+        ):
+            use_primary(self)
+            return primary
+        return self.replica
+
+
+def use_primary(db_session):
+    """Sends every further statement of the session to the primary."""
+    db_session.info["primary"] = True
+
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def resolve_async_url(url: str) -> str:
+    """Swaps the driver of a sync database url for its asyncio counterpart."""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for database '{backend}'.")
+    return ASYNC_DRIVERS[backend] + sep + rest
+
+
+class Database(object):
+    """The engines and sessions of a primary database and its read replicas.
+
+    With `use_async` sessions are sqlalchemy's AsyncSession, on engines
+    for `async_url` (derived from `url` unless given) and the replicas.
+    Creating engines connects to nothing, their pools connect on first use.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        replica_urls: Sequence[str] = (),
+        use_async: bool = False,
+        async_url: Optional[str] = None,
+    ):
+        self.engine = create_engine(url)
+        self.replica_engines = [create_engine(replica) for replica in replica_urls]
+        self.SessionLocal = sessionmaker(
+            bind=self.engine, class_=RoutingSession, replicas=self.replica_engines
+        )
+
+        self.async_engine = None
+        self.async_replica_engines = []
+        self.AsyncSessionLocal = None
+        if use_async:
+            # slow to import, only loaded when used
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+            self.async_engine = create_async_engine(async_url or resolve_async_url(url))
+            self.async_replica_engines = [
+                create_async_engine(resolve_async_url(replica))
+                for replica in replica_urls
+            ]
+            # attributes must stay loaded after commit, lazy loads can't run implicitly
+            self.AsyncSessionLocal = async_sessionmaker(
+                bind=self.async_engine,
+                expire_on_commit=False,
+                sync_session_class=RoutingSession,
+                replicas=[
+                    replica.sync_engine for replica in self.async_replica_engines
+                ],
+            )
+
+        if timing.ENABLED:
+            for instrumented in [self.engine, *self.replica_engines]:
+                timing.instrument_engine(instrumented)
+            for instrumented in [self.async_engine, *self.async_replica_engines]:
+                if instrumented is not None:
+                    timing.instrument_engine(instrumented.sync_engine)
+
+    def session(self):
+        """A new session, an AsyncSession when the database is async."""
+        if self.AsyncSessionLocal is not None:
+            return self.AsyncSessionLocal()
+        return self.SessionLocal()
+
+    def read_engine(self) -> Engine:
+        """An engine for reads that may lag behind the primary, a replica if any."""
+        if self.replica_engines:
+            return random.choice(self.replica_engines)
+        return self.engine
+
+    def async_read_engine(self):
+        """The async counterpart of `read_engine`."""
+        if self.async_replica_engines:
+            return random.choice(self.async_replica_engines)
+        return self.async_engine
+
+    async def dispose(self):
+        """Closes the connections pooled so far, the engines stay usable."""
+        for engine in [self.engine, *self.replica_engines]:
+            engine.dispose()
+        for engine in [self.async_engine, *self.async_replica_engines]:
+            if engine is not None:
+                await engine.dispose()
+
+
+_database: ContextVar[Optional[Database]] = ContextVar("authene_database", default=None)
+_default: Optional[Database] = None
+_default_lock = Lock()
+
+
+def default_database() -> Database:
+    """The database of the environment's settings, created on first use."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Database(
+                    config.SQLALCHEMY_DATABASE_URI,
+                    replica_urls=config.SQLALCHEMY_REPLICA_URIS,
+                    use_async=config.AUTHENE_DB_ASYNC,
+                    async_url=config.SQLALCHEMY_ASYNC_DATABASE_URI,
+                )
+    return _default
+
+
+def current_database() -> Database:
+    """The database of the app handling the current request, else the default one."""
+    return _database.get() or default_database()
+
+
+def use_database(database: Database) -> Token:
+    """Makes `database` current in this context, until reset with the token."""
+    return _database.set(database)
+
+
+def reset_database(token: Token):
+    _database.reset(token)
+
+
+def __getattr__(name: str):
+    # `from authene_common.database import engine` and friends, as scripts
+    # used them before each app had its own database
+    if name in (
+        "engine",
+        "replica_engines",
+        "SessionLocal",
+        "async_engine",
+        "async_replica_engines",
+        "AsyncSessionLocal",
+    ):
+        return getattr(current_database(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def is_async(db_session) -> bool:
+    """Whether the session is an AsyncSession, without importing sqlalchemy.ext.asyncio."""
+    return not isinstance(db_session, Session)
+
+
+def read_engine() -> Engine:
+    """An engine for reads of the current database, see `Database.read_engine`."""
+    return current_database().read_engine()
+
+
+def async_read_engine():
+    """The async counterpart of `read_engine`."""
+    return current_database().async_read_engine()
 
 
 def resolve_table_name(name):
@@ -82,7 +274,25 @@ Base = declarative_base(cls=CustomBase)
 
 
 def get_db(request: Request):
-    return request.state.db
+    """Returns the request's session, opening it the first time it is needed."""
+    db = getattr(request.state, "db", None)
+    if db is None:
+        db = current_database().session()
+        request.state.db = db
+    return db
+
+
+async def close_db(request: Request):
+    """Closes the request's session, if one was opened."""
+    db = getattr(request.state, "db", None)
+    if db is None:
+        return
+
+    request.state.db = None
+    if is_async(db):
+        await db.close()
+    else:
+        db.close()
 
 
 DbSession = Annotated[Session, Depends(get_db)]
@@ -10,3 +10,35 @@ class UserRoles(AutheneEnum):
     owner = "Owner"
     member = "Member"
     admin = "Admin"
+
+
+class UserSort(AutheneEnum):
+    id = "id"
+    created_at = "created_at"
+
+
+class ApiKeyScope(AutheneEnum):
+    users_read = "users:read"
+    users_write = "users:write"
+    tokens_introspect = "tokens:introspect"
+
+
+class TokenStatus(AutheneEnum):
+    active = "active"
+    expired = "expired"
+    invalid = "invalid"
+    revoked = "revoked"
+
+
+class ExportFormat(AutheneEnum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class BulkStatus(AutheneEnum):
+    created = "created"
+    updated = "updated"
+    exists = "exists"
+    not_found = "not_found"
+    duplicate = "duplicate"
+    failed = "failed"
@@ -9,9 +9,11 @@ NameStr = constr(pattern=r"^(?!\s*$).+", strip_whitespace=True, min_length=3)
 
 
 class TimeStampMixin(object):
-    created_at = Column(DateTime, default=datetime.utcnow())
+    # never null, so an ascending (created_at, id) index serves keyset pages
+    # in any database's default null ordering
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     created_at._creation_order = 9998
-    updated_at = Column(DateTime, default=datetime.utcnow())
+    updated_at = Column(DateTime, default=datetime.utcnow)
     updated_at._creation_order = 9998
 
     @staticmethod
@@ -55,6 +57,11 @@ class Pagination(AutheneBase):
     total: int
 
 
+class CursorPagination(Pagination):
+    total: Optional[int] = None
+    next: Optional[str] = None
+
+
 class PrimaryKeyModel(AutheneBase):
     id: PrimaryKey
 
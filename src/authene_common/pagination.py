@@ -0,0 +1,40 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(page: int, key: Tuple) -> str:
+    """Encodes the page number and the keyset position of its last row."""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in key]
+    raw = json.dumps({"p": page, "k": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, key_types: Tuple[type, ...]) -> Tuple[int, Tuple]:
+    """Decodes a cursor created by `encode_cursor` back into (page, key)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        page, values = int(data["p"]), data["k"]
+        if len(values) != len(key_types):
+            raise InvalidCursorError("Malformed cursor.")
+
+        key = tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for t, v in zip(key_types, values)
+        )
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursorError("Malformed cursor.") from e
+    return page, key
+
+
+def resolve_page(cursor: Optional[str], key_types: Tuple[type, ...]):
+    """Returns the (page, key) a request starts from, (1, None) without a cursor."""
+    if not cursor:
+        return 1, None
+    return decode_cursor(cursor, key_types)
@@ -0,0 +1,86 @@
+import importlib
+import time
+from threading import Lock
+from typing import Callable, Dict, List
+
+
+class RateLimitBackend(object):
+    """Stores token buckets. Implementations shared between workers (e.g. on
+    top of a Redis-protocol server) let every worker enforce the same limits."""
+
+    def hit(self, key: str, capacity: int, period: float) -> float:
+        """Takes a token from the bucket at `key`.
+
+        Returns 0 when the hit is allowed, otherwise the number of seconds
+        until a token becomes available.
+        """
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """An in-process token bucket store, two floats per active key.
+
+    Buckets that have been idle long enough to be full again are swept every
+    `sweep_interval` seconds, so memory only grows with active keys.
+    """
+
+    def __init__(
+        self, sweep_interval: float = 60, clock: Callable[[], float] = time.monotonic
+    ):
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+
+        self._buckets: Dict[str, List[float]] = {}
+        self._last_sweep = clock()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def hit(self, key: str, capacity: int, period: float) -> float:
+        rate = capacity / period
+        now = self.clock()
+
+        with self._lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now, period)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(capacity), now]
+            else:
+                tokens, updated = bucket
+                bucket[0] = min(float(capacity), tokens + (now - updated) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+    def _sweep(self, now: float, period: float):
+        self._last_sweep = now
+        idle = [
+            k for k, (_, updated) in self._buckets.items() if now - updated >= period
+        ]
+        for key in idle:
+            del self._buckets[key]
+
+
+class RateLimiter(object):
+    """Allows `capacity` hits per key in a `period`, refilling continuously."""
+
+    def __init__(self, backend: RateLimitBackend, capacity: int, period: float):
+        self.backend = backend
+        self.capacity = capacity
+        self.period = period
+
+    def hit(self, *keys: str) -> float:
+        """Hits every key, returns the longest wait if any of them is exhausted."""
+        return max(self.backend.hit(k, self.capacity, self.period) for k in keys)
+
+
+def load_backend(path: str) -> RateLimitBackend:
+    """Instantiates a backend from a 'package.module:ClassName' path."""
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
@@ -0,0 +1,148 @@
+"""A minimal client for servers speaking the Redis protocol (RESP2).
+
+Only what the shared caches need: plain commands over a small pool of
+connections, and a blocking subscription for pub/sub.
+"""
+
+import socket
+from queue import Empty, LifoQueue
+from typing import Iterator, List, Optional, Union
+from urllib.parse import unquote, urlsplit
+
+Reply = Union[None, int, bytes, List["Reply"]]
+
+
+class RespError(Exception):
+    """An error reply from the server."""
+
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode("utf-8")
+        elif isinstance(arg, (int, float)):
+            arg = str(arg).encode("ascii")
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+class RespConnection(object):
+    def __init__(self, host: str, port: int, timeout: Optional[float] = None):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def send(self, *args):
+        self.sock.sendall(encode_command(*args))
+
+    def read(self) -> Reply:
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the server.")
+
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RespError(rest.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            return self.reader.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self.read() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply {line[:32]!r}.")
+
+    def execute(self, *args) -> Reply:
+        self.send(*args)
+        return self.read()
+
+    def messages(self) -> Iterator[bytes]:
+        """Yields the messages of a subscribed connection until it is closed."""
+        while True:
+            reply = self.read()
+            if isinstance(reply, list) and reply[0] == b"message":
+                yield reply[2]
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.reader.close()
+        self.sock.close()
+
+
+class RespClient(object):
+    """Runs commands on a pool of connections to `redis://[:password@]host:port/db`."""
+
+    def __init__(self, url: str, timeout: float = 1.0, pool_size: int = 16):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.strip("/") or 0)
+        self.timeout = timeout
+
+        self._pool: LifoQueue = LifoQueue(maxsize=pool_size)
+
+    def connect(self, timeout: Optional[float] = None) -> RespConnection:
+        connection = RespConnection(self.host, self.port, timeout=timeout)
+        try:
+            if self.password:
+                connection.execute("AUTH", self.password)
+            if self.db:
+                connection.execute("SELECT", self.db)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def execute(self, *args) -> Reply:
+        try:
+            connection = self._pool.get_nowait()
+        except Empty:
+            connection = self.connect(self.timeout)
+
+        try:
+            reply = connection.execute(*args)
+        except RespError:
+            self._release(connection)
+            raise
+        except Exception:
+            # the connection may hold half a reply, never reuse it
+            connection.close()
+            raise
+
+        self._release(connection)
+        return reply
+
+    def _release(self, connection: RespConnection):
+        try:
+            self._pool.put_nowait(connection)
+        except Exception:
+            connection.close()
+
+    def subscribe(self, channel: str) -> RespConnection:
+        """A dedicated connection subscribed to `channel`, without a read timeout."""
+        connection = self.connect()
+        try:
+            connection.execute("SUBSCRIBE", channel)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                return
@@ -0,0 +1,227 @@
+"""Per-request timing of the hot path's stages.
+
+Code wraps a stage in `with timed("jwt"):`. While a request is being timed
+(see `start_request`), the time spent in each stage is summed per request,
+reported in its Server-Timing header (AUTHENE_SERVER_TIMING) when the
+response starts and/or recorded in Prometheus histograms served by
+`metrics_endpoint` (AUTHENE_METRICS) once it is done. With both disabled
+`timed` only reads a context variable and returns a shared no-op.
+
+Sync code run in the threadpool inherits the request's context, so its
+stages are reported too.
+
+The header is sent before the body, so its stages and its `total` only
+cover the time up to the response start. The histograms are recorded once
+the last body chunk is sent, their `total` is the whole request, streamed
+bodies included.
+"""
+
+import bisect
+import time
+from contextvars import ContextVar, Token
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from authene_common.config import AUTHENE_METRICS, AUTHENE_SERVER_TIMING
+
+if TYPE_CHECKING:
+    from sqlalchemy import Engine
+
+ENABLED = AUTHENE_SERVER_TIMING or AUTHENE_METRICS
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "authene_stages", default=None
+)
+
+
+class Timer(object):
+    __slots__ = ("stage", "stages", "start")
+
+    def __init__(self, stage: str, stages: Dict[str, float]):
+        self.stage = stage
+        self.stages = stages
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.stages[self.stage] = self.stages.get(self.stage, 0.0) + elapsed
+
+
+class NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def timed(stage: str):
+    """Times the enclosed block as part of `stage` of the current request."""
+    stages = _stages.get()
+    if stages is None:
+        return NULL_TIMER
+    return Timer(stage, stages)
+
+
+def add(stage: str, seconds: float):
+    """Adds time measured elsewhere to `stage` of the current request."""
+    stages = _stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+def instrument_engine(engine: "Engine"):
+    """Times every query executed on `engine` as the `db` stage."""
+    # imported here, `authene.edge` times token verification without a database
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        context._authene_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        add("db", time.perf_counter() - context._authene_query_start)
+
+
+class TimedJSONResponse(JSONResponse):
+    """Times the encoding of the response body as the `serialize` stage."""
+
+    def render(self, content) -> bytes:
+        with timed("serialize"):
+            return super().render(content)
+
+
+class Histogram(object):
+    """A Prometheus histogram with one series per value of its label."""
+
+    def __init__(
+        self, name: str, help: str, buckets: Sequence[float], label: str = "stage"
+    ):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label = label
+
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def observe(self, stage: str, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(stage)
+            if counts is None:
+                counts = self._counts[stage] = [0] * (len(self.buckets) + 1)
+                self._sums[stage] = 0.0
+            counts[index] += 1
+            self._sums[stage] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(s, list(c), self._sums[s]) for s, c in self._counts.items()]
+
+        for stage, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{self.label}="{stage}",le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(f'{self.name}_sum{{{self.label}="{stage}"}} {total}')
+            lines.append(f'{self.name}_count{{{self.label}="{stage}"}} {cumulative}')
+        return lines
+
+
+def gauge(name: str, help: str, value: float) -> List[str]:
+    """The lines of a Prometheus gauge without labels."""
+    return [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+
+stage_seconds: Optional[Histogram] = (
+    Histogram(
+        "authene_stage_seconds",
+        "Time spent per request in each stage, total is the whole request.",
+        DEFAULT_BUCKETS,
+    )
+    if AUTHENE_METRICS
+    else None
+)
+
+# other metrics served by `metrics_endpoint`, by name, each renders its lines
+collectors: Dict[str, Callable[[], List[str]]] = {}
+
+
+def start_request() -> Optional[Token]:
+    """Starts timing the current request, if timing is enabled."""
+    if not ENABLED:
+        return None
+    return _stages.set({})
+
+
+def server_timing(total: float) -> Optional[str]:
+    """The Server-Timing header value for the stages timed so far, if enabled.
+
+    `total` is the time up to the response start, whatever the body takes
+    to send afterwards can't be in a header sent before it.
+    """
+    stages = _stages.get()
+    if not AUTHENE_SERVER_TIMING or stages is None:
+        return None
+    return ", ".join(
+        f"{stage};dur={seconds * 1000:.2f}"
+        for stage, seconds in [*stages.items(), ("total", total)]
+    )
+
+
+def finish_request(token: Optional[Token]):
+    """Records the stages timed since `start_request` and stops timing."""
+    if token is None:
+        return
+
+    stages = _stages.get()
+    _stages.reset(token)
+
+    if stage_seconds is not None:
+        for stage, seconds in stages.items():
+            stage_seconds.observe(stage, seconds)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    lines = stage_seconds.render() if stage_seconds is not None else []
+    for collect in collectors.values():
+        lines.extend(collect())
+    return Response(
+        content="\n".join(lines) + "\n",
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
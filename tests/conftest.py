@@ -0,0 +1,142 @@
+import os
+import socket
+import tempfile
+import threading
+from typing import Callable, List, Optional
+
+import pytest
+
+# the settings are read on import, point the app at a throwaway database first
+os.environ.setdefault("AUTHENE_JWT_SECRET", "test")
+# the cheapest bcrypt cost, the tests log in a lot
+os.environ.setdefault("AUTHENE_BCRYPT_ROUNDS", "4")
+os.environ["SQLALCHEMY_DATABASE_URI"] = (
+    f"sqlite:///{tempfile.mkdtemp(prefix='authene-test-')}/authene.db"
+)
+for name in ("SQLALCHEMY_ASYNC_DATABASE_URI", "SQLALCHEMY_REPLICA_URIS"):
+    os.environ.pop(name, None)
+
+
+class FakeRespServer(object):
+    """Answers Redis protocol commands with whatever `handler` returns.
+
+    `handler` gets each command as a list of bytes and returns the raw
+    reply, or None to drop the connection without answering.
+    """
+
+    def __init__(self, handler: Callable[[List[bytes]], Optional[bytes]]):
+        self.handler = handler
+        self.commands: List[List[bytes]] = []
+        self.connections = 0
+
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.url = f"redis://127.0.0.1:{self.port}/0"
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(
+                target=self._serve, args=(connection,), daemon=True
+            ).start()
+
+    def _serve(self, connection: socket.socket):
+        reader = connection.makefile("rb")
+        with connection:
+            while True:
+                line = reader.readline()
+                if not line:
+                    return
+                command = []
+                for _ in range(int(line[1:-2])):
+                    length = int(reader.readline()[1:-2])
+                    command.append(reader.read(length + 2)[:-2])
+                self.commands.append(command)
+
+                reply = self.handler(command)
+                if reply is None:
+                    return
+                connection.sendall(reply)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+@pytest.fixture
+def resp_server():
+    servers = []
+
+    def start(handler):
+        server = FakeRespServer(handler)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture(scope="module")
+def database():
+    """An empty database for the module's tests, its engine is yielded."""
+    import authene.models  # noqa: F401, declares the tables
+    from authene_common.database import Base, engine
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture(scope="module")
+def client(database):
+    """A client of an API-only app, running its lifespan, on the module's database."""
+    from fastapi.testclient import TestClient
+
+    from authene.factory import AppSettings, create_app
+
+    # its own runtime, so caches don't carry over from other modules
+    with TestClient(create_app(AppSettings(frontend=False))) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def runtime(client):
+    return client.app_state["runtime"]
+
+
+@pytest.fixture(scope="module")
+def add_user(runtime):
+    """Inserts a user straight into the app's database."""
+    from authene.models import AutheneUser, hash_password
+
+    def add(email: str, password: str = "Secret123", role: str = "Owner"):
+        with runtime.database.SessionLocal() as db_session:
+            user = AutheneUser(email=email, password=hash_password(password), role=role)
+            db_session.add(user)
+            db_session.commit()
+            return user.id
+
+    return add
+
+
+@pytest.fixture(scope="module")
+def bearer(runtime):
+    """The Authorization header of an access token for `email`, signed by the app."""
+    from authene.models import AutheneUser
+
+    def headers(email: str) -> dict:
+        with runtime.activated():
+            return {"Authorization": f"Bearer {AutheneUser(email=email).token}"}
+
+    return headers
@@ -0,0 +1,108 @@
+"""API key scopes, expiry and revocation, with the grants cached."""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from authene.auth.service import hash_api_key
+from authene.factory import AppSettings, create_app
+
+OWNER = "owner@example.com"
+
+
+@pytest.fixture(scope="module")
+def headers(add_user, bearer):
+    add_user(OWNER)
+    return bearer(OWNER)
+
+
+@pytest.fixture
+def create_key(client, headers):
+    def create(client: TestClient = client, **api_key_in) -> dict:
+        response = client.post(
+            "/api/v1/auth/api-keys", headers=headers, json=api_key_in
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return create
+
+
+def get(client, path: str, key: str) -> int:
+    return client.get(path, headers={"X-API-Key": key}).status_code
+
+
+def cached(runtime, key: str) -> bool:
+    return runtime.api_key_provider.cache.get(hash_api_key(key)) is not None
+
+
+def test_scopes(client, create_key):
+    key = create_key(scopes=["users:read"])["key"]
+
+    assert get(client, "/api/v1/users", key) == 200
+    assert get(client, "/api/v1/auth/me", key) == 200
+    response = client.post(
+        "/api/v1/users", headers={"X-API-Key": key}, json={"email": "new@example.com"}
+    )
+    assert response.status_code == 403
+    response = client.post(
+        "/api/v1/auth/introspect", headers={"X-API-Key": key}, json={"tokens": ["x"]}
+    )
+    assert response.status_code == 403
+
+
+def test_keys_as_bearer_tokens(client, create_key):
+    key = create_key(scopes=["users:read"])["key"]
+    response = client.get("/api/v1/users", headers={"Authorization": f"Bearer {key}"})
+    assert response.status_code == 200
+
+
+def test_unknown_key(client):
+    assert get(client, "/api/v1/auth/me", "ak_unknown") == 401
+
+
+def test_keys_cant_create_keys(client, create_key):
+    key = create_key(scopes=["users:read", "users:write"])["key"]
+    response = client.post(
+        "/api/v1/auth/api-keys", headers={"X-API-Key": key}, json={"scopes": []}
+    )
+    assert response.status_code == 403
+
+
+def test_expired_key_with_a_cached_grant(client, runtime, create_key):
+    key = create_key(scopes=["users:read"], expires_in=1)["key"]
+    assert get(client, "/api/v1/auth/me", key) == 200
+    assert cached(runtime, key)
+
+    time.sleep(1.1)
+    assert cached(runtime, key)
+    assert get(client, "/api/v1/auth/me", key) == 401
+
+
+def test_deleted_key_with_a_cached_grant(client, runtime, headers, create_key):
+    created = create_key(scopes=["users:read"])
+    assert get(client, "/api/v1/auth/me", created["key"]) == 200
+    assert cached(runtime, created["key"])
+
+    response = client.delete(f"/api/v1/auth/api-keys/{created['id']}", headers=headers)
+    assert response.status_code == 204
+    assert get(client, "/api/v1/auth/me", created["key"]) == 401
+
+
+def test_deleted_key_in_a_shared_cache(tmp_path, headers, create_key):
+    # two workers of a host, sharing their caches through a file
+    settings = AppSettings(frontend=False, cache_url=f"mmap://{tmp_path}/cache")
+    with (
+        TestClient(create_app(settings)) as first,
+        TestClient(create_app(settings)) as second,
+    ):
+        created = create_key(first, scopes=["users:read"])
+        assert get(second, "/api/v1/auth/me", created["key"]) == 200
+        assert cached(second.app_state["runtime"], created["key"])
+
+        response = first.delete(
+            f"/api/v1/auth/api-keys/{created['id']}", headers=headers
+        )
+        assert response.status_code == 204
+        assert get(second, "/api/v1/auth/me", created["key"]) == 401
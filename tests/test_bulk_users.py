@@ -0,0 +1,137 @@
+"""The per-item results of POST /users/bulk."""
+
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from authene.auth import async_service
+from authene.models import AutheneUser, UserCreate
+from authene_common.config import AUTHENE_BULK_MAX_ITEMS
+
+ADMIN = "admin@example.com"
+
+
+@pytest.fixture(scope="module")
+def headers(add_user, bearer):
+    add_user(ADMIN)
+    return bearer(ADMIN)
+
+
+def bulk(client, headers, **body) -> dict:
+    response = client.post("/api/v1/users/bulk", headers=headers, json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def statuses(results: list) -> list:
+    return [(result["index"], result["status"]) for result in results]
+
+
+def users(runtime) -> int:
+    with runtime.database.SessionLocal() as db_session:
+        return db_session.scalar(select(func.count()).select_from(AutheneUser))
+
+
+def test_create(client, headers, add_user):
+    add_user("existing@example.com")
+    results = bulk(
+        client,
+        headers,
+        create=[
+            {"email": "a@example.com", "password": "Secret123"},
+            {"email": "existing@example.com"},
+            {"email": "b@example.com", "role": "Member"},
+            {"email": "a@example.com"},
+        ],
+    )["create"]
+
+    assert statuses(results) == [
+        (0, "created"),
+        (1, "exists"),
+        (2, "created"),
+        # only the first of the same email in a batch is created
+        (3, "duplicate"),
+    ]
+    assert [result["email"] for result in results] == [
+        "a@example.com",
+        "existing@example.com",
+        "b@example.com",
+        "a@example.com",
+    ]
+    assert results[0]["id"] and results[2]["id"]
+    assert results[1]["id"] is None and results[3]["id"] is None
+
+
+def test_update(client, headers, add_user):
+    user_id = add_user("updated@example.com", role="Member")
+    results = bulk(
+        client,
+        headers,
+        update=[
+            {"id": user_id, "role": "Owner"},
+            {"id": 999_999, "role": "Owner"},
+            {"id": user_id, "role": "Member"},
+        ],
+    )["update"]
+
+    assert statuses(results) == [(0, "updated"), (1, "not_found"), (2, "duplicate")]
+    assert results[0]["email"] == "updated@example.com"
+    response = client.get(f"/api/v1/users/{user_id}", headers=headers)
+    assert response.json()["role"] == "Owner"
+
+
+def test_a_conflicting_chunk_fails_alone(runtime, add_user, monkeypatch):
+    # created by another request between the lookup and the insert
+    add_user("raced@example.com")
+
+    async def nobody(*, db_session, emails):
+        return set()
+
+    monkeypatch.setattr(async_service, "get_existing_emails", nobody)
+    users_in = [
+        UserCreate(email=email)
+        for email in (
+            "c1@example.com",
+            "raced@example.com",
+            "c2@example.com",
+            "c3@example.com",
+        )
+    ]
+
+    async def create():
+        with runtime.activated(), runtime.database.SessionLocal() as db_session:
+            return await async_service.bulk_create_users(
+                db_session=db_session, users_in=users_in, chunk_size=2
+            )
+
+    before = users(runtime)
+    results = asyncio.run(create())
+
+    assert statuses(results) == [
+        (0, "failed"),
+        (1, "failed"),
+        (2, "created"),
+        (3, "created"),
+    ]
+    assert results[1]["email"] == "raced@example.com"
+    assert results[0]["detail"] == results[1]["detail"]
+    # the failed chunk was rolled back as a whole
+    assert users(runtime) == before + 2
+
+
+@pytest.mark.parametrize("operation", ["create", "update"])
+def test_too_many_items(client, runtime, headers, operation):
+    if operation == "create":
+        items = [
+            {"email": f"many{i}@example.com"} for i in range(AUTHENE_BULK_MAX_ITEMS + 1)
+        ]
+    else:
+        items = [{"id": i + 1} for i in range(AUTHENE_BULK_MAX_ITEMS + 1)]
+
+    before = users(runtime)
+    response = client.post(
+        "/api/v1/users/bulk", headers=headers, json={operation: items}
+    )
+    assert response.status_code == 422
+    assert users(runtime) == before
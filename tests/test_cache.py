@@ -0,0 +1,165 @@
+import pickle
+from datetime import datetime
+
+import pytest
+
+from authene.models import ApiKeyGrant, Principal
+from authene_common.cache import (
+    InvalidationBus,
+    JSONCodec,
+    MmapCache,
+    RedisCache,
+    TTLCache,
+)
+from authene_common.resp import RespClient
+
+
+class Exploit(object):
+    def __reduce__(self):
+        return (pytest.fail, ("unpickled a cached payload",))
+
+
+def test_principal_round_trip():
+    codec = JSONCodec(Principal)
+    principal = codec.loads(codec.dumps(Principal(id=1, email="a@b.co", role=None)))
+    assert (principal.id, principal.email, principal.role) == (1, "a@b.co", None)
+
+
+def test_api_key_grant_round_trip():
+    codec = JSONCodec(ApiKeyGrant)
+    grant = ApiKeyGrant(
+        id=7,
+        email="a@b.co",
+        scopes=frozenset({"users:read", "users:write"}),
+        expires_at=datetime(2030, 1, 2, 3, 4, 5),
+        last_used_at=None,
+    )
+    loaded = codec.loads(codec.dumps(grant))
+    assert loaded.__slots__ == grant.__slots__
+    assert [getattr(loaded, name) for name in grant.__slots__] == [
+        getattr(grant, name) for name in grant.__slots__
+    ]
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"not json",
+        b'{"id": 1}',
+        b"[1, 2]",
+        b'["1", "a@b.co", null]',
+        b'[1, "a@b.co", 3]',
+        b"1",
+    ],
+)
+def test_malformed_principal(payload):
+    with pytest.raises((ValueError, TypeError)):
+        JSONCodec(Principal).loads(payload)
+
+
+def test_ttl_cache_expires_at_the_earlier_deadline():
+    now = [1000.0]
+    cache = TTLCache(maxsize=8, ttl=60, clock=lambda: now[0])
+    cache.set("ttl", 1)
+    cache.set("sooner", 2, expires_at=1010)
+    cache.set("later", 3, expires_at=2000)
+    cache.set("expired", 4, expires_at=1000)
+    assert "expired" not in cache
+
+    now[0] = 1030
+    assert "sooner" not in cache
+    assert cache.get("ttl") == 1 and cache.get("later") == 3
+
+    now[0] = 1060
+    assert "ttl" not in cache and "later" not in cache
+
+
+def test_mmap_cache_never_unpickles(tmp_path):
+    cache = MmapCache(str(tmp_path / "cache"), "principal", ttl=60, slots=16)
+    cache.codec = JSONCodec(Principal)
+    cache.set("a@b.co", Principal(id=1, email="a@b.co", role="admin"))
+    assert cache.get("a@b.co").role == "admin"
+
+    # another process with write access to the file swaps in a pickle
+    poisoned = MmapCache(str(tmp_path / "cache"), "principal", ttl=60, slots=16)
+    poisoned.codec.dumps = lambda value: pickle.dumps(value)
+    poisoned.set("a@b.co", Exploit())
+
+    assert cache.get("a@b.co", "missing") == "missing"
+
+
+@pytest.fixture
+def redis_cache(resp_server):
+    store = {}
+
+    def handler(command):
+        name, *args = command
+        if name == b"GET":
+            value = store.get(args[0])
+            return (
+                b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+            )
+        if name == b"SET":
+            store[args[0]] = args[1]
+            return b"+OK\r\n"
+        if name == b"DEL":
+            return b":%d\r\n" % sum(store.pop(key, None) is not None for key in args)
+        return b"-ERR unknown command\r\n"
+
+    server = resp_server(handler)
+    cache = RedisCache(
+        RespClient(server.url), "authene:principal", ttl=60, codec=JSONCodec(Principal)
+    )
+    return cache, store
+
+
+def test_redis_cache(redis_cache):
+    cache, store = redis_cache
+    assert cache.get("a@b.co", "missing") == "missing"
+
+    cache.set("a@b.co", Principal(id=1, email="a@b.co", role=None))
+    assert store[b"authene:principal:a@b.co"] == b'[1,"a@b.co",null]'
+    assert cache.get("a@b.co").id == 1
+
+    assert cache.delete("a@b.co")
+    assert not cache.delete("a@b.co")
+    assert cache.stats() == {"hits": 1, "misses": 1, "errors": 0}
+
+
+def test_redis_cache_ignores_foreign_payloads(redis_cache):
+    cache, store = redis_cache
+    store[b"authene:principal:a@b.co"] = pickle.dumps(Exploit())
+    assert cache.get("a@b.co", "missing") == "missing"
+
+
+def test_redis_cache_errors_are_misses(resp_server):
+    server = resp_server(lambda command: b"-ERR out of memory\r\n")
+    cache = RedisCache(RespClient(server.url), "authene:count", ttl=60)
+
+    cache.set("all", 10)
+    assert cache.get("all", "missing") == "missing"
+    assert cache.stats()["errors"] == 2
+
+
+def test_redis_cache_survives_an_unreachable_server():
+    cache = RedisCache(RespClient("redis://127.0.0.1:1/0"), "authene:count", ttl=60)
+    assert cache.get("all", "missing") == "missing"
+    assert not cache.delete("all")
+
+
+def test_invalidation_messages():
+    sender, receiver = InvalidationBus(), InvalidationBus()
+    local = TTLCache(maxsize=8, ttl=60)
+    receiver.register("principal", local)
+    local.set("a@b.co", 1)
+    local.set("c@d.co", 2)
+
+    receiver.receive(pickle.dumps((sender.origin, "principal", "a@b.co")))
+    receiver.receive(b'["%s", "principal", "a@b.co"]' % sender.origin.encode())
+    assert "a@b.co" not in local and "c@d.co" in local
+
+    # its own messages come back over the channel too
+    receiver.receive(b'["%s", "principal", null]' % receiver.origin.encode())
+    assert "c@d.co" in local
+    receiver.receive(b'["%s", "principal", null]' % sender.origin.encode())
+    assert "c@d.co" not in local
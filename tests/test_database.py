@@ -0,0 +1,152 @@
+"""Read/write routing, with SQLite files standing in for a primary and a replica.
+
+The replica is a copy of the primary taken before `LAGGING` was added,
+it never catches up.
+"""
+
+import asyncio
+import sqlite3
+from collections import Counter
+
+import pytest
+from sqlalchemy import event, select, text
+
+from authene.auth import async_service, service
+from authene.models import AutheneUser, UserRegister
+from authene_common.database import Base, Database, use_primary
+
+REPLICATED = "replicated@example.com"
+LAGGING = "lagging@example.com"
+
+
+@pytest.fixture
+def statements():
+    return Counter()
+
+
+@pytest.fixture
+def database(tmp_path, statements):
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    database = Database(
+        f"sqlite:///{primary}",
+        replica_urls=[f"sqlite:///{replica}"],
+        use_async=True,
+    )
+    Base.metadata.create_all(database.engine)
+    with database.engine.begin() as connection:
+        connection.execute(
+            AutheneUser.__table__.insert(), {"email": REPLICATED, "password": b"x"}
+        )
+    with sqlite3.connect(primary) as source, sqlite3.connect(replica) as target:
+        source.backup(target)
+    with database.engine.begin() as connection:
+        connection.execute(
+            AutheneUser.__table__.insert(), {"email": LAGGING, "password": b"x"}
+        )
+
+    engines = [
+        ("primary", database.engine),
+        ("replica", database.replica_engines[0]),
+        ("primary", database.async_engine.sync_engine),
+        ("replica", database.async_replica_engines[0].sync_engine),
+    ]
+    for name, engine in engines:
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count(conn, cursor, statement, parameters, context, many, name=name):
+            statements[name, statement.split(None, 1)[0].upper()] += 1
+
+    yield database
+    asyncio.run(database.dispose())
+
+
+def emails(db_session) -> list:
+    return db_session.scalars(select(AutheneUser.email).order_by(AutheneUser.id)).all()
+
+
+def test_reads_go_to_the_replica(database, statements):
+    with database.SessionLocal() as db_session:
+        assert emails(db_session) == [REPLICATED]
+        assert db_session.get(AutheneUser, 1).email == REPLICATED
+    assert statements == {("replica", "SELECT"): 2}
+
+
+def test_writes_stick_to_the_primary(database, statements):
+    with database.SessionLocal() as db_session:
+        db_session.add(AutheneUser(email="new@example.com", password=b"x"))
+        db_session.commit()
+        # reads its own write, which the replica never gets
+        assert emails(db_session) == [REPLICATED, LAGGING, "new@example.com"]
+    assert statements == {("primary", "INSERT"): 1, ("primary", "SELECT"): 1}
+
+    # the next session starts on the replica again
+    with database.SessionLocal() as db_session:
+        assert emails(db_session) == [REPLICATED]
+    assert statements[("replica", "SELECT")] == 1
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        # locking reads must ask for the primary
+        select(AutheneUser.email).with_for_update().execution_options(primary=True),
+        select(AutheneUser.email).execution_options(primary=True),
+        text("SELECT email FROM authene_user"),
+    ],
+    ids=["for update", "primary option", "raw sql"],
+)
+def test_statements_for_the_primary(database, statements, statement):
+    with database.SessionLocal() as db_session:
+        assert LAGGING in db_session.scalars(statement).all()
+        assert LAGGING in emails(db_session)
+    assert statements == {("primary", "SELECT"): 2}
+
+
+def test_use_primary(database, statements):
+    with database.SessionLocal() as db_session:
+        use_primary(db_session)
+        assert LAGGING in emails(db_session)
+    assert statements == {("primary", "SELECT"): 1}
+
+
+def test_async_sessions_route_the_same(database, statements):
+    async def run():
+        async with database.AsyncSessionLocal() as db_session:
+            replicated = (await db_session.scalars(select(AutheneUser.email))).all()
+            db_session.add(AutheneUser(email="new@example.com", password=b"x"))
+            await db_session.commit()
+            return replicated, (await db_session.get(AutheneUser, 2)).email
+
+    assert asyncio.run(run()) == ([REPLICATED], LAGGING)
+    assert statements == {
+        ("replica", "SELECT"): 1,
+        ("primary", "INSERT"): 1,
+        ("primary", "SELECT"): 1,
+    }
+
+
+def test_get_or_create_finds_a_user_the_replica_lacks(database):
+    with database.SessionLocal() as db_session:
+        user = service.get_or_create(
+            db_session=db_session, user_in=UserRegister(email=LAGGING)
+        )
+        assert (user.id, user.email) == (2, LAGGING)
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_async_get_or_create_finds_a_user_the_replica_lacks(database, use_async):
+    async def run():
+        session = database.AsyncSessionLocal if use_async else database.SessionLocal
+        db_session = session()
+        try:
+            user = await async_service.get_or_create(
+                db_session=db_session, user_in=UserRegister(email=LAGGING)
+            )
+            return user.id, user.email
+        finally:
+            if use_async:
+                await db_session.close()
+            else:
+                db_session.close()
+
+    assert asyncio.run(run()) == (2, LAGGING)
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import resource
+import sys
+
+import pytest
+
+from authene.main import app
+from authene.models import AutheneUser
+from authene_common.config import AUTHENE_EXPORT_BATCH_SIZE
+
+USERS = 100_000
+# well under the size of either export, 8MB of CSV and 14MB of NDJSON
+MAX_RSS_GROWTH_MB = 4
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="reads RSS from /proc"
+)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize() / 1024 / 1024
+
+
+@pytest.fixture(scope="module")
+def users(database):
+    with database.begin() as connection:
+        for start in range(0, USERS, 10_000):
+            connection.execute(
+                AutheneUser.__table__.insert(),
+                [
+                    {
+                        "email": f"user{i}@example.com",
+                        "password": b"x",
+                        "role": "Member",
+                    }
+                    for i in range(start, start + 10_000)
+                ],
+            )
+    return USERS
+
+
+async def export(format: str) -> dict:
+    token = AutheneUser(email="user0@example.com", password=b"x").token
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/users/export",
+        "raw_path": b"/api/v1/users/export",
+        "root_path": "",
+        "query_string": f"format={format}".encode(),
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "server": ("test", 80),
+        "client": ("test", 1),
+    }
+    received = {
+        "status": None,
+        "chunks": 0,
+        "bytes": 0,
+        "lines": 0,
+        "peak_rss": rss_mb(),
+    }
+    partial = b""
+
+    async def receive():
+        await asyncio.sleep(3600)  # the client never disconnects
+
+    async def send(message):
+        nonlocal partial
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            received["chunks"] += 1
+            received["bytes"] += len(body)
+            *lines, partial = (partial + body).split(b"\n")
+            if lines:
+                # the first and last rows only, holding on to all would be the leak
+                received.setdefault("first", lines[0])
+                received["last"] = lines[-1]
+                received["lines"] += len(lines)
+            received["peak_rss"] = max(received["peak_rss"], rss_mb())
+
+    await app(scope, receive, send)
+    assert partial == b""
+    return received
+
+
+@pytest.mark.parametrize("format, header", [("ndjson", 0), ("csv", 1)])
+def test_export_streams_in_constant_memory(users, format, header):
+    asyncio.run(export(format))  # warm up the app and the database's cache
+    baseline = rss_mb()
+    received = asyncio.run(export(format))
+
+    assert received["status"] == 200
+    assert received["lines"] == users + header
+    assert received["bytes"] / 1024 / 1024 > MAX_RSS_GROWTH_MB
+    # one chunk per batch of rows, not one for the whole table
+    assert received["chunks"] >= users // AUTHENE_EXPORT_BATCH_SIZE
+    growth = received["peak_rss"] - baseline
+    assert growth < MAX_RSS_GROWTH_MB, f"RSS grew by {growth:.1f}MB"
+
+    first, last = received["first"], received["last"]
+    if format == "ndjson":
+        assert json.loads(first)["email"] == "user0@example.com"
+        assert json.loads(last)["email"] == f"user{users - 1}@example.com"
+    else:
+        assert first.startswith(b"id,")
+        assert b"user%d@example.com" % (users - 1) in last
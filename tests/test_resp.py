@@ -0,0 +1,94 @@
+import pytest
+
+from authene_common.resp import RespClient, RespError, encode_command
+
+
+def test_encode_command():
+    assert encode_command("SET", b"key", 10, 1.5) == (
+        b"*4\r\n$3\r\nSET\r\n$3\r\nkey\r\n$2\r\n10\r\n$3\r\n1.5\r\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "reply, expected",
+    [
+        (b"+OK\r\n", b"OK"),
+        (b":42\r\n", 42),
+        (b"$5\r\nhello\r\n", b"hello"),
+        (b"$0\r\n\r\n", b""),
+        (b"$-1\r\n", None),
+        (b"*-1\r\n", None),
+        (b"*0\r\n", []),
+        (b"*2\r\n$1\r\na\r\n*1\r\n:1\r\n", [b"a", [1]]),
+        (b"$4\r\na\r\nb\r\n", b"a\r\nb"),
+    ],
+)
+def test_replies(resp_server, reply, expected):
+    server = resp_server(lambda command: reply)
+    assert RespClient(server.url).execute("GET", "key") == expected
+
+
+def test_error_reply_keeps_the_connection(resp_server):
+    def handler(command):
+        if command[0] == b"BAD":
+            return b"-ERR unknown command 'BAD'\r\n"
+        return b"+PONG\r\n"
+
+    server = resp_server(handler)
+    client = RespClient(server.url)
+
+    with pytest.raises(RespError, match="unknown command"):
+        client.execute("BAD")
+    assert client.execute("PING") == b"PONG"
+    assert server.connections == 1
+
+
+def test_reconnects_after_the_server_drops_the_connection(resp_server):
+    replies = iter([b"+PONG\r\n", None, b"+PONG\r\n"])
+    server = resp_server(lambda command: next(replies))
+    client = RespClient(server.url)
+
+    assert client.execute("PING") == b"PONG"
+    with pytest.raises(ConnectionError):
+        client.execute("PING")
+    # the broken connection is dropped, the next command opens a new one
+    assert client.execute("PING") == b"PONG"
+    assert server.connections == 2
+
+
+def test_unreachable_server():
+    with pytest.raises(OSError):
+        RespClient("redis://127.0.0.1:1/0", timeout=0.5).execute("PING")
+
+
+def test_authenticates_and_selects_the_database(resp_server):
+    server = resp_server(lambda command: b"+OK\r\n")
+    host_port = server.url.split("//")[1].split("/")[0]
+    client = RespClient(f"redis://:s%40cret@{host_port}/3")
+
+    client.execute("PING")
+    assert server.commands == [[b"AUTH", b"s@cret"], [b"SELECT", b"3"], [b"PING"]]
+
+
+def test_failed_authentication_closes_the_connection(resp_server):
+    server = resp_server(lambda command: b"-WRONGPASS invalid password\r\n")
+    host_port = server.url.split("//")[1].split("/")[0]
+
+    with pytest.raises(RespError, match="WRONGPASS"):
+        RespClient(f"redis://:wrong@{host_port}/0").execute("PING")
+
+
+def test_subscription_yields_messages(resp_server):
+    def handler(command):
+        return (
+            b"*3\r\n$9\r\nsubscribe\r\n$7\r\nchannel\r\n:1\r\n"
+            b"*3\r\n$7\r\nmessage\r\n$7\r\nchannel\r\n$5\r\nfirst\r\n"
+            b"*3\r\n$7\r\nmessage\r\n$7\r\nchannel\r\n$6\r\nsecond\r\n"
+        )
+
+    server = resp_server(handler)
+    subscription = RespClient(server.url).subscribe("channel")
+    messages = subscription.messages()
+
+    assert [next(messages), next(messages)] == [b"first", b"second"]
+    subscription.close()
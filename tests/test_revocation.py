@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from itertools import count
+
+from authene.auth.revocation import RevocationList
+from authene.models import AutheneRevokedToken
+from authene_common.bloom import BloomFilter
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_false_positives_are_settled_by_the_exact_set():
+    # two bits and one hash, about every other jti collides with "revoked"
+    bloom = BloomFilter(1, error_rate=0.5)
+    bloom.add("revoked")
+    collision = next(
+        jti for jti in (f"jti{i}" for i in count()) if jti in bloom and jti != "revoked"
+    )
+
+    revocations = RevocationList(capacity=1, error_rate=0.5)
+    revocations.add("revoked", 2e9)
+    assert "revoked" in revocations
+    assert collision not in revocations
+    assert None not in revocations
+
+
+def test_grows_past_its_capacity():
+    revocations = RevocationList(capacity=4)
+    jtis = [f"jti{i}" for i in range(100)]
+    for jti in jtis:
+        revocations.add(jti, 2e9)
+
+    assert len(revocations) == 100
+    assert all(jti in revocations for jti in jtis)
+    assert "other" not in revocations
+
+
+def test_expired_revocations_are_dropped():
+    clock = Clock()
+    revocations = RevocationList(clock=clock)
+    expires = datetime.utcfromtimestamp(clock.now + 30)
+    revocations.load([(1, "short", expires), (2, "long", expires + timedelta(hours=1))])
+    assert "short" in revocations
+
+    clock.now += 60
+    revocations.load([])
+    assert "short" not in revocations
+    assert "long" in revocations
+    assert len(revocations) == 1
+
+
+def test_refresh_reads_the_unexpired_rows_added_since(database):
+    revocations = RevocationList()
+    later = datetime.utcnow() + timedelta(hours=1)
+
+    def insert(*rows):
+        with database.begin() as connection:
+            connection.execute(
+                AutheneRevokedToken.__table__.insert(),
+                [{"jti": jti, "expires_at": expires_at} for jti, expires_at in rows],
+            )
+
+    insert(("first", later), ("expired", datetime.utcnow() - timedelta(hours=1)))
+    with database.connect() as connection:
+        revocations.refresh(connection)
+    assert "first" in revocations and "expired" not in revocations
+    assert revocations.last_id == 1
+
+    insert(("second", later))
+    with database.connect() as connection:
+        revocations.refresh(connection)
+    assert "first" in revocations and "second" in revocations
+    assert revocations.last_id == 3
+    assert len(revocations) == 2
@@ -0,0 +1,103 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from authene.factory import AppSettings, create_app
+from authene.models import AutheneUser
+from authene.runtime import current, default
+from authene_common import database
+from authene_common.database import (
+    Base,
+    Database,
+    default_database,
+    reset_database,
+    use_database,
+)
+
+
+def build(tmp_path, name: str):
+    url = f"sqlite:///{tmp_path / name}.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            AutheneUser.__table__.insert(),
+            {"email": f"{name}@example.com", "password": b"x"},
+        )
+    engine.dispose()
+    return create_app(AppSettings(frontend=False, database_url=url, jwt_secret=name))
+
+
+def me(client: TestClient, token: str) -> int:
+    response = client.get(
+        "/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"}
+    )
+    return response.status_code
+
+
+def test_apps_keep_their_own_resources(tmp_path):
+    first = TestClient(build(tmp_path, "first"))
+    second = TestClient(build(tmp_path, "second"))
+    with first, second:
+        runtimes = first.app_state["runtime"], second.app_state["runtime"]
+        assert runtimes[0] is not runtimes[1]
+        assert runtimes[0].database is not runtimes[1].database
+
+        tokens = []
+        for runtime, name in zip(runtimes, ("first", "second")):
+            with runtime.activated():
+                tokens.append(AutheneUser(email=f"{name}@example.com").token)
+
+        # each app only knows its own keys and users
+        assert me(first, tokens[0]) == 200
+        assert me(second, tokens[1]) == 200
+        assert me(first, tokens[1]) == 401
+        assert me(second, tokens[0]) == 401
+
+    # outside of the apps' requests nothing was swapped in
+    assert current() is default()
+
+
+NAMES = [
+    "engine",
+    "replica_engines",
+    "SessionLocal",
+    "async_engine",
+    "async_replica_engines",
+    "AsyncSessionLocal",
+]
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_module_attributes_are_the_default_database(name):
+    imported = {}
+    exec(f"from authene_common.database import {name}", imported)
+    assert imported[name] is getattr(default_database(), name)
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_module_attributes_follow_the_current_database(tmp_path, name):
+    other = Database(f"sqlite:///{tmp_path / 'other'}.db")
+    token = use_database(other)
+    try:
+        assert getattr(database, name) is getattr(other, name)
+    finally:
+        reset_database(token)
+    assert getattr(database, name) is getattr(default_database(), name)
+
+
+def test_old_importers_reach_the_app_database(tmp_path):
+    with TestClient(build(tmp_path, "app")) as client:
+        runtime = client.app_state["runtime"]
+        with runtime.activated():
+            from authene_common.database import SessionLocal, engine
+
+            assert engine is runtime.database.engine
+            with SessionLocal() as db_session:
+                emails = db_session.execute(text("SELECT email FROM authene_user"))
+                assert emails.scalars().all() == ["app@example.com"]
+
+
+def test_unknown_module_attribute():
+    with pytest.raises(AttributeError, match="no attribute 'Engine2'"):
+        database.Engine2
@@ -0,0 +1,101 @@
+"""Refresh token rotation and reuse detection, and logout revocation."""
+
+from itertools import count
+
+import pytest
+
+from authene.auth.revocation import RevocationList
+
+PASSWORD = "Secret123"
+USERS = count()
+
+
+@pytest.fixture
+def login(client, add_user):
+    def login() -> dict:
+        # a user of its own, so revoking its tokens leaves the other tests alone
+        email = f"user{next(USERS)}@example.com"
+        add_user(email, password=PASSWORD)
+        response = client.post(
+            "/api/v1/auth/login", json={"email": email, "password": PASSWORD}
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return login
+
+
+def refresh(client, refresh_token: str):
+    return client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def me(client, token: str) -> int:
+    response = client.get(
+        "/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"}
+    )
+    return response.status_code
+
+
+def test_refresh_rotates(client, login):
+    tokens = login()
+    response = refresh(client, tokens["refresh_token"])
+    assert response.status_code == 200, response.text
+    rotated = response.json()
+
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert me(client, rotated["token"]) == 200
+    assert refresh(client, rotated["refresh_token"]).status_code == 200
+
+
+def test_unknown_refresh_token(client):
+    assert refresh(client, "not-a-refresh-token").status_code == 401
+
+
+def test_reuse_revokes_the_family(client, login):
+    first = login()
+    second = refresh(client, first["refresh_token"]).json()
+    other_session = login()
+
+    # the rotated token presented again: it leaked
+    assert refresh(client, first["refresh_token"]).status_code == 401
+    # so the one it was exchanged for is revoked too
+    assert refresh(client, second["refresh_token"]).status_code == 401
+    # other users are not affected
+    assert refresh(client, other_session["refresh_token"]).status_code == 200
+
+
+def test_logout_revokes_the_access_and_refresh_tokens(client, runtime, login):
+    tokens = login()
+    other = refresh(client, tokens["refresh_token"]).json()
+    response = client.post(
+        "/api/v1/auth/logout",
+        headers={"Authorization": f"Bearer {tokens['token']}"},
+        json={"refresh_token": other["refresh_token"]},
+    )
+    assert response.status_code == 204, response.text
+
+    assert me(client, tokens["token"]) == 401
+    assert refresh(client, other["refresh_token"]).status_code == 401
+    # the access token refreshed before the logout stays valid until it expires
+    assert me(client, other["token"]) == 200
+
+    # and the other workers learn of the revocation on their next refresh
+    claims, _ = runtime.auth_provider.introspect(other["token"])
+    claims_revoked, status = runtime.auth_provider.introspect(tokens["token"])
+    assert (claims_revoked, status.value) == (None, "revoked")
+    worker = RevocationList()
+    with runtime.database.engine.connect() as connection:
+        worker.refresh(connection)
+    assert len(worker) == 1
+    assert claims["jti"] not in worker
+
+
+def test_logout_is_idempotent(client, login):
+    tokens = login()
+    headers = {"Authorization": f"Bearer {tokens['token']}"}
+    assert (
+        client.post("/api/v1/auth/logout", headers=headers, json={}).status_code == 204
+    )
+    assert (
+        client.post("/api/v1/auth/logout", headers=headers, json={}).status_code == 401
+    )
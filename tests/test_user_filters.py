@@ -0,0 +1,127 @@
+"""Every filter of GET /users must search an index.
+
+Runs EXPLAIN QUERY PLAN on the page and count queries of each filter, in
+both sort orders and past a cursor, over a small seeded table without
+statistics, as the migrations leave it. `benchmarks/user_filters.py`
+times the same filters on a large table.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from authene.auth.service import build_count_query, build_page_query, page_key
+from authene.models import AutheneUser, UserFilter
+from authene_common.enums import UserSort
+
+USERS = 2000
+LIMIT = 50
+START = datetime(2020, 1, 1)
+STEP = timedelta(minutes=5)
+
+
+def role_of(i: int) -> str:
+    if i % 1000 == 0:
+        return "Owner"
+    if i % 100 == 0:
+        return "Admin"
+    return "Member"
+
+
+def seed(connection, users: int, chunk: int = 10_000):
+    """Inserts `users` users, few owners and admins, with spread out timestamps."""
+    rand = random.Random(0)
+    for start in range(0, users, chunk):
+        rows = []
+        for i in range(start, min(start + chunk, users)):
+            created_at = START + STEP * i
+            rows.append(
+                {
+                    "email": f"user{i}@example.com",
+                    "password": b"x",
+                    "role": role_of(i),
+                    "created_at": created_at,
+                    "updated_at": created_at + timedelta(days=rand.random() * 30),
+                }
+            )
+        connection.execute(AutheneUser.__table__.insert(), rows)
+
+
+def cases(users: int) -> dict:
+    end = START + STEP * users
+    day = START + (end - START) / 2
+    return {
+        "owners": UserFilter(role=["Owner"]),
+        "owners and admins": UserFilter(role=["Owner", "Admin"]),
+        "members": UserFilter(role=["Member"]),
+        "email prefix": UserFilter(email_prefix="user1234"),
+        "created on a day": UserFilter(
+            created_since=day, created_before=day + timedelta(days=1)
+        ),
+        "created last week": UserFilter(created_since=end - timedelta(days=7)),
+        "created first week": UserFilter(created_before=START + timedelta(days=7)),
+        "updated last week": UserFilter(updated_since=end - timedelta(days=7)),
+        "updated on a day": UserFilter(
+            updated_since=day, updated_before=day + timedelta(days=1)
+        ),
+        "admins updated last month": UserFilter(
+            role=["Admin"], updated_since=end - timedelta(days=30)
+        ),
+        "email prefix created since": UserFilter(
+            email_prefix="user12", created_since=day
+        ),
+    }
+
+
+def explain(connection, query) -> list:
+    compiled = query.compile(
+        connection.engine, compile_kwargs={"render_postcompile": True}
+    )
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, params)
+    return [row[3] for row in result]
+
+
+def full_scans(plan: list) -> list:
+    return [
+        step
+        for step in plan
+        if step.startswith("SCAN") and "authene_user" in step.split()[:2]
+    ]
+
+
+@pytest.fixture(scope="module")
+def connection(database):
+    with database.begin() as connection:
+        seed(connection, USERS)
+    with database.connect() as connection:
+        yield connection
+
+
+CASES = cases(USERS)
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_count_searches_an_index(connection, name):
+    plan = explain(connection, build_count_query(CASES[name]))
+    assert not full_scans(plan), plan
+
+
+@pytest.mark.parametrize("sort", UserSort)
+@pytest.mark.parametrize("name", CASES)
+def test_pages_search_an_index(connection, name, sort):
+    filters = CASES[name]
+    first = build_page_query(limit=LIMIT + 1, sort=sort, filters=filters)
+    plan = explain(connection, first)
+    assert not full_scans(plan), plan
+
+    items = Session(bind=connection).scalars(first).all()
+    assert items, "the seeded table should match every filter"
+
+    after = build_page_query(
+        limit=LIMIT + 1, after=page_key(items[-1], sort), sort=sort, filters=filters
+    )
+    plan = explain(connection, after)
+    assert not full_scans(plan), plan
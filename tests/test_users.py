@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import select
+
+from authene.hashing import checkpw
+from authene.models import AutheneUser
+
+ADMIN = "admin@example.com"
+
+
+@pytest.fixture(scope="module")
+def headers(add_user, bearer):
+    add_user(ADMIN)
+    return bearer(ADMIN)
+
+
+def password_of(runtime, email: str) -> bytes:
+    with runtime.database.SessionLocal() as db_session:
+        return db_session.scalar(
+            select(AutheneUser.password).where(AutheneUser.email == email)
+        )
+
+
+def test_create_user(client, runtime, headers):
+    response = client.post(
+        "/api/v1/users",
+        headers=headers,
+        json={"email": "given@example.com", "password": "Given123", "role": "Member"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["role"] == "Member"
+    assert checkpw("Given123", password_of(runtime, "given@example.com"))
+
+
+@pytest.mark.parametrize("password", [None, ""])
+def test_create_user_without_a_password(client, runtime, headers, password):
+    email = f"generated{password is None}@example.com"
+    body = {"email": email}
+    if password is not None:
+        body["password"] = password
+
+    response = client.post("/api/v1/users", headers=headers, json=body)
+    assert response.status_code == 200, response.text
+    # a generated password, as bulk create gives
+    assert password_of(runtime, email).startswith(b"$2")
+
+
+def test_bulk_create_without_a_password(client, runtime, headers):
+    response = client.post(
+        "/api/v1/users/bulk",
+        headers=headers,
+        json={"create": [{"email": "bulk@example.com"}]},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["create"][0]["status"] == "created"
+    assert password_of(runtime, "bulk@example.com").startswith(b"$2")